@@ -0,0 +1,197 @@
+import asyncio
+import heapq
+import json
+import logging
+from typing import List
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, HttpUrl
+from starlette.concurrency import run_in_threadpool
+
+from api.stt_routes import (
+    _add_diarize_warning,
+    _ensure_stt_ready,
+    _fetch_remote_audio,
+    _release_remote_audio,
+    _validate_diarize,
+    transcribe_when_free,
+)
+from core.config import (
+    BATCH_DOWNLOAD_CONCURRENCY,
+    BATCH_MAX_ITEMS,
+    BATCH_TRANSCRIBE_CONCURRENCY,
+    DIARIZE_DEFAULT,
+)
+import core.http_client as http_client
+from services.longform import probe_duration
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+_SIZE_PROBE_CONCURRENCY = 2
+
+
+def _size_order(sizes):
+    # Sort key for item indexes: reported size, an estimate of duration for
+    # recordings in the same format, then submission order. Items whose size
+    # is unknown, or not probed yet, go last.
+    return lambda index: (sizes.get(index) is None, sizes.get(index) or 0, index)
+
+
+class BatchTranscriptionRequest(BaseModel):
+    audio_urls: List[HttpUrl]
+    use_cache: bool = True
+    diarize: str = DIARIZE_DEFAULT
+
+
+def _item_error(index, audio_url, status_code, detail):
+    return {
+        "index": index,
+        "audio_url": audio_url,
+        "status_code": status_code,
+        "error": detail,
+    }
+
+
+async def _stream_batch(audio_urls, use_cache, diarize):
+    # Items are downloaded concurrently over the shared HTTP pool. Whenever a
+    # slot frees, the smallest item by reported size starts next; sizes are
+    # probed alongside the downloads, so the first ones start straight away
+    # in submission order and items not yet probed follow those that have
+    # been, in submission order among themselves. Finished downloads
+    # wait in a heap keyed by probed duration and the shortest of those is
+    # transcribed next, so items of similar length reach the batching
+    # scheduler together; the order is exact only among downloaded items.
+    # An item holds one of BATCH_DOWNLOAD_CONCURRENCY slots from the start of
+    # its download until it is taken for transcription, which bounds the
+    # decoded files (pinned in the audio cache) waiting on a slow model.
+    outcomes = asyncio.Queue()
+    ready = []
+    wake = asyncio.Event()
+    remotes = {}
+    downloads_left = len(audio_urls)
+    succeeded = 0
+
+    sizes = {}
+    waiting = list(range(len(audio_urls)))
+
+    async def probe_sizes():
+        # Few probes at a time, so they leave most of a host's connections
+        # to the downloads; an item that has already started is skipped.
+        probes = asyncio.Semaphore(_SIZE_PROBE_CONCURRENCY)
+
+        async def probe(index):
+            async with probes:
+                if index in waiting:
+                    sizes[index] = await http_client.content_length(audio_urls[index])
+
+        await asyncio.gather(*(probe(index) for index in range(len(audio_urls))))
+
+    async def dispatch():
+        while waiting:
+            await slots.acquire()
+            index = min(waiting, key=_size_order(sizes))
+            waiting.remove(index)
+            tasks.append(asyncio.create_task(download(index, audio_urls[index])))
+
+    async def download(index, audio_url):
+        nonlocal downloads_left
+        queued = False
+        try:
+            remote = await _fetch_remote_audio(audio_url)
+            remotes[index] = remote
+            duration = await run_in_threadpool(probe_duration, remote["path"])
+            heapq.heappush(ready, (duration, index, remote))
+            queued = True
+        except HTTPException as exc:
+            await outcomes.put(_item_error(index, audio_url, exc.status_code, exc.detail))
+        except Exception as exc:
+            logger.warning("Batch item %s could not be prepared: %s", index, exc)
+            await outcomes.put(_item_error(index, audio_url, 400, "Unable to read audio."))
+        finally:
+            if not queued:
+                slots.release()
+            downloads_left -= 1
+            wake.set()
+
+    async def transcribe_worker():
+        while True:
+            while not ready:
+                if downloads_left == 0:
+                    return
+                wake.clear()
+                await wake.wait()
+
+            duration, index, remote = heapq.heappop(ready)
+            slots.release()
+            audio_url = audio_urls[index]
+            try:
+                segments = await transcribe_when_free(
+                    remote["path"], use_cache, diarize, remote["audio_hash"], remote["cache_as"]
+                )
+                item = {
+                    "index": index,
+                    "audio_url": audio_url,
+                    "duration": round(duration, 2),
+                    "segments": segments,
+                }
+                await outcomes.put(_add_diarize_warning(item, diarize))
+            except HTTPException as exc:
+                await outcomes.put(_item_error(index, audio_url, exc.status_code, exc.detail))
+            except Exception as exc:
+                logger.exception("Batch item %s failed: %s", index, exc)
+                await outcomes.put(_item_error(index, audio_url, 500, "Transcription failed."))
+            finally:
+                _release_remote_audio(remotes.pop(index, None))
+
+    slots = asyncio.Semaphore(BATCH_DOWNLOAD_CONCURRENCY)
+    tasks = [asyncio.create_task(dispatch()), asyncio.create_task(probe_sizes())]
+    tasks.extend(
+        asyncio.create_task(transcribe_worker())
+        for _ in range(min(BATCH_TRANSCRIBE_CONCURRENCY, len(audio_urls)))
+    )
+
+    try:
+        for _ in audio_urls:
+            item = await outcomes.get()
+            if "segments" in item:
+                succeeded += 1
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+
+        yield json.dumps(
+            {
+                "done": True,
+                "total": len(audio_urls),
+                "succeeded": succeeded,
+                "failed": len(audio_urls) - succeeded,
+            }
+        ) + "\n"
+    finally:
+        # Also reached when the client disconnects mid-stream.
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for remote in remotes.values():
+            _release_remote_audio(remote)
+
+
+@router.post("/transcribe-batch")
+async def transcribe_batch(req: BatchTranscriptionRequest):
+    _ensure_stt_ready()
+    if not req.audio_urls:
+        raise HTTPException(status_code=400, detail="audio_urls must not be empty.")
+    if len(req.audio_urls) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BATCH_MAX_ITEMS} audio_urls are accepted per batch.",
+        )
+
+    return StreamingResponse(
+        _stream_batch(
+            [str(audio_url) for audio_url in req.audio_urls],
+            req.use_cache,
+            _validate_diarize(req.diarize),
+        ),
+        media_type="application/x-ndjson",
+    )
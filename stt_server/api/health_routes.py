@@ -1,14 +1,65 @@
+import os
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
 from fastapi import APIRouter
 from fastapi.responses import JSONResponse
 
 import core.loader as loader
+from core.batching import get_batching_status
+from core.executor import get_executor_status
+import core.http_client as http_client
+from core.timings import get_stage_status
+import services.audio_cache as audio_cache
+import services.diarization as diarization
+import services.jobs as jobs
+import services.summary_cache as summary_cache
+import services.transcript_cache as transcript_cache
+import services.vad as vad
 from services.summary import is_summary_available
 
 router = APIRouter()
 
+_PROC_MEMORY_FIELDS = {
+    "VmRSS": "rss_bytes",
+    "RssAnon": "rss_anon_bytes",
+    "RssFile": "rss_file_bytes",
+    "RssShmem": "rss_shmem_bytes",
+}
+
+
+def _read_proc_kb(path, fields):
+    values = {}
+    try:
+        with open(path, encoding="utf-8") as proc_file:
+            for line in proc_file:
+                key, _, rest = line.partition(":")
+                if key in fields:
+                    values[fields[key]] = int(rest.split()[0]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return values
+
+
+def _process_memory():
+    memory = {"pid": os.getpid()}
+    memory.update(_read_proc_kb("/proc/self/status", _PROC_MEMORY_FIELDS))
+    # PSS splits shared pages between the workers that map them.
+    memory.update(_read_proc_kb("/proc/self/smaps_rollup", {"Pss": "pss_bytes"}))
+
+    if "rss_bytes" not in memory and resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        memory["peak_rss_bytes"] = peak if sys.platform == "darwin" else peak * 1024
+    return memory
+
 
 @router.get("/health/live")
-def health_live():
+async def health_live():
+    # Async so liveness never waits on a threadpool busy with model loading.
     return {"status": "ok"}
 
 
@@ -16,6 +67,17 @@ def health_live():
 def health_ready():
     runtime = loader.get_runtime_status()
     runtime["summary_ready"] = is_summary_available()
+    runtime["batching"] = get_batching_status()
+    runtime["executor"] = get_executor_status()
+    runtime["transcript_cache"] = transcript_cache.get_cache_status()
+    runtime["summary_cache"] = summary_cache.get_cache_status()
+    runtime["audio_cache"] = audio_cache.get_cache_status()
+    runtime["diarization_cache"] = diarization.get_cache_status()
+    runtime["vad"] = vad.get_vad_status()
+    runtime["stages"] = get_stage_status()
+    runtime["jobs"] = jobs.get_jobs_status()
+    runtime["http"] = http_client.get_http_status()
+    runtime["process"] = _process_memory()
 
     ready = runtime["stt_ready"]
     if ready:
@@ -0,0 +1,144 @@
+import logging
+import os
+import shutil
+import uuid
+from typing import Optional
+
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+
+from api.stt_routes import (
+    _add_diarize_warning,
+    _build_full_text,
+    _fetch_remote_audio,
+    _normalize_audio_url,
+    _release_remote_audio,
+    _safe_remove,
+    _save_upload_file,
+    _summarize_with_fallback,
+    _validate_diarize,
+    _validate_single_input,
+    transcribe_when_free,
+)
+from core.config import DIARIZE_DEFAULT, JOB_AUDIO_DIR, STT_RETRY_AFTER_SEC
+import core.http_client as http_client
+import services.jobs as jobs
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+_PUBLIC_FIELDS = (
+    "id",
+    "status",
+    "priority",
+    "stage",
+    "progress",
+    "error",
+    "created_at",
+    "started_at",
+    "finished_at",
+)
+
+
+def _persist_upload(temp_path):
+    # Uploads are moved out of TEMP_DIR so queued jobs survive a restart.
+    os.makedirs(JOB_AUDIO_DIR, exist_ok=True)
+    job_audio_path = os.path.join(JOB_AUDIO_DIR, f"{uuid.uuid4().hex}.audio")
+    shutil.move(temp_path, job_audio_path)
+    return job_audio_path
+
+
+def run_job(job, report):
+    request = job["request"]
+    remote = None
+    path = job.get("audio_path")
+    audio_hash = None
+    cache_as = None
+    if path and not os.path.exists(path):
+        raise jobs.JobError("Uploaded audio for this job is no longer available; submit it again.")
+    if not path and not request.get("audio_url"):
+        raise jobs.JobError("Job has neither an uploaded file nor an audio_url.")
+
+    try:
+        if not path:
+            report("downloading", 0.02)
+            try:
+                remote = http_client.run_sync(_fetch_remote_audio(request["audio_url"]))
+            except HTTPException as exc:
+                raise jobs.JobError(exc.detail)
+            path = remote["path"]
+            audio_hash = remote["audio_hash"]
+            cache_as = remote["cache_as"]
+
+        report("transcribing", 0.1)
+        # Decoding goes through the shared executor, so jobs count against
+        # STT_WORKERS / STT_MAX_PENDING like requests do and wait for a slot.
+        try:
+            segments = http_client.run_sync(
+                transcribe_when_free(
+                    path, request["use_cache"], request["diarize"], audio_hash, cache_as, retries=None
+                )
+            )
+        except HTTPException as exc:
+            raise jobs.JobError(exc.detail)
+    finally:
+        _release_remote_audio(remote)
+
+    result = _add_diarize_warning({"segments": segments}, request["diarize"])
+    if request["summary"]:
+        report("summarizing", 0.85)
+        full_text = _build_full_text(segments)
+        summary, summary_error = _summarize_with_fallback(full_text)
+        result["full_text"] = full_text
+        result["summary"] = summary
+        if summary_error:
+            result["summary_error"] = summary_error
+    return result
+
+
+@router.post("/jobs", status_code=202)
+async def create_job(
+    file: Optional[UploadFile] = File(default=None),
+    audio_url: Optional[str] = Form(default=None),
+    summary: bool = Form(default=False),
+    use_cache: bool = Form(default=True),
+    diarize: str = Form(default=DIARIZE_DEFAULT),
+    priority: int = Form(default=0, ge=-10, le=10),
+):
+    _validate_single_input(file, audio_url)
+    request = {
+        "audio_url": _normalize_audio_url(audio_url) if file is None else None,
+        "summary": summary,
+        "use_cache": use_cache,
+        "diarize": _validate_diarize(diarize),
+    }
+
+    audio_path = None
+    if file is not None:
+        audio_path = _persist_upload(await _save_upload_file(file))
+
+    try:
+        job_id = jobs.submit(request, priority=priority, audio_path=audio_path)
+    except jobs.JobQueueFullError as exc:
+        _safe_remove(audio_path)
+        raise HTTPException(
+            status_code=503,
+            detail=str(exc),
+            headers={"Retry-After": str(STT_RETRY_AFTER_SEC)},
+        )
+    except Exception:
+        _safe_remove(audio_path)
+        raise
+
+    return {"id": job_id, "status": "queued", "priority": priority}
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+
+    response = {field: job.get(field) for field in _PUBLIC_FIELDS}
+    if job["status"] == "succeeded":
+        response["result"] = job.get("result")
+    return response
@@ -0,0 +1,180 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from api.health_routes import _process_memory
+import core.http_client as http_client
+import core.loader as loader
+from core.batching import get_batch_size_counts, get_batching_status
+from core.config import INFER_MAX_BATCH_SIZE
+from core.executor import get_executor_status
+from core.timings import get_stage_histograms
+import services.audio_cache as audio_cache
+import services.diarization as diarization
+import services.jobs as jobs
+import services.summary_cache as summary_cache
+import services.transcript_cache as transcript_cache
+import services.vad as vad
+
+router = APIRouter()
+
+_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _sample(lines, name, value, labels=None):
+    if value is None:
+        return
+    if labels:
+        label_text = ",".join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+        name = f"{name}{{{label_text}}}"
+    lines.append(f"{name} {value!r}" if isinstance(value, float) else f"{name} {int(value)}")
+
+
+def _header(lines, name, metric_type, help_text):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {metric_type}")
+
+
+def _histogram(lines, name, labels, buckets, count, total):
+    for bound, cumulative in buckets:
+        _sample(lines, f"{name}_bucket", cumulative, dict(labels, le=f"{bound:g}"))
+    _sample(lines, f"{name}_bucket", count, dict(labels, le="+Inf"))
+    _sample(lines, f"{name}_sum", float(total), labels)
+    _sample(lines, f"{name}_count", count, labels)
+
+
+def _stage_metrics(lines):
+    name = "stt_stage_duration_seconds"
+    _header(lines, name, "histogram", "Wall time of each pipeline stage.")
+    for stage, histogram in get_stage_histograms().items():
+        _histogram(lines, name, {"stage": stage}, histogram["buckets"], histogram["count"], histogram["sum"])
+
+
+def _batching_metrics(lines):
+    batching = get_batching_status()
+    _header(lines, "stt_inference_queue_depth", "gauge", "Decode windows waiting for the batch scheduler.")
+    _sample(lines, "stt_inference_queue_depth", batching["queue_depth"])
+    _header(lines, "stt_inference_queue_capacity", "gauge", "Maximum decode windows the scheduler queues.")
+    _sample(lines, "stt_inference_queue_capacity", batching["queue_capacity"])
+
+    replicas = loader.get_replica_status()
+    _header(lines, "stt_replica_load", "gauge", "Decode windows queued or running on each model replica.")
+    for replica in replicas:
+        _sample(lines, "stt_replica_load", replica["load"], {"replica": replica["index"], "device": replica["device"]})
+    _header(lines, "stt_replica_batches_total", "counter", "Batches run by each model replica.")
+    for replica in replicas:
+        _sample(lines, "stt_replica_batches_total", replica["batches"], {"replica": replica["index"], "device": replica["device"]})
+
+    counts = get_batch_size_counts()
+    buckets = []
+    cumulative = 0
+    for size in range(1, INFER_MAX_BATCH_SIZE + 1):
+        cumulative += counts.get(size, 0)
+        buckets.append((size, cumulative))
+    name = "stt_inference_batch_size"
+    _header(lines, name, "histogram", "Decode windows per model forward pass.")
+    _histogram(
+        lines,
+        name,
+        {},
+        buckets,
+        sum(counts.values()),
+        float(sum(size * count for size, count in counts.items())),
+    )
+
+
+def _executor_metrics(lines):
+    executor = get_executor_status()
+    _header(lines, "stt_requests_in_flight", "gauge", "Transcriptions running or queued on the executor.")
+    _sample(lines, "stt_requests_in_flight", executor["in_flight"])
+    _header(lines, "stt_requests_rejected_total", "counter", "Transcriptions rejected with 503 because the executor was full.")
+    _sample(lines, "stt_requests_rejected_total", executor["rejected"])
+
+    job_status = jobs.get_jobs_status()
+    _header(lines, "stt_job_queue_depth", "gauge", "Async jobs waiting for a worker.")
+    _sample(lines, "stt_job_queue_depth", job_status["queue_depth"])
+    _header(lines, "stt_jobs", "gauge", "Stored async jobs by status.")
+    for status, total in sorted(job_status["by_status"].items()):
+        _sample(lines, "stt_jobs", total, {"status": status})
+
+
+def _cache_metrics(lines):
+    caches = {
+        "transcript": transcript_cache.get_cache_status(),
+        "summary": summary_cache.get_cache_status(),
+        "audio": audio_cache.get_cache_status(),
+        "diarization": diarization.get_cache_status(),
+    }
+    _header(lines, "stt_cache_hits_total", "counter", "Cache lookups that found an entry.")
+    for cache, status in caches.items():
+        _sample(lines, "stt_cache_hits_total", status["hits"], {"cache": cache})
+    _header(lines, "stt_cache_misses_total", "counter", "Cache lookups that found nothing.")
+    for cache, status in caches.items():
+        _sample(lines, "stt_cache_misses_total", status["misses"], {"cache": cache})
+    _header(lines, "stt_cache_evictions_total", "counter", "Entries evicted to respect the cache limit.")
+    for cache, status in caches.items():
+        _sample(lines, "stt_cache_evictions_total", status.get("evictions"), {"cache": cache})
+    _header(lines, "stt_cache_size_bytes", "gauge", "Bytes used by on-disk caches.")
+    for cache, status in caches.items():
+        _sample(lines, "stt_cache_size_bytes", status.get("size_bytes"), {"cache": cache})
+
+
+def _loader_metrics(lines):
+    components = loader.get_component_status()
+    _header(lines, "stt_component_ready", "gauge", "1 when a model component finished loading.")
+    for name, component in components.items():
+        _sample(lines, "stt_component_ready", int(component["state"] == "ready"), {"component": name})
+    _header(lines, "stt_model_load_seconds", "gauge", "Time spent loading each model component.")
+    for name, component in components.items():
+        _sample(lines, "stt_model_load_seconds", component.get("seconds"), {"component": name})
+
+
+def _http_metrics(lines):
+    status = http_client.get_http_status()
+    for key, name, help_text in (
+        ("downloads", "stt_http_downloads_total", "Remote audio downloads completed."),
+        ("failed", "stt_http_download_failures_total", "Remote audio downloads that failed."),
+        ("retries", "stt_http_download_retries_total", "Interrupted downloads that were retried."),
+        ("resumed", "stt_http_download_resumes_total", "Retries resumed with an HTTP Range request."),
+        ("not_modified", "stt_http_not_modified_total", "Conditional requests answered 304."),
+        ("bytes", "stt_http_download_bytes_total", "Bytes downloaded."),
+    ):
+        _header(lines, name, "counter", help_text)
+        _sample(lines, name, status[key])
+
+
+def _vad_metrics(lines):
+    status = vad.get_vad_status()
+    _header(lines, "stt_vad_audio_seconds_total", "counter", "Audio seen by the voice activity detector.")
+    _sample(lines, "stt_vad_audio_seconds_total", float(status["audio_sec"]))
+    _header(lines, "stt_vad_skipped_seconds_total", "counter", "Audio the voice activity detector kept out of decoding.")
+    _sample(lines, "stt_vad_skipped_seconds_total", float(status["skipped_sec"]))
+
+
+def render_metrics():
+    lines = []
+    _stage_metrics(lines)
+    _batching_metrics(lines)
+    _executor_metrics(lines)
+    _cache_metrics(lines)
+    _loader_metrics(lines)
+    _http_metrics(lines)
+    _vad_metrics(lines)
+
+    # Without /proc only the high-water mark is known, which gets its own name.
+    memory = _process_memory()
+    if "rss_bytes" in memory:
+        _header(lines, "process_resident_memory_bytes", "gauge", "Resident set size of this worker.")
+        _sample(lines, "process_resident_memory_bytes", memory["rss_bytes"])
+    if "peak_rss_bytes" in memory:
+        _header(lines, "process_peak_resident_memory_bytes", "gauge", "Peak resident set size of this worker.")
+        _sample(lines, "process_peak_resident_memory_bytes", memory["peak_rss_bytes"])
+    return "\n".join(lines) + "\n"
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type=_CONTENT_TYPE)
@@ -1,5 +1,7 @@
 from fastapi import APIRouter
+from api.batch_routes import router as batch_router
 from api.health_routes import router as health_router
+from api.job_routes import router as job_router
 from api.stt_routes import router as stt_router
 from api.summary_routes import router as summary_router
 
@@ -10,6 +12,8 @@ router.include_router(health_router, tags=["Health"])
 
 # group STT
 router.include_router(stt_router, prefix="/stt", tags=["Speech To Text"])
+router.include_router(job_router, prefix="/stt", tags=["Speech To Text"])
+router.include_router(batch_router, prefix="/stt", tags=["Speech To Text"])
 
 # group AI (Gemini)
 router.include_router(summary_router, prefix="/ai", tags=["AI Processing"])
@@ -1,34 +1,84 @@
+import asyncio
+import json
 import logging
 import os
 import tempfile
+import time
 from typing import Optional
 from urllib.parse import urlparse
 
-import requests
-from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi import (
+    APIRouter,
+    File,
+    Form,
+    HTTPException,
+    UploadFile,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, HttpUrl
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 
 import core.loader as loader
+from core.batching import BatchQueueFullError
 from core.config import (
+    AUDIO_CACHE_ENABLED,
+    DIARIZE_DEFAULT,
+    DIARIZE_MODES,
+    LONGFORM_ENABLED,
+    LONGFORM_MIN_SEC,
     REMOTE_AUDIO_MAX_SIZE_BYTES,
-    REMOTE_AUDIO_TIMEOUT_SEC,
+    REMOTE_AUDIO_STREAMING,
+    STT_EXECUTOR,
+    STT_PIPELINE,
+    STT_RETRY_AFTER_SEC,
     TEMP_DIR,
+    TRANSCRIPT_CACHE_ENABLED,
     UPLOAD_MAX_SIZE_BYTES,
+    VAD_ENABLED,
 )
+from core.executor import run_blocking
+import core.http_client as http_client
+from core.timings import timed
+import services.audio_cache as audio_cache
+import services.diarization as diarization
+import services.transcript_cache as transcript_cache
+from services.audio import DecodedAudio, GrowingFile, StreamingDecodeError, decode_stream
+from services.longform import file_transcriber, probe_duration, transcribe_long_audio
 from services.pipeline import run_pipeline
+import services.recognizer as recognizer
+from services.streaming import StreamingSession
 from services.summary import (
     SummaryPermissionDeniedError,
     SummaryServiceError,
     is_summary_available,
-    summarize_text,
 )
+from services.summary_cache import summarize_text_cached
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+_CHUNK_SIZE = 1024 * 1024
+_BUSY_RETRIES = 3
+
+# final: one JSON body. two_pass: NDJSON events, a greedy draft first and
+# the beam/LM result after it. sse: the same events as server-sent events.
+RESPONSE_MODES = ("final", "two_pass", "sse")
+_RESPONSE_MEDIA_TYPES = {
+    "two_pass": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
 
 class AudioURLRequest(BaseModel):
     audio_url: HttpUrl
+    use_cache: bool = True
+    diarize: str = DIARIZE_DEFAULT
+    include_timings: bool = False
+    response_mode: str = "final"
+    latency_budget_ms: Optional[int] = None
 
 
 def _safe_remove(path):
@@ -56,6 +106,12 @@ def _create_temp_audio_path():
 def _ensure_stt_ready():
     if loader.is_stt_ready():
         return
+    if loader.load_error is None and loader.is_loading():
+        raise HTTPException(
+            status_code=503,
+            detail="STT model is still loading.",
+            headers={"Retry-After": str(STT_RETRY_AFTER_SEC)},
+        )
     raise HTTPException(
         status_code=503,
         detail=loader.load_error or "STT backend is not ready.",
@@ -85,80 +141,323 @@ def _normalize_audio_url(audio_url):
 
 
 async def _save_upload_file(upload_file):
-    data = await upload_file.read()
-    if not data:
-        raise HTTPException(status_code=400, detail="Uploaded file is empty.")
-    if len(data) > UPLOAD_MAX_SIZE_BYTES:
+    declared_size = getattr(upload_file, "size", None)
+    if declared_size is not None and declared_size > UPLOAD_MAX_SIZE_BYTES:
         raise HTTPException(
             status_code=413,
             detail="Uploaded file is too large.",
         )
 
-    temp_path = _create_temp_audio_path()
-    with open(temp_path, "wb") as output_file:
-        output_file.write(data)
-    return temp_path
-
-
-def _download_audio(audio_url):
     temp_path = _create_temp_audio_path()
     total_bytes = 0
 
     try:
-        with requests.get(
-            audio_url,
-            stream=True,
-            timeout=REMOTE_AUDIO_TIMEOUT_SEC,
-        ) as response:
-            response.raise_for_status()
-
-            content_length = response.headers.get("content-length")
-            if content_length:
-                try:
-                    if int(content_length) > REMOTE_AUDIO_MAX_SIZE_BYTES:
-                        raise HTTPException(
-                            status_code=413,
-                            detail="Remote audio file is too large.",
-                        )
-                except ValueError:
-                    pass
-
-            with open(temp_path, "wb") as output_file:
-                for chunk in response.iter_content(chunk_size=1024 * 1024):
-                    if not chunk:
-                        continue
-                    total_bytes += len(chunk)
-                    if total_bytes > REMOTE_AUDIO_MAX_SIZE_BYTES:
-                        raise HTTPException(
-                            status_code=413,
-                            detail="Remote audio file is too large.",
-                        )
-                    output_file.write(chunk)
-
+        with open(temp_path, "wb") as output_file:
+            while True:
+                chunk = await upload_file.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+                total_bytes += len(chunk)
+                if total_bytes > UPLOAD_MAX_SIZE_BYTES:
+                    raise HTTPException(
+                        status_code=413,
+                        detail="Uploaded file is too large.",
+                    )
+                output_file.write(chunk)
+
+        if total_bytes == 0:
+            raise HTTPException(status_code=400, detail="Uploaded file is empty.")
         return temp_path
-    except HTTPException:
+    except BaseException:
         _safe_remove(temp_path)
         raise
-    except requests.RequestException as exc:
-        _safe_remove(temp_path)
-        raise HTTPException(
-            status_code=400,
-            detail=f"Unable to download audio_url: {exc}",
+
+
+async def _download_into(audio_url, temp_path, source=None, cached_validator=None, timings=None):
+    # source: optional GrowingFile fed as bytes arrive.
+    on_progress = source.progress if source is not None else None
+    try:
+        with open(temp_path, "wb") as output_file, timed("download", timings):
+            result = await http_client.download(
+                audio_url,
+                output_file,
+                REMOTE_AUDIO_MAX_SIZE_BYTES,
+                on_progress=on_progress,
+                cached_validator=cached_validator,
+            )
+    except http_client.DownloadError as exc:
+        if source is not None:
+            source.finish(exc)
+        raise HTTPException(status_code=exc.status_code, detail=exc.detail)
+    except BaseException as exc:
+        if source is not None:
+            source.finish(exc)
+        raise
+    if source is not None:
+        source.finish()
+    return result
+
+
+def _remote_audio(path, audio_hash=None, entry=None, cache_as=None):
+    # cache_as: (audio_url, validator) of a fresh download that is added to
+    # the audio cache by the transcription, which decodes it anyway.
+    return {"path": path, "audio_hash": audio_hash, "entry": entry, "cache_as": cache_as}
+
+
+async def _fetch_remote_audio(audio_url, timings=None):
+    # Serves audio_url from the decoded audio cache when possible, otherwise
+    # downloads it (conditionally when a stale copy exists). Pass the result's
+    # cache_as on to the transcription and the result to _release_remote_audio
+    # when done.
+    entry = audio_cache.lookup(audio_url)
+    if entry is not None and entry["fresh"]:
+        return _remote_audio(entry["path"], entry["audio_hash"], entry)
+
+    temp_path = _create_temp_audio_path()
+    try:
+        result = await _download_into(
+            audio_url,
+            temp_path,
+            cached_validator=entry["validator"] if entry else None,
+            timings=timings,
         )
+        if result["not_modified"]:
+            audio_cache.mark_validated(entry)
+            _safe_remove(temp_path)
+            return _remote_audio(entry["path"], entry["audio_hash"], entry)
+
+        audio_cache.release(entry)
+        entry = None
+        cache_as = (audio_url, result["validator"]) if AUDIO_CACHE_ENABLED else None
+        return _remote_audio(temp_path, cache_as=cache_as)
+    except BaseException:
+        audio_cache.release(entry)
+        _safe_remove(temp_path)
+        raise
+
+
+def _release_remote_audio(remote):
+    if not remote:
+        return
+    if remote["entry"] is not None:
+        audio_cache.release(remote["entry"])
+    else:
+        _safe_remove(remote["path"])
 
 
 def _build_full_text(segments):
     return " ".join(seg.get("text", "") for seg in segments if isinstance(seg, dict)).strip()
 
 
-def _transcribe_from_path(path):
-    segments = run_pipeline(path)
+def _cache_audio(cache_as, path, audio_hash=None, audio=None, timings=None):
+    # Adds a downloaded file to the audio cache (see _remote_audio), writing
+    # `audio` when it has already been decoded.
+    if cache_as is None:
+        return
+    audio_url, validator = cache_as
+    try:
+        with timed("audio_cache_store", timings):
+            audio_cache.release(audio_cache.store(audio_url, path, validator, audio_hash, audio))
+    except Exception as exc:
+        logger.warning("Could not cache audio from %s: %s", audio_url, exc)
+
+
+def _transcribe_staged(
+    path,
+    diarize=DIARIZE_DEFAULT,
+    timings=None,
+    draft=None,
+    deadline=None,
+    cache_as=None,
+    audio_hash=None,
+):
+    # Decode once; features, long-form splitting, diarization and the audio
+    # cache all read the same buffer. "auto" diarization is resolved from its
+    # duration.
+    with timed("load_audio", timings):
+        audio = DecodedAudio.from_path(path)
+    with audio:
+        _cache_audio(cache_as, path, audio_hash, audio, timings)
+        use_diarization = diarization.should_diarize(diarize, audio.duration)
+        try:
+            return recognizer.transcribe_audio(
+                audio,
+                diarize=use_diarization,
+                timings=timings,
+                draft=draft,
+                deadline=deadline,
+                audio_hash=audio_hash,
+            )
+        except BatchQueueFullError as exc:
+            raise HTTPException(status_code=503, detail=str(exc))
+
+
+def _transcribe_legacy(path, timings=None, audio_hash=None):
+    # run_pipeline takes a path and runs its own diarization; long inputs
+    # are still decoded once and handed over window by window. Speakers
+    # found per window are numbered per window, so they are replaced by one
+    # diarization of the whole recording, run alongside the windows.
+    if LONGFORM_ENABLED and probe_duration(path) >= LONGFORM_MIN_SEC:
+        with timed("load_audio", timings):
+            audio = DecodedAudio.from_path(path)
+        with audio:
+            speakers = diarization.submit(audio.waveform, audio_hash) if diarization.is_available() else None
+            try:
+                with timed("legacy_pipeline", timings):
+                    segments = transcribe_long_audio(audio, file_transcriber(run_pipeline))
+            except BaseException:
+                if speakers is not None:
+                    speakers.cancel()
+                raise
+            for segment in segments:
+                segment.pop("speaker", None)
+            return recognizer.finish_diarization(segments, speakers, timings)
+
+    with timed("legacy_pipeline", timings):
+        return run_pipeline(path)
+
+
+def _transcribe_from_path(
+    path,
+    diarize=DIARIZE_DEFAULT,
+    timings=None,
+    draft=None,
+    deadline=None,
+    cache_as=None,
+    audio_hash=None,
+):
+    # draft, deadline: see recognizer.transcribe_audio; the legacy pipeline
+    # has no separate greedy pass or adjustable beam and ignores both.
+    # cache_as: see _remote_audio.
+    if STT_PIPELINE == "staged":
+        segments = _transcribe_staged(path, diarize, timings, draft, deadline, cache_as, audio_hash)
+    else:
+        # run_pipeline decodes the file itself, so nothing can be shared.
+        _cache_audio(cache_as, path, audio_hash, timings=timings)
+        segments = _transcribe_legacy(path, timings, audio_hash)
     if not isinstance(segments, list):
         raise RuntimeError("Pipeline must return a list of segments.")
     return segments
 
 
-def _summarize_with_fallback(full_text):
+def _transcribe_with_cache(
+    path,
+    use_cache=True,
+    diarize=DIARIZE_DEFAULT,
+    audio_hash=None,
+    timings=None,
+    draft=None,
+    deadline=None,
+    cache_as=None,
+):
+    # audio_hash: hash of the original bytes when path is a decoded copy.
+    # cache_as: see _remote_audio.
+    # Transcripts decoded under a deadline may have used a narrowed beam, and
+    # those whose diarization failed lack speakers, so neither is written to
+    # the cache. Nor are those decoded while the settings changed (the LM
+    # finished loading mid-request): the key describes the settings used.
+    if not TRANSCRIPT_CACHE_ENABLED:
+        try:
+            return _transcribe_from_path(path, diarize, timings, draft, deadline, cache_as, audio_hash)
+        except diarization.DiarizationFailedError as exc:
+            return exc.segments
+
+    if audio_hash is None:
+        with timed("audio_hash", timings):
+            audio_hash = transcript_cache.hash_audio_file(path)
+    settings = transcript_cache.decode_settings()
+    cache_key = transcript_cache.build_cache_key(audio_hash, settings, diarize=_applied_diarize(diarize))
+    if use_cache:
+        cached = transcript_cache.get(cache_key)
+        if cached is not None:
+            _cache_audio(cache_as, path, audio_hash, timings=timings)
+            return cached
+
+    try:
+        segments = _transcribe_from_path(path, diarize, timings, draft, deadline, cache_as, audio_hash)
+    except diarization.DiarizationFailedError as exc:
+        return exc.segments
+    if deadline is None and transcript_cache.decode_settings() == settings:
+        transcript_cache.put(cache_key, segments)
+    return segments
+
+
+def _transcribe_with_timings(path, use_cache, diarize, audio_hash, draft=None, deadline=None, cache_as=None):
+    # Returns (segments, stage timings). The timings travel back with the
+    # result so they also work when STT_EXECUTOR=process.
+    timings = {}
+    segments = _transcribe_with_cache(path, use_cache, diarize, audio_hash, timings, draft, deadline, cache_as)
+    return segments, timings
+
+
+def _diarize_path(path, diarize, audio_hash=None):
+    with DecodedAudio.from_path(path) as audio:
+        if not diarization.should_diarize(diarize, audio.duration):
+            return None
+        return diarization.submit(audio.waveform, audio_hash).result()
+
+
+def _start_parent_diarization(path, diarize, audio_hash=None):
+    # With STT_EXECUTOR=process the workers load only the ASR model, so the
+    # speakers are found here, where the diarization pipeline lives, while a
+    # worker transcribes. That covers run_pipeline too, which diarizes only
+    # where a pipeline is loaded. Returns None when there is nothing to run.
+    if STT_EXECUTOR != "process":
+        return None
+    diarize = _applied_diarize(diarize)
+    if diarize == "off" or not diarization.is_available():
+        return None
+    return asyncio.ensure_future(run_in_threadpool(_diarize_path, path, diarize, audio_hash))
+
+
+async def _finish_parent_diarization(speakers, segments, timings=None):
+    if speakers is None:
+        return segments
+    try:
+        with timed("diarization_wait", timings):
+            result = await speakers
+    except Exception as exc:
+        logger.warning("Diarization failed; returning transcript without speakers: %s", exc)
+        return segments
+    if result is None:
+        return segments
+    return diarization.assign_speakers(segments, result["turns"])
+
+
+async def transcribe_when_free(
+    path,
+    use_cache,
+    diarize,
+    audio_hash=None,
+    cache_as=None,
+    retries=_BUSY_RETRIES,
+):
+    # Transcribes path for batch items and background jobs, which must not
+    # fail just because interactive traffic filled the executor: back off
+    # and retry like a well-behaved client would. retries=None waits for a
+    # free slot however long it takes (jobs).
+    speakers = _start_parent_diarization(path, diarize, audio_hash)
+    try:
+        attempt = 0
+        while True:
+            try:
+                segments = await run_blocking(
+                    _transcribe_with_cache, path, use_cache, diarize, audio_hash, None, None, None, cache_as
+                )
+                break
+            except HTTPException as exc:
+                if exc.status_code != 503 or attempt == retries:
+                    raise
+                attempt += 1
+                await asyncio.sleep(STT_RETRY_AFTER_SEC)
+    except BaseException:
+        if speakers is not None:
+            speakers.cancel()
+        raise
+    return await _finish_parent_diarization(speakers, segments)
+
+
+def _summarize_with_fallback(full_text, timings=None):
     clean_text = (full_text or "").strip()
     if not clean_text:
         return "", None
@@ -167,7 +466,8 @@ def _summarize_with_fallback(full_text):
         return "", "Summary service is not configured. Set GEMINI_API_KEY."
 
     try:
-        return summarize_text(clean_text), None
+        with timed("summary", timings):
+            return summarize_text_cached(clean_text), None
     except SummaryPermissionDeniedError as exc:
         logger.warning("Summary provider denied access: %s", exc)
         return "", str(exc)
@@ -179,30 +479,356 @@ def _summarize_with_fallback(full_text):
         return "", "Summary service is temporarily unavailable."
 
 
-async def _run_transcription(file=None, audio_url=None):
-    _ensure_stt_ready()
-    _validate_single_input(file, audio_url)
+def _validate_diarize(diarize):
+    mode = (diarize or DIARIZE_DEFAULT).strip().lower()
+    if mode not in DIARIZE_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"diarize must be one of: {', '.join(DIARIZE_MODES)}.",
+        )
+    return mode
+
+
+def _applied_diarize(diarize):
+    # run_pipeline (STT_PIPELINE=legacy) diarizes every request itself,
+    # whatever the mode or duration, so its transcripts are keyed as "on".
+    if STT_PIPELINE != "staged":
+        return "on"
+    return diarize
+
+
+def _diarize_warning(diarize):
+    # Set on responses whose diarize mode the legacy pipeline could not honour.
+    mode = (diarize or DIARIZE_DEFAULT).strip().lower()
+    if STT_PIPELINE == "staged" or mode == "on" or not diarization.is_available():
+        return None
+    return f"diarize={mode} is only applied with STT_PIPELINE=staged; speakers were diarized anyway."
+
+
+def _add_diarize_warning(response, diarize):
+    warning = _diarize_warning(diarize)
+    if warning:
+        response["diarize_warning"] = warning
+    return response
+
+
+def _can_stream_download():
+    # Streaming needs the staged recognizer, a thread executor (the source
+    # is shared with the download task) and no long-form split planning or
+    # VAD, which both look at the whole recording.
+    return (
+        REMOTE_AUDIO_STREAMING
+        and STT_PIPELINE == "staged"
+        and STT_EXECUTOR == "thread"
+        and not LONGFORM_ENABLED
+        and not VAD_ENABLED
+    )
+
 
-    temp_path = None
+def _transcribe_growing(source, path, use_cache, diarize, timings=None, draft=None, deadline=None):
+    cacheable = deadline is None
+    settings = transcript_cache.decode_settings() if TRANSCRIPT_CACHE_ENABLED else None
     try:
-        if file is not None:
-            temp_path = await _save_upload_file(file)
-        else:
-            temp_path = _download_audio(_normalize_audio_url(audio_url))
+        segments = recognizer.transcribe_stream(
+            decode_stream(source), diarize=diarize, timings=timings, draft=draft, deadline=deadline
+        )
+    except StreamingDecodeError as exc:
+        logger.info("Streaming decode unavailable, transcribing after download: %s", exc)
+        segments = None
+    except diarization.DiarizationFailedError as exc:
+        segments = exc.segments
+        cacheable = False
+    finally:
+        source.close()
+
+    source.wait_complete()
+    if segments is None or source.restarted:
+        return _transcribe_with_cache(path, use_cache, diarize, timings=timings, draft=draft, deadline=deadline)
+
+    if TRANSCRIPT_CACHE_ENABLED and cacheable and transcript_cache.decode_settings() == settings:
+        with timed("audio_hash", timings):
+            audio_hash = transcript_cache.hash_audio_file(path)
+        cache_key = transcript_cache.build_cache_key(audio_hash, settings, diarize=diarize)
+        transcript_cache.put(cache_key, segments)
+    return segments
+
 
-        return _transcribe_from_path(temp_path)
+def _cache_streamed_audio(audio_url, temp_path, validator):
+    try:
+        audio_cache.release(audio_cache.store(audio_url, temp_path, validator))
+    except Exception as exc:
+        logger.warning("Could not cache streamed audio: %s", exc)
+    finally:
+        _safe_remove(temp_path)
+
+
+async def _transcribe_url_streaming(audio_url, use_cache, diarize, timings=None, draft=None, deadline=None):
+    # Recognition starts while the file is still downloading, so the
+    # transcript cache is written but cannot be consulted. The finished file
+    # is added to the audio cache in the background.
+    temp_path = _create_temp_audio_path()
+    source = GrowingFile(temp_path)
+    download = asyncio.create_task(_download_into(audio_url, temp_path, source, timings=timings))
+    try:
+        try:
+            segments = await run_blocking(
+                _transcribe_growing, source, temp_path, use_cache, diarize, timings, draft, deadline
+            )
+        except Exception:
+            if source.error is not None:
+                # Surface the download failure (already mapped to HTTPException).
+                await download
+            raise
+        result = await download
+        if AUDIO_CACHE_ENABLED:
+            loop = asyncio.get_running_loop()
+            loop.run_in_executor(None, _cache_streamed_audio, audio_url, temp_path, result["validator"])
+            temp_path = None
+        return segments
     finally:
+        if not download.done():
+            download.cancel()
+            source.finish(asyncio.CancelledError())
         _safe_remove(temp_path)
 
 
+async def _run_transcription(
+    file=None,
+    audio_url=None,
+    use_cache=True,
+    diarize=DIARIZE_DEFAULT,
+    timings=None,
+    draft=None,
+    upload=None,
+    deadline=None,
+):
+    # timings: optional dict filled with per-stage seconds for this request.
+    # draft: see recognizer.transcribe_audio; only usable with a thread executor.
+    # upload: an upload already saved with _receive_upload, instead of file.
+    # deadline: see recognizer.transcribe_audio, from _latency_deadline.
+    _ensure_stt_ready()
+    _validate_single_input(file or upload, audio_url)
+    diarize = _validate_diarize(diarize)
+
+    with timed("transcription", timings):
+        if file is None and upload is None:
+            audio_url = _normalize_audio_url(audio_url)
+            if _can_stream_download() and not audio_cache.contains(audio_url):
+                return await _transcribe_url_streaming(audio_url, use_cache, diarize, timings, draft, deadline)
+
+        remote = upload
+        try:
+            if file is not None:
+                remote = await _receive_upload(file, timings)
+            elif upload is None:
+                remote = await _fetch_remote_audio(audio_url, timings)
+
+            speakers = _start_parent_diarization(remote["path"], diarize, remote["audio_hash"])
+            try:
+                segments, stage_timings = await run_blocking(
+                    _transcribe_with_timings,
+                    remote["path"],
+                    use_cache,
+                    diarize,
+                    remote["audio_hash"],
+                    draft,
+                    deadline,
+                    remote["cache_as"],
+                )
+            except BaseException:
+                if speakers is not None:
+                    speakers.cancel()
+                raise
+            segments = await _finish_parent_diarization(speakers, segments, timings)
+        finally:
+            _release_remote_audio(remote)
+
+    if timings is not None:
+        timings.update(stage_timings)
+    return segments
+
+
+async def _receive_upload(file, timings=None):
+    with timed("upload", timings):
+        return _remote_audio(await _save_upload_file(file))
+
+
+def _latency_deadline(latency_budget_ms):
+    # The budget counts from the request's arrival; beam search narrows its
+    # beam to finish within whatever is left of it.
+    if latency_budget_ms is None:
+        return None
+    if latency_budget_ms <= 0:
+        raise HTTPException(status_code=400, detail="latency_budget_ms must be a positive integer.")
+    return time.time() + latency_budget_ms / 1000.0
+
+
+def _validate_response_mode(response_mode):
+    response_mode = (response_mode or "").strip().lower()
+    if response_mode not in RESPONSE_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"response_mode must be one of: {', '.join(RESPONSE_MODES)}.",
+        )
+    return response_mode
+
+
+def _can_send_drafts():
+    # Drafts come from the staged recognizer through a callback, which
+    # cannot cross into a worker process.
+    return STT_PIPELINE == "staged" and STT_EXECUTOR == "thread"
+
+
+def _event_text(event, response_mode):
+    payload = json.dumps(event, ensure_ascii=False)
+    if response_mode == "sse":
+        return f"event: {event['type']}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+
+async def _two_pass_events(response_mode, audio_url, upload, use_cache, diarize, timings, summary, deadline=None):
+    # Emits "draft" events with greedy segments (several for long-form
+    # input, each adding new audio) while beam search and the LM run, then a
+    # "final" event whose segments replace every draft. Summary endpoints
+    # add a "summary" event after it. Failures end the stream with "error".
+    loop = asyncio.get_running_loop()
+    drafts = asyncio.Queue()
+    draft = None
+    if _can_send_drafts():
+        def draft(segments):
+            loop.call_soon_threadsafe(drafts.put_nowait, segments)
+
+    transcription = asyncio.ensure_future(
+        _run_transcription(
+            audio_url=audio_url,
+            use_cache=use_cache,
+            diarize=diarize,
+            timings=timings,
+            draft=draft,
+            upload=upload,
+            deadline=deadline,
+        )
+    )
+    try:
+        while not transcription.done():
+            next_draft = asyncio.ensure_future(drafts.get())
+            await asyncio.wait({next_draft, transcription}, return_when=asyncio.FIRST_COMPLETED)
+            if not next_draft.done():
+                next_draft.cancel()
+            elif next_draft.result():
+                yield _event_text({"type": "draft", "segments": next_draft.result()}, response_mode)
+        while not drafts.empty():
+            segments = drafts.get_nowait()
+            if segments:
+                yield _event_text({"type": "draft", "segments": segments}, response_mode)
+        segments = transcription.result()
+
+        if not summary:
+            yield _event_text(dict(_transcription_response(segments, timings, diarize), type="final"), response_mode)
+            return
+
+        full_text = _build_full_text(segments)
+        final = {"type": "final", "segments": segments, "full_text": full_text}
+        yield _event_text(_add_diarize_warning(final, diarize), response_mode)
+        summary_text, summary_error = await run_in_threadpool(_summarize_with_fallback, full_text, timings)
+        event = {"type": "summary", "summary": summary_text}
+        if summary_error:
+            event["summary_error"] = summary_error
+        yield _event_text(_add_timings(event, timings), response_mode)
+    except HTTPException as exc:
+        yield _event_text({"type": "error", "status_code": exc.status_code, "detail": exc.detail}, response_mode)
+    except Exception as exc:
+        logger.exception("Two-pass transcription failed: %s", exc)
+        yield _event_text({"type": "error", "status_code": 500, "detail": "Transcription failed."}, response_mode)
+    finally:
+        if not transcription.done():
+            transcription.cancel()
+
+
+async def _two_pass_response(
+    response_mode,
+    file,
+    audio_url,
+    use_cache,
+    diarize,
+    timings,
+    summary=False,
+    deadline=None,
+):
+    # Input is validated and an upload saved before the response starts, so
+    # those errors keep their status code and the file outlives the request
+    # body. The upload is released again once the stream ends.
+    _ensure_stt_ready()
+    _validate_single_input(file, audio_url)
+    diarize = _validate_diarize(diarize)
+    upload = await _receive_upload(file, timings) if file is not None else None
+
+    return StreamingResponse(
+        _two_pass_events(response_mode, audio_url, upload, use_cache, diarize, timings, summary, deadline),
+        media_type=_RESPONSE_MEDIA_TYPES[response_mode],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(_release_remote_audio, upload),
+    )
+
+
+def _add_timings(response, timings):
+    # timings carries per-stage seconds plus, from the recognizer, the VAD's
+    # figures for this request, which are reported as their own field.
+    if timings is None:
+        return response
+    timings = dict(timings)
+    vad_stats = timings.pop("vad_stats", None)
+    response["timings"] = timings
+    if vad_stats is not None:
+        response["vad"] = vad_stats
+    return response
+
+
+def _transcription_response(segments, timings, diarize=None):
+    return _add_timings(_add_diarize_warning({"segments": segments}, diarize), timings)
+
+
+async def _summary_response(segments, timings, diarize=None):
+    full_text = _build_full_text(segments)
+    summary, summary_error = await run_in_threadpool(_summarize_with_fallback, full_text, timings)
+
+    response = {
+        "segments": segments,
+        "full_text": full_text,
+        "summary": summary,
+    }
+    if summary_error:
+        response["summary_error"] = summary_error
+    return _add_timings(_add_diarize_warning(response, diarize), timings)
+
+
 @router.post("/transcribe")
 async def transcribe_audio(
     file: Optional[UploadFile] = File(default=None),
     audio_url: Optional[str] = Form(default=None),
+    use_cache: bool = Form(default=True),
+    diarize: str = Form(default=DIARIZE_DEFAULT),
+    include_timings: bool = Form(default=False),
+    response_mode: str = Form(default="final"),
+    latency_budget_ms: Optional[int] = Form(default=None),
 ):
+    timings = {} if include_timings else None
+    deadline = _latency_deadline(latency_budget_ms)
+    response_mode = _validate_response_mode(response_mode)
+    if response_mode != "final":
+        return await _two_pass_response(
+            response_mode, file, audio_url, use_cache, diarize, timings, deadline=deadline
+        )
     try:
-        segments = await _run_transcription(file=file, audio_url=audio_url)
-        return {"segments": segments}
+        segments = await _run_transcription(
+            file=file,
+            audio_url=audio_url,
+            use_cache=use_cache,
+            diarize=diarize,
+            timings=timings,
+            deadline=deadline,
+        )
+        return _transcription_response(segments, timings, diarize)
     except HTTPException:
         raise
     except Exception as exc:
@@ -212,9 +838,22 @@ async def transcribe_audio(
 
 @router.post("/transcribe-url")
 async def transcribe_audio_url(req: AudioURLRequest):
+    timings = {} if req.include_timings else None
+    deadline = _latency_deadline(req.latency_budget_ms)
+    response_mode = _validate_response_mode(req.response_mode)
+    if response_mode != "final":
+        return await _two_pass_response(
+            response_mode, None, str(req.audio_url), req.use_cache, req.diarize, timings, deadline=deadline
+        )
     try:
-        segments = await _run_transcription(audio_url=str(req.audio_url))
-        return {"segments": segments}
+        segments = await _run_transcription(
+            audio_url=str(req.audio_url),
+            use_cache=req.use_cache,
+            diarize=req.diarize,
+            timings=timings,
+            deadline=deadline,
+        )
+        return _transcription_response(segments, timings, req.diarize)
     except HTTPException:
         raise
     except Exception as exc:
@@ -226,20 +865,29 @@ async def transcribe_audio_url(req: AudioURLRequest):
 async def transcribe_and_summary(
     file: Optional[UploadFile] = File(default=None),
     audio_url: Optional[str] = Form(default=None),
+    use_cache: bool = Form(default=True),
+    diarize: str = Form(default=DIARIZE_DEFAULT),
+    include_timings: bool = Form(default=False),
+    response_mode: str = Form(default="final"),
+    latency_budget_ms: Optional[int] = Form(default=None),
 ):
+    timings = {} if include_timings else None
+    deadline = _latency_deadline(latency_budget_ms)
+    response_mode = _validate_response_mode(response_mode)
+    if response_mode != "final":
+        return await _two_pass_response(
+            response_mode, file, audio_url, use_cache, diarize, timings, summary=True, deadline=deadline
+        )
     try:
-        segments = await _run_transcription(file=file, audio_url=audio_url)
-        full_text = _build_full_text(segments)
-        summary, summary_error = _summarize_with_fallback(full_text)
-
-        response = {
-            "segments": segments,
-            "full_text": full_text,
-            "summary": summary,
-        }
-        if summary_error:
-            response["summary_error"] = summary_error
-        return response
+        segments = await _run_transcription(
+            file=file,
+            audio_url=audio_url,
+            use_cache=use_cache,
+            diarize=diarize,
+            timings=timings,
+            deadline=deadline,
+        )
+        return await _summary_response(segments, timings, diarize)
     except HTTPException:
         raise
     except Exception as exc:
@@ -249,21 +897,89 @@ async def transcribe_and_summary(
 
 @router.post("/transcribe-summary-url")
 async def transcribe_and_summary_url(req: AudioURLRequest):
+    timings = {} if req.include_timings else None
+    deadline = _latency_deadline(req.latency_budget_ms)
+    response_mode = _validate_response_mode(req.response_mode)
+    if response_mode != "final":
+        return await _two_pass_response(
+            response_mode,
+            None,
+            str(req.audio_url),
+            req.use_cache,
+            req.diarize,
+            timings,
+            summary=True,
+            deadline=deadline,
+        )
     try:
-        segments = await _run_transcription(audio_url=str(req.audio_url))
-        full_text = _build_full_text(segments)
-        summary, summary_error = _summarize_with_fallback(full_text)
-
-        response = {
-            "segments": segments,
-            "full_text": full_text,
-            "summary": summary,
-        }
-        if summary_error:
-            response["summary_error"] = summary_error
-        return response
+        segments = await _run_transcription(
+            audio_url=str(req.audio_url),
+            use_cache=req.use_cache,
+            diarize=req.diarize,
+            timings=timings,
+            deadline=deadline,
+        )
+        return await _summary_response(segments, timings, req.diarize)
     except HTTPException:
         raise
     except Exception as exc:
         logger.exception("Transcription + summary by URL failed: %s", exc)
         raise HTTPException(status_code=500, detail="Transcription or summary failed.")
+
+
+async def _run_session(func, *args):
+    # Session state lives in this process, so with STT_EXECUTOR=process the
+    # work stays on the threadpool; otherwise it goes through the inference
+    # executor and counts against its capacity.
+    if STT_EXECUTOR != "thread":
+        return await run_in_threadpool(func, *args)
+    return await run_blocking(func, *args)
+
+
+@router.websocket("/stream")
+async def stream_transcription(websocket: WebSocket):
+    await websocket.accept()
+    if not loader.is_stt_ready():
+        await websocket.send_json(
+            {"type": "error", "detail": loader.load_error or "STT backend is not ready."}
+        )
+        await websocket.close(code=1013)
+        return
+
+    session = StreamingSession()
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            if message.get("bytes") is not None:
+                events = await _run_session(session.add_pcm, message["bytes"])
+                for event in events:
+                    await websocket.send_json(event)
+                continue
+
+            try:
+                control = json.loads(message.get("text") or "{}")
+            except ValueError:
+                control = {}
+
+            if isinstance(control, dict) and control.get("event") == "end":
+                events = await _run_session(session.flush)
+                for event in events:
+                    await websocket.send_json(event)
+                await websocket.close()
+                break
+    except WebSocketDisconnect:
+        pass
+    except BatchQueueFullError as exc:
+        await websocket.send_json({"type": "error", "detail": str(exc)})
+        await websocket.close(code=1013)
+    except HTTPException as exc:
+        # Only the executor's busy_error() is raised in here.
+        await websocket.send_json({"type": "error", "detail": exc.detail})
+        await websocket.close(code=1013)
+    except Exception as exc:
+        logger.exception("Streaming transcription failed: %s", exc)
+        await websocket.send_json({"type": "error", "detail": "Streaming transcription failed."})
+        await websocket.close(code=1011)
@@ -7,8 +7,8 @@ from services.summary import (
     SummaryPermissionDeniedError,
     SummaryServiceError,
     is_summary_available,
-    summarize_text,
 )
+from services.summary_cache import summarize_text_cached
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -27,7 +27,7 @@ def summary_api(req: SummaryRequest):
         )
 
     try:
-        result = summarize_text(req.text)
+        result = summarize_text_cached(req.text)
     except SummaryPermissionDeniedError as exc:
         logger.warning("Summary access denied: %s", exc)
         raise HTTPException(status_code=502, detail=str(exc))
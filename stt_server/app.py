@@ -5,6 +5,9 @@ from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
+import core.loader as loader
+from api.job_routes import run_job
+from api.metrics_routes import router as metrics_router
 from api.routes import router
 from core.config import (
     CORS_ALLOW_CREDENTIALS,
@@ -12,7 +15,9 @@ from core.config import (
     CORS_ALLOWED_METHODS,
     CORS_ALLOWED_ORIGINS,
 )
-from core.loader import load_all
+from core.executor import shutdown_executor
+import core.http_client as http_client
+import services.jobs as jobs
 
 logging.basicConfig(
     level=logging.INFO,
@@ -42,11 +47,24 @@ app.add_middleware(
 
 
 @app.on_event("startup")
-def startup():
-    load_all()
+async def startup():
+    # serve.py preloads in the parent process; forked workers reuse it.
+    # Otherwise load in the background so the server accepts traffic at once
+    # and /api/health/ready reports progress.
+    if not loader.preloaded:
+        loader.start_loading()
+    http_client.bind_loop()
+    jobs.start(run_job)
     logger.info("STT backend startup complete")
 
 
+@app.on_event("shutdown")
+async def shutdown():
+    jobs.shutdown()
+    shutdown_executor()
+    await http_client.close()
+
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     return JSONResponse(
@@ -73,3 +91,5 @@ def root():
 
 
 app.include_router(router)
+# Prometheus scrapes /metrics at the root by convention.
+app.include_router(metrics_router)
@@ -0,0 +1,325 @@
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.metrics import error_rates  # noqa: E402
+from util.decoder_vectorized import (  # noqa: E402
+    KenLMStateCache,
+    SPECIAL_TOKENS,
+    WORD_DELIMITERS,
+    _candidate_tokens,
+    prefix_beam_search,
+)
+
+SYNTHETIC_VOCAB = ["<pad>", "<unk>", "|"] + list("abcdeghiklmnopqrstuvxy")
+
+
+def _log_add(a, b):
+    if a == -math.inf:
+        return b
+    if b == -math.inf:
+        return a
+    high, low = (a, b) if a > b else (b, a)
+    return high + math.log1p(math.exp(low - high))
+
+
+def reference_prefix_beam_search(log_probs, vocab, blank_id, beam_width, lm=None, token_topk=40, token_min_logp=-10.0):
+    # Straightforward dict-based CTC prefix beam search with the same scoring
+    # rules as util.decoder_vectorized, used as the parity baseline.
+    delimiter_mask = np.array([token in WORD_DELIMITERS for token in vocab], dtype=bool)
+    allowed = np.array([token not in SPECIAL_TOKENS for token in vocab], dtype=bool)
+    allowed[blank_id] = False
+    info = {(): (lm.initial_context() if lm else (), "", 0.0)}
+
+    def prefix_info(prefix):
+        if prefix in info:
+            return info[prefix]
+        context, partial, lm_score = prefix_info(prefix[:-1])
+        token = prefix[-1]
+        if not delimiter_mask[token]:
+            result = (context, partial + vocab[token], lm_score)
+        elif partial and lm is not None:
+            result = (
+                lm.next_context(context, partial),
+                "",
+                lm_score + lm.score_word(context, partial),
+            )
+        else:
+            result = (context, "", lm_score)
+        info[prefix] = result
+        return result
+
+    beams = {(): (0.0, -math.inf)}
+    for frame_log_probs in np.asarray(log_probs, dtype=np.float64):
+        candidates = _candidate_tokens(frame_log_probs, allowed, token_topk, token_min_logp).tolist()
+        next_beams = {}
+        for prefix, (p_blank, p_non_blank) in beams.items():
+            total = _log_add(p_blank, p_non_blank)
+            entry = next_beams.setdefault(prefix, [-math.inf, -math.inf])
+            entry[0] = _log_add(entry[0], total + frame_log_probs[blank_id])
+            if prefix:
+                entry[1] = _log_add(entry[1], p_non_blank + frame_log_probs[prefix[-1]])
+            for token in candidates:
+                if prefix and prefix[-1] == token:
+                    value = p_blank + frame_log_probs[token]
+                else:
+                    value = total + frame_log_probs[token]
+                child = next_beams.setdefault(prefix + (token,), [-math.inf, -math.inf])
+                child[1] = _log_add(child[1], value)
+
+        ranked = sorted(
+            next_beams.items(),
+            key=lambda item: _log_add(*item[1]) + prefix_info(item[0])[2],
+            reverse=True,
+        )
+        beams = {prefix: tuple(probs) for prefix, probs in ranked[:beam_width]}
+
+    def final_score(item):
+        prefix, probs = item
+        context, partial, lm_score = prefix_info(prefix)
+        bonus = 0.0
+        if lm is not None:
+            if partial:
+                bonus += lm.score_word(context, partial)
+                context = lm.next_context(context, partial)
+            bonus += lm.score_end(context)
+        return _log_add(*probs) + lm_score + bonus
+
+    best, _ = max(beams.items(), key=final_score)
+    text = "".join(" " if delimiter_mask[token] else vocab[token] for token in best)
+    return " ".join(text.split())
+
+
+def synthesize(count, seed, noise, peak, silence_frames=0):
+    rng = np.random.default_rng(seed)
+    vocab = SYNTHETIC_VOCAB
+    blank_id = vocab.index("<pad>")
+    delimiter_id = vocab.index("|")
+    letters = list(range(3, len(vocab)))
+    lexicon = ["".join(vocab[i] for i in rng.choice(letters, size=rng.integers(2, 7))) for _ in range(200)]
+
+    corpus = []
+    for _ in range(count):
+        words = [lexicon[i] for i in rng.integers(0, len(lexicon), size=rng.integers(4, 16))]
+        targets = []
+        for index, word in enumerate(words):
+            if index:
+                targets.append(delimiter_id)
+                if silence_frames and rng.random() < 0.3:
+                    targets.extend([blank_id] * int(rng.integers(1, silence_frames + 1)))
+            targets.extend(vocab.index(char) for char in word)
+
+        frames = []
+        previous = None
+        for token in targets:
+            if token == blank_id:
+                frames.append(blank_id)
+                continue
+            blanks = rng.integers(0, 3)
+            if token == previous:
+                blanks = max(1, blanks)
+            frames.extend([blank_id] * blanks)
+            frames.extend([token] * rng.integers(1, 3))
+            previous = token
+        frames.extend([blank_id] * 2)
+
+        logits = rng.normal(0.0, noise, size=(len(frames), len(vocab)))
+        logits[np.arange(len(frames)), frames] += peak
+        log_probs = logits - np.logaddexp.reduce(logits, axis=1, keepdims=True)
+        corpus.append({"log_probs": log_probs, "reference": " ".join(words)})
+    return vocab, blank_id, corpus
+
+
+def load_corpus(logits_dir, vocab_path):
+    with open(vocab_path, encoding="utf-8") as vocab_file:
+        vocab = [line.rstrip("\n") for line in vocab_file]
+    corpus = []
+    for npy_path in sorted(Path(logits_dir).glob("*.npy")):
+        reference_path = npy_path.with_suffix(".txt")
+        reference = reference_path.read_text(encoding="utf-8").strip() if reference_path.exists() else ""
+        corpus.append({"log_probs": np.load(npy_path), "reference": reference})
+    return vocab, vocab.index("<pad>"), corpus
+
+
+def _run(decode, corpus):
+    hypotheses = []
+    started = time.perf_counter()
+    for item in corpus:
+        hypotheses.append(decode(item["log_probs"]))
+    return hypotheses, time.perf_counter() - started
+
+
+def _int_list(value):
+    return [int(part) for part in value.split(",") if part.strip()]
+
+
+def _tradeoff(corpus, references, decode_with, baseline_sec, min_beams, budgets_ms):
+    # One row per adaptive beam floor and per-utterance time budget, each
+    # decoding the whole corpus with the vectorized decoder.
+    configs = [{"min_beam_width": width} for width in min_beams]
+    configs += [{"budget_ms": budget} for budget in budgets_ms]
+    configs += [{"min_beam_width": width, "budget_ms": budget} for width in min_beams for budget in budgets_ms]
+    rows = []
+    for config in configs:
+        widths = []
+
+        def decode(log_probs):
+            budget_ms = config.get("budget_ms")
+            result = decode_with(
+                log_probs,
+                min_beam_width=config.get("min_beam_width"),
+                time_budget=budget_ms / 1000.0 if budget_ms else None,
+            )
+            widths.append(result["mean_beam_width"])
+            return result["text"]
+
+        hyps, seconds = _run(decode, corpus)
+        rows.append(
+            {
+                **config,
+                "seconds": round(seconds, 4),
+                "speedup": round(baseline_sec / seconds, 2) if seconds else None,
+                "mean_beam_width": round(sum(widths) / max(1, len(widths)), 2),
+                **error_rates(zip(references, hyps)),
+            }
+        )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized CTC decoder parity and speed benchmark.")
+    parser.add_argument("--utterances", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--noise", type=float, default=1.0)
+    parser.add_argument("--peak", type=float, default=5.0)
+    parser.add_argument("--silence-frames", type=int, default=0, help="Max length of synthetic pauses.")
+    parser.add_argument("--beam", type=int, default=int(os.getenv("BEAM_WIDTH", "150")))
+    parser.add_argument("--token-topk", type=int, default=40)
+    parser.add_argument("--token-min-logp", type=float, default=-10.0)
+    parser.add_argument("--score-margin", type=float, default=20.0)
+    parser.add_argument(
+        "--blank-skip-threshold",
+        type=float,
+        default=None,
+        help="Collapse blank-dominated frame runs before the vectorized decoder.",
+    )
+    parser.add_argument(
+        "--min-beams",
+        type=_int_list,
+        default=[],
+        help="Comma-separated adaptive beam floors to compare against the fixed --beam.",
+    )
+    parser.add_argument("--entropy-high", type=float, default=float(os.getenv("BEAM_ENTROPY_HIGH", "1.5")))
+    parser.add_argument(
+        "--budgets-ms",
+        type=_int_list,
+        default=[],
+        help="Comma-separated per-utterance beam search time budgets to compare.",
+    )
+    parser.add_argument("--kenlm", help="Optional KenLM binary shared by both decoders.")
+    parser.add_argument("--alpha", type=float, default=float(os.getenv("LM_ALPHA", "5.0")))
+    parser.add_argument("--beta", type=float, default=float(os.getenv("LM_BETA", "1.6")))
+    parser.add_argument("--logits-dir", help="Directory of <name>.npy log-probs with <name>.txt references.")
+    parser.add_argument("--vocab", help="Vocabulary file, required with --logits-dir.")
+    parser.add_argument("--json", dest="json_path", help="Write the report to this file.")
+    args = parser.parse_args()
+
+    if args.logits_dir:
+        if not args.vocab:
+            parser.error("--vocab is required with --logits-dir")
+        vocab, blank_id, corpus = load_corpus(args.logits_dir, args.vocab)
+    else:
+        vocab, blank_id, corpus = synthesize(
+            args.utterances,
+            args.seed,
+            args.noise,
+            args.peak,
+            silence_frames=args.silence_frames,
+        )
+
+    lm = None
+    if args.kenlm:
+        import kenlm
+
+        lm = KenLMStateCache(kenlm.Model(args.kenlm), alpha=args.alpha, beta=args.beta)
+
+    options = {"token_topk": args.token_topk, "token_min_logp": args.token_min_logp}
+    reference_hyps, reference_sec = _run(
+        lambda log_probs: reference_prefix_beam_search(log_probs, vocab, blank_id, args.beam, lm=lm, **options),
+        corpus,
+    )
+    decoded_frames = []
+
+    def decode_with(log_probs, **adaptive):
+        return prefix_beam_search(
+            log_probs,
+            vocab,
+            blank_id,
+            args.beam,
+            lm=lm,
+            score_margin=args.score_margin,
+            blank_skip_threshold=args.blank_skip_threshold,
+            entropy_high=args.entropy_high,
+            **adaptive,
+            **options,
+        )
+
+    def decode_vectorized(log_probs):
+        result = decode_with(log_probs)
+        decoded_frames.append(result["decoded_frames"])
+        return result["text"]
+
+    vectorized_hyps, vectorized_sec = _run(decode_vectorized, corpus)
+
+    references = [item["reference"] for item in corpus]
+    frames = sum(item["log_probs"].shape[0] for item in corpus)
+    report = {
+        "utterances": len(corpus),
+        "frames": frames,
+        "beam_width": args.beam,
+        "lm": bool(lm),
+        "reference": {
+            "seconds": round(reference_sec, 4),
+            **error_rates(zip(references, reference_hyps)),
+        },
+        "vectorized": {
+            "seconds": round(vectorized_sec, 4),
+            "decoded_frame_ratio": round(sum(decoded_frames) / max(1, frames), 4),
+            **error_rates(zip(references, vectorized_hyps)),
+        },
+        "parity": {
+            "exact_match": round(
+                sum(a == b for a, b in zip(reference_hyps, vectorized_hyps)) / max(1, len(corpus)),
+                4,
+            ),
+            **error_rates(zip(reference_hyps, vectorized_hyps)),
+        },
+        "speedup": round(reference_sec / vectorized_sec, 2) if vectorized_sec else None,
+    }
+    if args.min_beams or args.budgets_ms:
+        report["tradeoff"] = _tradeoff(
+            corpus,
+            references,
+            decode_with,
+            vectorized_sec,
+            args.min_beams,
+            args.budgets_ms,
+        )
+    if lm is not None:
+        report["lm_cache"] = lm.get_stats()
+
+    print(json.dumps(report, indent=2))
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import types
+from pathlib import Path
+
+import numpy as np
+import soundfile
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.metrics import error_rates, latency_summary  # noqa: E402
+
+SAMPLE_RATE = 16000
+DEFAULT_DURATIONS = "5,15,30,60"
+_COMPARED_KEYS = ("rtf", "p50", "p95", "p99", "throughput_rps", "peak_rss_bytes", "wer", "cer")
+
+
+class _OfflineSummaryError(RuntimeError):
+    pass
+
+
+def install_offline_stubs(summary_latency_sec=0.0):
+    # Keeps the run off the network: HF hub lookups fail fast, diarization
+    # stays disabled (no token) and Gemini is replaced by a local stand-in
+    # that returns the first 40 words of the transcript. Must run before
+    # any project module is imported because core.config reads the env.
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    os.environ["TRANSFORMERS_OFFLINE"] = "1"
+    for name in ("HF_TOKEN", "HUGGINGFACE_TOKEN", "GEMINI_API_KEY", "API_KEY"):
+        os.environ[name] = ""
+    sys.modules["core.local_tokens"] = types.ModuleType("core.local_tokens")
+
+    def summarize_text(text):
+        if summary_latency_sec:
+            time.sleep(summary_latency_sec)
+        return " ".join(text.split()[:40])
+
+    summary = types.ModuleType("services.summary")
+    summary.SummaryServiceError = _OfflineSummaryError
+    summary.SummaryPermissionDeniedError = _OfflineSummaryError
+    summary.is_summary_available = lambda: True
+    summary.summarize_text = summarize_text
+    sys.modules["services.summary"] = summary
+
+
+def peak_rss_bytes():
+    try:
+        with open("/proc/self/status", encoding="utf-8") as status_file:
+            for line in status_file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def synthesize_clip(path, duration, seed):
+    # Speech-like signal: a pitch-gliding harmonic source gated into 4 Hz
+    # "syllables", grouped into phrases separated by pauses, over low noise.
+    rng = np.random.default_rng(seed)
+    total = int(duration * SAMPLE_RATE)
+    t = np.arange(total) / SAMPLE_RATE
+
+    pitch = 120.0 + 30.0 * np.sin(2 * np.pi * 0.3 * t + rng.uniform(0, 2 * np.pi))
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 9))
+    syllables = np.clip(np.sin(2 * np.pi * 4.0 * t + rng.uniform(0, 2 * np.pi)), 0.0, 1.0) ** 2
+
+    gate = np.zeros(total, dtype=np.float64)
+    position = int(rng.uniform(0.1, 0.5) * SAMPLE_RATE)
+    while position < total:
+        length = int(rng.uniform(1.0, 4.0) * SAMPLE_RATE)
+        gate[position:position + length] = 1.0
+        position += length + int(rng.uniform(0.3, 1.5) * SAMPLE_RATE)
+
+    signal = 0.3 * voiced * syllables * gate + 0.003 * rng.standard_normal(total)
+    soundfile.write(path, signal.astype(np.float32), SAMPLE_RATE)
+
+
+def build_corpus(durations, seed, corpus_dir=None, work_dir=None):
+    # Synthetic clips (no reference text) plus recorded <name>.wav/.flac/...
+    # clips from corpus_dir with optional <name>.txt references.
+    corpus = []
+    for index, duration in enumerate(durations):
+        path = os.path.join(work_dir, f"synthetic_{index:02d}_{duration:g}s.wav")
+        synthesize_clip(path, duration, seed + index)
+        corpus.append({"name": Path(path).stem, "path": path, "duration": float(duration), "reference": None})
+
+    if corpus_dir:
+        for audio_path in sorted(Path(corpus_dir).iterdir()):
+            if audio_path.suffix.lower() not in {".wav", ".flac", ".mp3", ".ogg", ".m4a"}:
+                continue
+            reference_path = audio_path.with_suffix(".txt")
+            reference = reference_path.read_text(encoding="utf-8").strip() if reference_path.exists() else None
+            corpus.append(
+                {
+                    "name": audio_path.stem,
+                    "path": str(audio_path),
+                    "duration": soundfile.info(str(audio_path)).duration,
+                    "reference": reference,
+                }
+            )
+    return corpus
+
+
+def _hypothesis(segments):
+    return " ".join(seg.get("text", "") for seg in segments if isinstance(seg, dict)).strip()
+
+
+def _settings():
+    import core.config as config
+    import core.loader as loader
+
+    return {
+        "pipeline": config.STT_PIPELINE,
+        "checkpoint": config.CKPT_PATH,
+        "device": config.DEVICE,
+        "beam_width": config.BEAM_WIDTH,
+        "beam_min_width": config.BEAM_MIN_WIDTH,
+        "lm_alpha": config.LM_ALPHA,
+        "lm_beta": config.LM_BETA,
+        "lm": loader.get_runtime_status()["lm_ready"],
+        "infer_max_batch_size": config.INFER_MAX_BATCH_SIZE,
+        "stt_workers": config.STT_WORKERS,
+    }
+
+
+def _mean_stages(stage_runs):
+    totals = {}
+    for timings in stage_runs:
+        for stage, seconds in timings.items():
+            totals.setdefault(stage, []).append(seconds)
+    return {stage: round(sum(values) / len(values), 4) for stage, values in sorted(totals.items())}
+
+
+def _error_summary(results):
+    pairs = [(item["reference"], item["hypothesis"]) for item in results if item["reference"]]
+    return error_rates(pairs) if pairs else {"wer": None, "cer": None}
+
+
+def run_inprocess(corpus, repeat, warmup, diarize):
+    import core.loader as loader
+    from api.stt_routes import _transcribe_from_path
+
+    load_started = time.perf_counter()
+    loader.load_all()
+    load_sec = time.perf_counter() - load_started
+    if not loader.is_stt_ready():
+        raise SystemExit(f"STT model failed to load: {loader.load_error}")
+
+    for item in corpus[:warmup]:
+        _transcribe_from_path(item["path"], diarize)
+
+    latencies = []
+    stage_runs = []
+    results = []
+    audio_sec = 0.0
+    for item in corpus:
+        clip_latencies = []
+        for _ in range(repeat):
+            timings = {}
+            started = time.perf_counter()
+            segments = _transcribe_from_path(item["path"], diarize, timings)
+            clip_latencies.append(time.perf_counter() - started)
+            stage_runs.append(timings)
+        latencies.extend(clip_latencies)
+        audio_sec += item["duration"] * repeat
+        results.append(
+            {
+                "name": item["name"],
+                "duration": round(item["duration"], 2),
+                "latency": latency_summary(clip_latencies),
+                "rtf": round(sum(clip_latencies) / (item["duration"] * repeat), 4),
+                "reference": item["reference"],
+                "hypothesis": _hypothesis(segments),
+            }
+        )
+
+    total_latency = sum(latencies)
+    return {
+        "mode": "inprocess",
+        "settings": _settings(),
+        "model_load_sec": round(load_sec, 3),
+        "clips": len(corpus),
+        "runs": len(latencies),
+        "audio_sec": round(audio_sec, 2),
+        "rtf": round(total_latency / audio_sec, 4) if audio_sec else None,
+        **latency_summary(latencies),
+        "stages": _mean_stages(stage_runs),
+        **_error_summary(results),
+        "peak_rss_bytes": peak_rss_bytes(),
+        "per_clip": results,
+    }
+
+
+def _start_local_server():
+    # Serves the app in this process on an ephemeral port so the load test
+    # covers the HTTP stack without any external service.
+    import uvicorn
+
+    from app import app
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, lifespan="on", log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise SystemExit("Benchmark server failed to start.")
+        time.sleep(0.05)
+    return server, thread, f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+async def _wait_ready(session, base_url, timeout_sec):
+    deadline = time.monotonic() + timeout_sec
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f"{base_url}/api/health/ready") as response:
+                if response.status == 200:
+                    return
+        except Exception:
+            pass
+        await asyncio.sleep(1.0)
+    raise SystemExit(f"Server at {base_url} did not become ready in {timeout_sec:g}s.")
+
+
+async def _server_rss(session, base_url):
+    try:
+        async with session.get(f"{base_url}/metrics") as response:
+            text = await response.text()
+    except Exception:
+        return None
+    for line in text.splitlines():
+        if line.startswith("process_resident_memory_bytes "):
+            return int(float(line.split()[1]))
+    return None
+
+
+async def _drive_load(base_url, corpus, requests, concurrency, endpoint, diarize, ready_timeout_sec):
+    import aiohttp
+
+    payloads = [(item, Path(item["path"]).read_bytes()) for item in corpus]
+    latencies = []
+    statuses = {}
+    stage_runs = []
+    results = {}
+    audio_sec = 0.0
+    next_request = 0
+
+    async def worker(session):
+        nonlocal next_request, audio_sec
+        while next_request < requests:
+            index = next_request
+            next_request += 1
+            item, data = payloads[index % len(payloads)]
+            form = aiohttp.FormData()
+            form.add_field("file", data, filename=os.path.basename(item["path"]))
+            form.add_field("use_cache", "false")
+            form.add_field("diarize", diarize)
+            form.add_field("include_timings", "true")
+
+            started = time.perf_counter()
+            async with session.post(f"{base_url}/api/stt/{endpoint}", data=form) as response:
+                body = await response.json(content_type=None)
+                status = response.status
+            elapsed = time.perf_counter() - started
+
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if status != 200:
+                continue
+            latencies.append(elapsed)
+            audio_sec += item["duration"]
+            stage_runs.append(body.get("timings") or {})
+            results.setdefault(
+                item["name"],
+                {"reference": item["reference"], "hypothesis": _hypothesis(body.get("segments", []))},
+            )
+
+    timeout = aiohttp.ClientTimeout(total=None)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        await _wait_ready(session, base_url, ready_timeout_sec)
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        wall_sec = time.perf_counter() - started
+        server_rss = await _server_rss(session, base_url)
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "endpoint": endpoint,
+        "wall_sec": round(wall_sec, 3),
+        "throughput_rps": round(len(latencies) / wall_sec, 3) if wall_sec else None,
+        "audio_sec_per_sec": round(audio_sec / wall_sec, 3) if wall_sec else None,
+        "statuses": statuses,
+        **latency_summary(latencies),
+        "stages": _mean_stages(stage_runs),
+        **_error_summary(list(results.values())),
+        "server_rss_bytes": server_rss,
+    }
+
+
+def run_load(corpus, args):
+    server = None
+    base_url = args.url.rstrip("/") if args.url else None
+    if base_url is None:
+        server, thread, base_url = _start_local_server()
+
+    try:
+        report = asyncio.run(
+            _drive_load(
+                base_url,
+                corpus,
+                args.requests,
+                args.concurrency,
+                args.endpoint,
+                args.diarize,
+                args.ready_timeout,
+            )
+        )
+    finally:
+        if server is not None:
+            server.should_exit = True
+            thread.join(timeout=10)
+
+    report["mode"] = "load"
+    report["target"] = args.url or "in-process"
+    if server is not None:
+        report["settings"] = _settings()
+        report["peak_rss_bytes"] = peak_rss_bytes()
+    return report
+
+
+def compare(report, baseline):
+    # Relative change of the headline numbers; negative is better for all
+    # but throughput.
+    changes = {}
+    for key in _COMPARED_KEYS:
+        new, old = report.get(key), baseline.get(key)
+        if isinstance(new, (int, float)) and isinstance(old, (int, float)) and old:
+            changes[key] = {"baseline": old, "current": new, "change": round((new - old) / old, 4)}
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="STT pipeline latency, throughput and accuracy benchmark.")
+    parser.add_argument("--mode", choices=["inprocess", "load"], default="inprocess")
+    parser.add_argument(
+        "--durations",
+        default=DEFAULT_DURATIONS,
+        help="Comma-separated lengths (seconds) of the synthetic clips; empty for none.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--corpus-dir", help="Recorded clips (<name>.wav etc.) with optional <name>.txt references.")
+    parser.add_argument("--repeat", type=int, default=3, help="In-process runs per clip.")
+    parser.add_argument("--warmup", type=int, default=1, help="Clips decoded once before timing starts.")
+    parser.add_argument("--diarize", default="off", choices=["off", "on", "auto"])
+    parser.add_argument("--requests", type=int, default=50, help="Load mode: total requests.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Load mode: requests in flight.")
+    parser.add_argument("--endpoint", default="transcribe", choices=["transcribe", "transcribe-summary"])
+    parser.add_argument("--url", help="Load mode: running server to target instead of an in-process one.")
+    parser.add_argument("--ready-timeout", type=float, default=600.0)
+    parser.add_argument(
+        "--online",
+        action="store_true",
+        help="Use the real Gemini / Hugging Face services instead of offline stubs.",
+    )
+    parser.add_argument("--summary-latency-ms", type=float, default=0.0, help="Simulated latency of the summary stub.")
+    parser.add_argument("--json", dest="json_path", help="Write the report to this file.")
+    parser.add_argument("--compare", help="Baseline report (JSON) to compare against.")
+    args = parser.parse_args()
+
+    if not args.online:
+        install_offline_stubs(args.summary_latency_ms / 1000.0)
+
+    durations = [float(value) for value in args.durations.split(",") if value.strip()]
+    with tempfile.TemporaryDirectory(prefix="stt_bench_") as work_dir:
+        corpus = build_corpus(durations, args.seed, args.corpus_dir, work_dir)
+        if not corpus:
+            parser.error("The corpus is empty: pass --durations and/or --corpus-dir.")
+
+        if args.mode == "load":
+            report = run_load(corpus, args)
+        else:
+            report = run_inprocess(corpus, args.repeat, args.warmup, args.diarize)
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        report["comparison"] = compare(report, baseline)
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+def _edit_distance(reference, hypothesis):
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_item in enumerate(reference, start=1):
+        current = [i] + [0] * len(hypothesis)
+        for j, hyp_item in enumerate(hypothesis, start=1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_item != hyp_item),
+            )
+        previous = current
+    return previous[-1]
+
+
+def error_counts(reference, hypothesis):
+    ref_words = reference.split()
+    hyp_words = hypothesis.split()
+    ref_chars = list(" ".join(ref_words))
+    hyp_chars = list(" ".join(hyp_words))
+    return {
+        "word_errors": _edit_distance(ref_words, hyp_words),
+        "words": len(ref_words),
+        "char_errors": _edit_distance(ref_chars, hyp_chars),
+        "chars": len(ref_chars),
+    }
+
+
+def error_rates(pairs):
+    totals = {"word_errors": 0, "words": 0, "char_errors": 0, "chars": 0}
+    for reference, hypothesis in pairs:
+        for key, value in error_counts(reference, hypothesis).items():
+            totals[key] += value
+    return {
+        "wer": round(totals["word_errors"] / totals["words"], 4) if totals["words"] else 0.0,
+        "cer": round(totals["char_errors"] / totals["chars"], 4) if totals["chars"] else 0.0,
+    }
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = (len(ordered) - 1) * q / 100.0
+    lower = int(index)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (index - lower)
+
+
+def latency_summary(values):
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 4),
+        "p50": round(percentile(values, 50), 4),
+        "p95": round(percentile(values, 95), 4),
+        "p99": round(percentile(values, 99), 4),
+        "max": round(max(values), 4),
+    }
@@ -0,0 +1,198 @@
+import difflib
+import hashlib
+import inspect
+import logging
+import os
+
+import torch
+
+from core.config import (
+    CKPT_PATH,
+    DEVICE,
+    FEATURE_PARITY_MIN_AGREEMENT,
+    INFERENCE_BACKEND,
+    INFERENCE_PARITY_CLIP,
+    INFERENCE_PARITY_MIN_AGREEMENT,
+    MODEL_ACCEPTS_LENGTHS,
+    N_MELS,
+)
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_BACKENDS = {"eager", "int8", "torchscript", "int8_torchscript"}
+_QUANTIZABLE_MODULES = {torch.nn.Linear, torch.nn.LSTM, torch.nn.GRU}
+_PARITY_FRAMES = 400
+
+
+_LENGTHS_PARAMETERS = ("lengths", "input_lengths")
+
+
+def accepts_lengths(model):
+    # Padded batches only decode correctly when the model masks each item to
+    # its length, so a second positional parameter is not enough: it must be
+    # named like one, unless MODEL_ACCEPTS_LENGTHS says otherwise.
+    if MODEL_ACCEPTS_LENGTHS in ("true", "false"):
+        return MODEL_ACCEPTS_LENGTHS == "true"
+    try:
+        params = list(inspect.signature(model.forward).parameters)
+    except (TypeError, ValueError):
+        return False
+    # The lengths go in second, right after the features.
+    return len(params) >= 2 and params[1] in _LENGTHS_PARAMETERS
+
+
+def _artifact_path(backend):
+    stat = os.stat(CKPT_PATH)
+    fingerprint = f"{stat.st_size}:{stat.st_mtime_ns}:{torch.__version__}:{backend}:{DEVICE}"
+    digest = hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:12]
+    root, _ = os.path.splitext(CKPT_PATH)
+    return f"{root}.{backend}-{digest}.pt"
+
+
+def _parity_features():
+    if INFERENCE_PARITY_CLIP:
+        from services.recognizer import compute_features, load_waveform
+
+        features = compute_features(load_waveform(INFERENCE_PARITY_CLIP))
+    else:
+        generator = torch.Generator().manual_seed(0)
+        features = torch.randn(_PARITY_FRAMES, N_MELS, generator=generator)
+    return features.unsqueeze(0).to(DEVICE)
+
+
+def _run(model, features, with_lengths):
+    with torch.inference_mode():
+        if with_lengths:
+            lengths = torch.tensor([features.size(1)], dtype=torch.long, device=DEVICE)
+            output = model(features, lengths)
+        else:
+            output = model(features)
+    if isinstance(output, (tuple, list)):
+        output = output[0]
+    return torch.log_softmax(output.float(), dim=-1).cpu()
+
+
+def _build(eager_model, backend, with_lengths):
+    optimized = eager_model
+    if backend.startswith("int8"):
+        optimized = torch.ao.quantization.quantize_dynamic(
+            optimized,
+            _QUANTIZABLE_MODULES,
+            dtype=torch.qint8,
+        )
+
+    if backend.endswith("torchscript"):
+        example = _parity_features()
+        if with_lengths:
+            lengths = torch.tensor([example.size(1)], dtype=torch.long, device=DEVICE)
+            example_inputs = (example, lengths)
+        else:
+            example_inputs = (example,)
+        with torch.no_grad():
+            optimized = torch.jit.trace(optimized, example_inputs, check_trace=False)
+        try:
+            optimized = torch.jit.freeze(optimized.eval())
+        except Exception as exc:
+            logger.warning("TorchScript freeze skipped: %s", exc)
+
+    return optimized
+
+
+def _save(optimized, backend, path):
+    temp_path = f"{path}.tmp"
+    if backend.endswith("torchscript"):
+        torch.jit.save(optimized, temp_path)
+    else:
+        torch.save(optimized, temp_path)
+    os.replace(temp_path, path)
+
+
+def _load(backend, path):
+    if backend.endswith("torchscript"):
+        return torch.jit.load(path, map_location=DEVICE)
+    return torch.load(path, map_location=DEVICE)
+
+
+def check_parity(reference_model, candidate_model, with_lengths):
+    features = _parity_features()
+    reference = _run(reference_model, features, with_lengths)
+    candidate = _run(candidate_model, features, with_lengths)
+    frames = min(reference.size(1), candidate.size(1))
+    reference = reference[:, :frames]
+    candidate = candidate[:, :frames]
+    agreement = (reference.argmax(dim=-1) == candidate.argmax(dim=-1)).float().mean().item()
+    return {
+        "clip": INFERENCE_PARITY_CLIP or "synthetic",
+        "frames": frames,
+        "greedy_agreement": round(agreement, 4),
+        "max_abs_log_prob_diff": round((reference - candidate).abs().max().item(), 4),
+        "passed": agreement >= INFERENCE_PARITY_MIN_AGREEMENT,
+    }
+
+
+def check_feature_parity(model, with_lengths):
+    # The staged pipeline computes its own log-mel features (services.features)
+    # instead of the legacy preprocessing the checkpoint was trained with.
+    # Greedy output on those features is compared word by word with
+    # run_pipeline on the parity clip. Returns None without a clip.
+    if not INFERENCE_PARITY_CLIP:
+        return None
+    from services.pipeline import run_pipeline
+    from services.recognizer import compute_features, greedy_decode, load_waveform
+
+    features = compute_features(load_waveform(INFERENCE_PARITY_CLIP)).unsqueeze(0).to(DEVICE)
+    staged_words = greedy_decode(_run(model, features, with_lengths)[0]).split()
+    legacy_words = " ".join(segment.get("text", "") for segment in run_pipeline(INFERENCE_PARITY_CLIP)).split()
+    agreement = difflib.SequenceMatcher(None, staged_words, legacy_words, autojunk=False).ratio()
+    return {
+        "clip": INFERENCE_PARITY_CLIP,
+        "staged_words": len(staged_words),
+        "legacy_words": len(legacy_words),
+        "word_agreement": round(agreement, 4),
+        "passed": agreement >= FEATURE_PARITY_MIN_AGREEMENT,
+    }
+
+
+def prepare_backend(eager_model):
+    # Returns (model, backend, parity). Falls back to the eager model when the
+    # requested backend cannot be built or does not match it on the parity clip.
+    backend = INFERENCE_BACKEND
+    if backend not in SUPPORTED_BACKENDS:
+        logger.warning("Unknown INFERENCE_BACKEND '%s'; using eager.", backend)
+        return eager_model, "eager", None
+    if backend == "eager":
+        return eager_model, "eager", None
+    if backend.startswith("int8") and DEVICE != "cpu":
+        logger.warning("int8 dynamic quantization is CPU-only; using eager on %s.", DEVICE)
+        return eager_model, "eager", None
+
+    with_lengths = accepts_lengths(eager_model)
+    try:
+        path = _artifact_path(backend)
+        if os.path.exists(path):
+            optimized = _load(backend, path)
+            logger.info("[OK] Inference backend loaded from cache | backend=%s | path=%s", backend, path)
+        else:
+            optimized = _build(eager_model, backend, with_lengths)
+            _save(optimized, backend, path)
+            logger.info("[OK] Inference backend compiled | backend=%s | path=%s", backend, path)
+
+        parity = check_parity(eager_model, optimized, with_lengths)
+    except Exception as exc:
+        logger.warning("Inference backend '%s' unavailable, using eager: %s", backend, exc)
+        return eager_model, "eager", {"error": str(exc)}
+
+    if not parity["passed"]:
+        logger.warning(
+            "Inference backend '%s' failed parity (agreement=%s); using eager.",
+            backend,
+            parity["greedy_agreement"],
+        )
+        return eager_model, "eager", parity
+
+    logger.info(
+        "[OK] Inference backend parity | agreement=%s | max_diff=%s",
+        parity["greedy_agreement"],
+        parity["max_abs_log_prob_diff"],
+    )
+    return optimized, backend, parity
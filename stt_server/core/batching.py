@@ -0,0 +1,229 @@
+import logging
+import math
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import torch
+
+import core.loader as loader
+from core.timings import timed
+from core.config import (
+    INFER_MAX_BATCH_SIZE,
+    INFER_MAX_WAIT_MS,
+    INFER_QUEUE_DEPTH,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class BatchQueueFullError(RuntimeError):
+    pass
+
+
+# log(1e-10): the floor services.features clamps log-mel energies to.
+_PAD_VALUE = math.log(1e-10)
+
+
+# One queue and scheduler thread per model replica (see loader.Replica);
+# index 0 also takes windows submitted before the model is loaded.
+_queues = {}
+_workers = {}
+_worker_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {
+    "batches": 0,
+    "items": 0,
+    "last_batch_size": 0,
+    "max_batch_size": 0,
+}
+# batch size -> number of batches run with that many windows
+_size_counts = {}
+
+
+def _ensure_worker(index):
+    worker = _workers.get(index)
+    if worker is not None and worker.is_alive():
+        return _queues[index]
+
+    with _worker_lock:
+        worker = _workers.get(index)
+        if worker is None or not worker.is_alive():
+            pending = _queues.setdefault(index, queue.Queue(maxsize=INFER_QUEUE_DEPTH))
+            worker = threading.Thread(
+                target=_worker_loop,
+                args=(index, pending),
+                name=f"stt-batch-scheduler-{index}",
+                daemon=True,
+            )
+            _workers[index] = worker
+            worker.start()
+    return _queues[index]
+
+
+def submit(features):
+    # features: (frames, n_mels) tensor for a single decode window, routed
+    # to the least-loaded model replica.
+    if features.dim() != 2 or features.size(0) == 0:
+        raise ValueError("Features must be a non-empty (frames, n_mels) tensor.")
+
+    replica = loader.acquire_replica()
+    pending = _ensure_worker(replica.index if replica is not None else 0)
+    future = Future()
+    try:
+        pending.put_nowait((features, future, replica))
+    except queue.Full:
+        loader.release_replica(replica)
+        raise BatchQueueFullError("Inference queue is full.")
+    return future
+
+
+def infer(features, timeout=None):
+    return submit(features).result(timeout=timeout)
+
+
+def get_batching_status():
+    with _stats_lock:
+        stats = dict(_stats)
+    queues = list(_queues.values())
+    stats["queue_depth"] = sum(pending.qsize() for pending in queues)
+    stats["queue_capacity"] = INFER_QUEUE_DEPTH * max(1, len(loader.replicas))
+    stats["max_batch_size_limit"] = INFER_MAX_BATCH_SIZE
+    stats["max_wait_ms"] = INFER_MAX_WAIT_MS
+    return stats
+
+
+def get_batch_size_counts():
+    with _stats_lock:
+        return dict(_size_counts)
+
+
+def _collect_batch(pending):
+    batch = [pending.get()]
+    deadline = time.monotonic() + INFER_MAX_WAIT_MS / 1000.0
+
+    while len(batch) < INFER_MAX_BATCH_SIZE:
+        remaining = deadline - time.monotonic()
+        try:
+            if remaining <= 0:
+                batch.append(pending.get_nowait())
+            else:
+                batch.append(pending.get(timeout=remaining))
+        except queue.Empty:
+            break
+
+    return batch
+
+
+def _release(batch):
+    for _, _, replica in batch:
+        loader.release_replica(replica)
+
+
+def _apply_threads(threads):
+    # Sizes the OpenMP team of the calling thread only, so each scheduler
+    # keeps its replica's budget. The thread's lazy init (triggered by
+    # get_num_threads) must run first or it resets the value on first use.
+    torch.get_num_threads()
+    torch.set_num_threads(threads)
+
+
+def _worker_loop(index, pending):
+    threads = None
+    while True:
+        batch = _collect_batch(pending)
+        # Drop windows whose callers already gave up.
+        running = []
+        for item in batch:
+            if item[1].set_running_or_notify_cancel():
+                running.append(item)
+            else:
+                loader.release_replica(item[2])
+        batch = running
+        if not batch:
+            continue
+
+        # Windows are queued on the replica that was current when they were
+        # submitted; after a reload they run on its replacement.
+        replica = loader.replicas[index] if index < len(loader.replicas) else None
+        if replica is not None and replica.threads and replica.threads != threads:
+            _apply_threads(replica.threads)
+            threads = replica.threads
+        try:
+            outputs = _run_batch([features for features, _, _ in batch], replica)
+        except Exception as exc:
+            logger.exception("Batched inference failed: %s", exc)
+            for _, future, _ in batch:
+                future.set_exception(exc)
+            continue
+        finally:
+            _release(batch)
+
+        for (_, future, _), log_probs in zip(batch, outputs):
+            future.set_result(log_probs)
+
+
+def _run_batch(feature_list, replica):
+    if replica is None or loader.model is None:
+        raise RuntimeError(loader.load_error or "STT model is not loaded.")
+    if loader.model_accepts_lengths:
+        return _forward(feature_list, replica)
+
+    # A model that takes no lengths would read the pad frames after shorter
+    # windows, so only windows of equal length share a forward pass. Decode
+    # windows are nearly all full-length, so batches rarely split.
+    groups = {}
+    for position, features in enumerate(feature_list):
+        groups.setdefault(features.size(0), []).append(position)
+    results = [None] * len(feature_list)
+    for positions in groups.values():
+        outputs = _forward([feature_list[position] for position in positions], replica)
+        for position, log_probs in zip(positions, outputs):
+            results[position] = log_probs
+    return results
+
+
+def _forward(feature_list, replica):
+    lengths = torch.tensor([features.size(0) for features in feature_list], dtype=torch.long)
+    # Padding is silence in log-mel terms, not 0.0 (a loud frame).
+    padded = torch.nn.utils.rnn.pad_sequence(
+        feature_list,
+        batch_first=True,
+        padding_value=_PAD_VALUE,
+    ).to(replica.device)
+
+    with torch.inference_mode(), timed("model_forward"):
+        if loader.model_accepts_lengths:
+            output = replica.model(padded, lengths.to(replica.device))
+        else:
+            output = replica.model(padded)
+
+    out_lengths = None
+    if isinstance(output, (tuple, list)):
+        if len(output) > 1 and torch.is_tensor(output[1]):
+            out_lengths = output[1].detach().cpu().long()
+        output = output[0]
+
+    log_probs = torch.log_softmax(output.float(), dim=-1).cpu()
+    max_in = int(lengths.max())
+    max_out = log_probs.size(1)
+
+    results = []
+    for index, in_len in enumerate(lengths.tolist()):
+        if out_lengths is not None:
+            out_len = int(out_lengths[index])
+        else:
+            out_len = math.ceil(in_len * max_out / max_in)
+        out_len = max(1, min(out_len, max_out))
+        results.append(log_probs[index, :out_len])
+
+    with _stats_lock:
+        _stats["batches"] += 1
+        _stats["items"] += len(feature_list)
+        _stats["last_batch_size"] = len(feature_list)
+        _stats["max_batch_size"] = max(_stats["max_batch_size"], len(feature_list))
+        _size_counts[len(feature_list)] = _size_counts.get(len(feature_list), 0) + 1
+        replica.batches += 1
+
+    return results
@@ -1,5 +1,6 @@
 import os
 import importlib
+import tempfile
 from pathlib import Path
 from typing import List
 
@@ -150,10 +151,30 @@ CKPT_PATH = _resolve_path(os.getenv("CKPT_PATH", "modelAI/last.pt"))
 VOCAB_PATH = _resolve_path(os.getenv("VOCAB_PATH", "vocab/vocab.txt"))
 KENLM_PATH = _resolve_path(os.getenv("KENLM_PATH", "modelAI/lm.binary"))
 
+# inference backend: eager, int8, torchscript or int8_torchscript
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "eager").strip().lower() or "eager"
+INFERENCE_PARITY_CLIP = os.getenv("INFERENCE_PARITY_CLIP", "").strip()
+if INFERENCE_PARITY_CLIP:
+    INFERENCE_PARITY_CLIP = _resolve_path(INFERENCE_PARITY_CLIP)
+INFERENCE_PARITY_MIN_AGREEMENT = _env_float("INFERENCE_PARITY_MIN_AGREEMENT", 0.95)
+# Word agreement between staged greedy output and run_pipeline on the clip.
+FEATURE_PARITY_MIN_AGREEMENT = _env_float("FEATURE_PARITY_MIN_AGREEMENT", 0.8)
+
 # LM
 LM_ALPHA = _env_float("LM_ALPHA", 5.0)
 LM_BETA = _env_float("LM_BETA", 1.6)
 BEAM_WIDTH = _env_int("BEAM_WIDTH", 150)
+BEAM_TOKEN_TOPK = max(1, _env_int("BEAM_TOKEN_TOPK", 40))
+BEAM_TOKEN_MIN_LOGP = _env_float("BEAM_TOKEN_MIN_LOGP", -10.0)
+BEAM_SCORE_MARGIN = max(0.0, _env_float("BEAM_SCORE_MARGIN", 20.0))
+LM_CACHE_SIZE = max(1, _env_int("LM_CACHE_SIZE", 200000))
+# lazy = mmap the binary and let workers share the page cache; read = copy into the heap
+KENLM_LOAD_METHOD = os.getenv("KENLM_LOAD_METHOD", "lazy").strip().lower() or "lazy"
+BLANK_SKIP_THRESHOLD = _env_float("BLANK_SKIP_THRESHOLD", 0.999)
+# adaptive beam: per-frame width from BEAM_MIN_WIDTH (confident frames) up to
+# BEAM_WIDTH at BEAM_ENTROPY_HIGH nats of posterior entropy; 0 = fixed width
+BEAM_MIN_WIDTH = max(0, _env_int("BEAM_MIN_WIDTH", 0))
+BEAM_ENTROPY_HIGH = max(0.01, _env_float("BEAM_ENTROPY_HIGH", 1.5))
 
 # external tokens
 HF_TOKEN = get_hf_token()
@@ -168,6 +189,11 @@ DIARIZATION_FALLBACK_MODEL = _first_non_empty(
 API_KEY = get_gemini_api_key()
 SUMMARY_MODEL = get_summary_model()
 
+# server (serve.py)
+STT_HOST = os.getenv("STT_HOST", "0.0.0.0").strip() or "0.0.0.0"
+STT_PORT = _env_int("STT_PORT", 8001)
+STT_SERVER_WORKERS = max(1, _env_int("STT_SERVER_WORKERS", 1))
+
 # CORS
 CORS_ALLOWED_ORIGINS = _env_csv(
     "CORS_ALLOWED_ORIGINS",
@@ -198,7 +224,122 @@ MAX_DECODE_WINDOW_SEC = _env_float(
     (MAX_FRAMES * HOP_LENGTH) / float(_safe_sample_rate),
 )
 
+# pipeline
+STT_PIPELINE = os.getenv("STT_PIPELINE", "legacy").strip().lower() or "legacy"
+
+# batched inference
+INFER_MAX_BATCH_SIZE = max(1, _env_int("INFER_MAX_BATCH_SIZE", 8))
+INFER_MAX_WAIT_MS = max(0.0, _env_float("INFER_MAX_WAIT_MS", 15.0))
+INFER_QUEUE_DEPTH = max(1, _env_int("INFER_QUEUE_DEPTH", 64))
+# whether STTModel.forward takes per-item lengths: auto (a parameter named
+# lengths / input_lengths), true or false
+MODEL_ACCEPTS_LENGTHS = os.getenv("MODEL_ACCEPTS_LENGTHS", "auto").strip().lower() or "auto"
+
+# model replicas (each with its own batch scheduler; windows go to the least-loaded one)
+STT_REPLICAS = max(1, _env_int("STT_REPLICAS", torch.cuda.device_count() if DEVICE == "cuda" else 1))
+# intra-op threads per CPU replica (0 = split the cores evenly between replicas)
+STT_REPLICA_THREADS = max(0, _env_int("STT_REPLICA_THREADS", 0))
+
+# execution layer
+STT_EXECUTOR = os.getenv("STT_EXECUTOR", "thread").strip().lower() or "thread"
+STT_WORKERS = max(1, _env_int("STT_WORKERS", 2))
+STT_MAX_PENDING = max(0, _env_int("STT_MAX_PENDING", 8))
+STT_RETRY_AFTER_SEC = max(1, _env_int("STT_RETRY_AFTER_SEC", 10))
+
+# async jobs (/api/stt/jobs)
+JOB_STORE_PATH = _resolve_path(os.getenv("JOB_STORE_PATH", ".cache/jobs.sqlite3"))
+JOB_AUDIO_DIR = _resolve_path(os.getenv("JOB_AUDIO_DIR", ".cache/job_audio"))
+JOB_WORKERS = max(1, _env_int("JOB_WORKERS", 1))
+JOB_MAX_QUEUED = max(1, _env_int("JOB_MAX_QUEUED", 100))
+JOB_RETENTION_SEC = max(0.0, _env_float("JOB_RETENTION_SEC", 7 * 86400.0))
+# running jobs whose worker has not renewed its lease for this long are queued again
+JOB_LEASE_SEC = max(5.0, _env_float("JOB_LEASE_SEC", 60.0))
+
+# remote audio HTTP client (shared keep-alive pool)
+HTTP_POOL_SIZE = max(1, _env_int("HTTP_POOL_SIZE", 32))
+HTTP_MAX_PER_HOST = max(1, _env_int("HTTP_MAX_PER_HOST", 4))
+HTTP_KEEPALIVE_SEC = max(1.0, _env_float("HTTP_KEEPALIVE_SEC", 30.0))
+HTTP_RETRIES = max(0, _env_int("HTTP_RETRIES", 3))
+# staged pipeline: decode and transcribe remote audio while it downloads
+REMOTE_AUDIO_STREAMING = _env_bool("REMOTE_AUDIO_STREAMING", True)
+
+# batch transcription (/api/stt/transcribe-batch)
+BATCH_MAX_ITEMS = max(1, _env_int("BATCH_MAX_ITEMS", 500))
+BATCH_DOWNLOAD_CONCURRENCY = max(1, _env_int("BATCH_DOWNLOAD_CONCURRENCY", 8))
+BATCH_TRANSCRIBE_CONCURRENCY = max(1, _env_int("BATCH_TRANSCRIBE_CONCURRENCY", STT_WORKERS))
+
+# summary cache
+SUMMARY_CACHE_ENABLED = _env_bool("SUMMARY_CACHE_ENABLED", True)
+SUMMARY_CACHE_TTL_SEC = max(0.0, _env_float("SUMMARY_CACHE_TTL_SEC", 86400.0))
+SUMMARY_CACHE_MAX_ENTRIES = max(1, _env_int("SUMMARY_CACHE_MAX_ENTRIES", 256))
+
+# streaming
+STREAM_CHUNK_SEC = max(0.1, _env_float("STREAM_CHUNK_SEC", 1.0))
+STREAM_CONTEXT_SEC = max(0.0, _env_float("STREAM_CONTEXT_SEC", 2.0))
+STREAM_MAX_SEGMENT_SEC = max(1.0, _env_float("STREAM_MAX_SEGMENT_SEC", 15.0))
+STREAM_ENDPOINT_SEC = max(0.1, _env_float("STREAM_ENDPOINT_SEC", 0.6))
+
+# decoded audio buffer (decoded once per request, memory-mapped when long)
+AUDIO_MEMMAP_MIN_SEC = max(0.0, _env_float("AUDIO_MEMMAP_MIN_SEC", 900.0))
+AUDIO_DECODE_CHUNK_SEC = max(1.0, _env_float("AUDIO_DECODE_CHUNK_SEC", 60.0))
+
+# long-form decoding
+LONGFORM_ENABLED = _env_bool("LONGFORM_ENABLED", False)
+LONGFORM_MIN_SEC = max(0.0, _env_float("LONGFORM_MIN_SEC", MAX_DECODE_WINDOW_SEC))
+LONGFORM_WINDOW_SEC = max(5.0, _env_float("LONGFORM_WINDOW_SEC", 30.0))
+LONGFORM_OVERLAP_SEC = max(0.0, _env_float("LONGFORM_OVERLAP_SEC", 1.5))
+LONGFORM_SPLIT_SEARCH_SEC = max(0.0, _env_float("LONGFORM_SPLIT_SEARCH_SEC", 5.0))
+LONGFORM_WORKERS = max(1, _env_int("LONGFORM_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+
+# voice activity detection (decode only the speech regions of a recording)
+VAD_ENABLED = _env_bool("VAD_ENABLED", False)
+VAD_FRAME_SEC = max(0.01, _env_float("VAD_FRAME_SEC", 0.03))
+# speech frames are this many dB above the noise floor (and at most this far below typical speech)
+VAD_THRESHOLD_DB = max(0.0, _env_float("VAD_THRESHOLD_DB", 12.0))
+# frames quieter than this are always silence
+VAD_SILENCE_DBFS = _env_float("VAD_SILENCE_DBFS", -55.0)
+VAD_PAD_SEC = max(0.0, _env_float("VAD_PAD_SEC", 0.3))
+VAD_MIN_SPEECH_SEC = max(0.0, _env_float("VAD_MIN_SPEECH_SEC", 0.1))
+VAD_MIN_SILENCE_SEC = max(0.0, _env_float("VAD_MIN_SILENCE_SEC", 1.0))
+# below this skipped fraction the whole recording is decoded as is
+VAD_MIN_SKIP_RATIO = min(1.0, max(0.0, _env_float("VAD_MIN_SKIP_RATIO", 0.1)))
+
+# diarization (per-request: off | on | auto)
+DIARIZE_MODES = ("off", "on", "auto")
+DIARIZE_DEFAULT = os.getenv("DIARIZE_DEFAULT", "auto").strip().lower()
+if DIARIZE_DEFAULT not in DIARIZE_MODES:
+    DIARIZE_DEFAULT = "auto"
+# auto diarizes only recordings at least this long; short clips are usually one speaker
+DIARIZE_AUTO_MIN_SEC = max(0.0, _env_float("DIARIZE_AUTO_MIN_SEC", 20.0))
+DIARIZATION_CACHE_ENABLED = _env_bool("DIARIZATION_CACHE_ENABLED", True)
+DIARIZATION_CACHE_MAX_ENTRIES = max(1, _env_int("DIARIZATION_CACHE_MAX_ENTRIES", 128))
+
 # temp
 TEMP_DIR = os.getenv("TEMP_DIR", "").strip()
 if TEMP_DIR:
     TEMP_DIR = _resolve_path(TEMP_DIR)
+
+# transcript cache
+TRANSCRIPT_CACHE_ENABLED = _env_bool("TRANSCRIPT_CACHE_ENABLED", True)
+TRANSCRIPT_CACHE_DIR = os.getenv("TRANSCRIPT_CACHE_DIR", "").strip()
+TRANSCRIPT_CACHE_DIR = (
+    _resolve_path(TRANSCRIPT_CACHE_DIR)
+    if TRANSCRIPT_CACHE_DIR
+    else os.path.join(TEMP_DIR or tempfile.gettempdir(), "stt_transcripts")
+)
+TRANSCRIPT_CACHE_MAX_MB = max(1, _env_int("TRANSCRIPT_CACHE_MAX_MB", 512))
+TRANSCRIPT_CACHE_MAX_BYTES = TRANSCRIPT_CACHE_MAX_MB * 1024 * 1024
+
+# decoded audio_url cache (16 kHz mono float32 WAV, LRU by size)
+AUDIO_CACHE_ENABLED = _env_bool("AUDIO_CACHE_ENABLED", True)
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR", "").strip()
+AUDIO_CACHE_DIR = (
+    _resolve_path(AUDIO_CACHE_DIR)
+    if AUDIO_CACHE_DIR
+    else os.path.join(TEMP_DIR or tempfile.gettempdir(), "stt_audio_cache")
+)
+AUDIO_CACHE_MAX_MB = max(1, _env_int("AUDIO_CACHE_MAX_MB", 2048))
+AUDIO_CACHE_MAX_BYTES = AUDIO_CACHE_MAX_MB * 1024 * 1024
+# 0 trusts cached URLs forever (versioned CDN links never change); otherwise
+# entries older than this are revalidated with If-None-Match/If-Modified-Since
+AUDIO_CACHE_MAX_AGE_SEC = max(0.0, _env_float("AUDIO_CACHE_MAX_AGE_SEC", 0.0))
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+from core.config import (
+    STT_EXECUTOR,
+    STT_MAX_PENDING,
+    STT_RETRY_AFTER_SEC,
+    STT_WORKERS,
+)
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_in_flight = 0
+_rejected = 0
+_counter_lock = threading.Lock()
+
+
+def _init_process_worker():
+    # Each worker process owns its own copy of the ASR runtime. Diarization is
+    # left to the parent, so its pipeline is not loaded once per worker.
+    from core.loader import load_asr
+
+    load_asr()
+
+
+def _get_executor():
+    global _executor
+    if _executor is not None:
+        return _executor
+
+    with _executor_lock:
+        if _executor is None:
+            if STT_EXECUTOR == "process":
+                # Spawned, not forked: the server already runs loader and
+                # batching threads whose locks a fork would copy mid-use.
+                _executor = ProcessPoolExecutor(
+                    max_workers=STT_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_process_worker,
+                )
+            else:
+                _executor = ThreadPoolExecutor(
+                    max_workers=STT_WORKERS,
+                    thread_name_prefix="stt-worker",
+                )
+            logger.info("[OK] Executor started | kind=%s | workers=%s", STT_EXECUTOR, STT_WORKERS)
+    return _executor
+
+
+def _release_slot(_future):
+    global _in_flight
+    with _counter_lock:
+        _in_flight -= 1
+
+
+def _acquire_slot():
+    global _in_flight, _rejected
+    with _counter_lock:
+        if _in_flight >= STT_WORKERS + STT_MAX_PENDING:
+            _rejected += 1
+            return False
+        _in_flight += 1
+        return True
+
+
+def busy_error():
+    return HTTPException(
+        status_code=503,
+        detail="STT service is busy. Please retry later.",
+        headers={"Retry-After": str(STT_RETRY_AFTER_SEC)},
+    )
+
+
+async def run_blocking(func, *args):
+    if not _acquire_slot():
+        raise busy_error()
+
+    try:
+        future = _get_executor().submit(func, *args)
+    except Exception:
+        _release_slot(None)
+        raise
+
+    # Release the slot when the work really finishes, not when the caller
+    # stops waiting, so abandoned requests still count against capacity.
+    future.add_done_callback(_release_slot)
+    return await asyncio.wrap_future(future)
+
+
+def get_executor_status():
+    with _counter_lock:
+        in_flight = _in_flight
+        rejected = _rejected
+    return {
+        "kind": STT_EXECUTOR,
+        "workers": STT_WORKERS,
+        "max_pending": STT_MAX_PENDING,
+        "in_flight": in_flight,
+        "rejected": rejected,
+    }
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
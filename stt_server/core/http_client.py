@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import threading
+
+import aiohttp
+
+from core.config import (
+    HTTP_KEEPALIVE_SEC,
+    HTTP_MAX_PER_HOST,
+    HTTP_POOL_SIZE,
+    HTTP_RETRIES,
+    REMOTE_AUDIO_TIMEOUT_SEC,
+)
+
+logger = logging.getLogger(__name__)
+
+_CHUNK_SIZE = 1024 * 1024
+_RETRY_BACKOFF_SEC = 0.5
+_RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class DownloadError(RuntimeError):
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+_sessions = {}
+_main_loop = None
+_stats_lock = threading.Lock()
+_stats = {
+    "downloads": 0,
+    "failed": 0,
+    "retries": 0,
+    "resumed": 0,
+    "not_modified": 0,
+    "bytes": 0,
+}
+
+
+def _count(key, amount=1):
+    with _stats_lock:
+        _stats[key] += amount
+
+
+def bind_loop():
+    # Called from the app's startup hook so worker threads can run downloads
+    # on the server loop and share its connection pool.
+    global _main_loop
+    _main_loop = asyncio.get_running_loop()
+
+
+def get_session():
+    # One pooled keep-alive session per event loop (sessions are loop-bound).
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_SIZE,
+            limit_per_host=HTTP_MAX_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_SEC,
+        )
+        # No total timeout: large files may legitimately take a while. A
+        # stalled connection is caught by the connect / read timeouts.
+        timeout = aiohttp.ClientTimeout(
+            total=None,
+            sock_connect=REMOTE_AUDIO_TIMEOUT_SEC,
+            sock_read=REMOTE_AUDIO_TIMEOUT_SEC,
+        )
+        session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        _sessions[loop] = session
+    return session
+
+
+async def close():
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
+
+
+def run_sync(coroutine):
+    # Run a download coroutine from a worker thread.
+    loop = _main_loop
+    if loop is not None and loop.is_running():
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+    return asyncio.run(coroutine)
+
+
+def _too_large():
+    return DownloadError(413, "Remote audio file is too large.")
+
+
+def _conditional_headers(cached_validator):
+    if not cached_validator:
+        return {}
+    if cached_validator.startswith(('"', 'W/"')):
+        return {"If-None-Match": cached_validator}
+    return {"If-Modified-Since": cached_validator}
+
+
+async def content_length(url):
+    # Size the server reports for url from a HEAD request, or None when it
+    # gives none or the request fails; the download reports real errors.
+    try:
+        async with get_session().head(url, allow_redirects=True) as response:
+            if response.status >= 400:
+                return None
+            return response.content_length
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return None
+
+
+async def download(url, output_file, max_bytes, on_progress=None, cached_validator=None):
+    # Streams url into the open binary output_file. Interrupted transfers
+    # resume with an HTTP Range request (guarded by If-Range) up to
+    # HTTP_RETRIES times; servers that ignore the range restart from zero.
+    # Without an ETag / Last-Modified a changed file could not be detected,
+    # and a Content-Encoding makes the written (decoded) byte count useless
+    # as a Range offset, so such transfers restart from zero instead.
+    # on_progress(written, total, restarted) is called after every chunk.
+    # cached_validator (ETag or Last-Modified of a local copy) makes the
+    # first request conditional. Returns {"bytes", "validator",
+    # "not_modified"}; nothing is written when not_modified is true.
+    session = get_session()
+    written = 0
+    total = None
+    validator = None
+    resumable = False
+    attempt = 0
+
+    while True:
+        headers = {} if written else _conditional_headers(cached_validator)
+        # Ranges count bytes of the encoded body, so ask for it unencoded.
+        headers["Accept-Encoding"] = "identity"
+        if written and resumable:
+            headers["Range"] = f"bytes={written}-"
+            headers["If-Range"] = validator
+
+        try:
+            async with session.get(url, headers=headers) as response:
+                if response.status == 304 and not written:
+                    _count("not_modified")
+                    return {"bytes": 0, "validator": cached_validator, "not_modified": True}
+                if response.status in _RETRYABLE_STATUS:
+                    response.raise_for_status()
+                if response.status >= 400:
+                    raise DownloadError(
+                        400,
+                        f"Unable to download audio_url: {response.status}, message='{response.reason}'",
+                    )
+
+                restarted = False
+                if written and response.status != 206:
+                    output_file.seek(0)
+                    output_file.truncate()
+                    written = 0
+                    restarted = True
+                elif written:
+                    _count("resumed")
+
+                if not written:
+                    validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+                    encoding = response.headers.get("Content-Encoding", "identity").strip().lower()
+                    resumable = bool(validator) and encoding == "identity"
+                    total = response.content_length
+                    if total is not None and total > max_bytes:
+                        raise _too_large()
+
+                async for chunk in response.content.iter_chunked(_CHUNK_SIZE):
+                    if not chunk:
+                        continue
+                    written += len(chunk)
+                    if written > max_bytes:
+                        raise _too_large()
+                    output_file.write(chunk)
+                    output_file.flush()
+                    _count("bytes", len(chunk))
+                    if on_progress is not None:
+                        on_progress(written, total, restarted)
+                    restarted = False
+
+                if total is not None and written < total:
+                    raise aiohttp.ClientPayloadError(f"Connection closed after {written} of {total} bytes.")
+
+            _count("downloads")
+            return {"bytes": written, "validator": validator, "not_modified": False}
+        except DownloadError:
+            _count("failed")
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            attempt += 1
+            if attempt > HTTP_RETRIES:
+                _count("failed")
+                raise DownloadError(400, f"Unable to download audio_url: {exc}")
+            _count("retries")
+            logger.warning("Download interrupted (%s), retrying %s/%s: %s", url, attempt, HTTP_RETRIES, exc)
+            await asyncio.sleep(_RETRY_BACKOFF_SEC * attempt)
+
+
+def get_http_status():
+    with _stats_lock:
+        status = dict(_stats)
+    status["pool_size"] = HTTP_POOL_SIZE
+    status["max_per_host"] = HTTP_MAX_PER_HOST
+    return status
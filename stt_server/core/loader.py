@@ -1,5 +1,8 @@
+import copy
 import logging
 import os
+import threading
+import time
 import warnings
 from pathlib import Path
 
@@ -14,19 +17,27 @@ import speechbrain.utils.fetching as sb_fetching
 import torch
 from pyannote.audio import Pipeline
 
+from core.backends import accepts_lengths, check_feature_parity, prepare_backend
 from core.config import (
     CKPT_PATH,
     DEVICE,
     DIARIZATION_FALLBACK_MODEL,
     DIARIZATION_MODEL,
     HF_TOKEN,
+    INFER_MAX_BATCH_SIZE,
+    KENLM_LOAD_METHOD,
     KENLM_PATH,
     LM_ALPHA,
     LM_BETA,
+    LM_CACHE_SIZE,
+    STT_PIPELINE,
+    STT_REPLICA_THREADS,
+    STT_REPLICAS,
     VOCAB_PATH,
 )
 from model.model import STTModel
 from util.decoder_beam import LMScorer
+from util.decoder_vectorized import KenLMStateCache
 
 logger = logging.getLogger(__name__)
 
@@ -54,13 +65,33 @@ if hasattr(hf_constants, "default_cache_path"):
 
 # Global singletons.
 model = None
+model_accepts_lengths = False
+inference_backend = None
+backend_parity = None
+feature_parity = None
 lm_scorer = None
+lm_cache = None
 pipeline = None
+# Model id of the loaded diarization pipeline (the fallback when it was used).
+diarization_model = None
 vocab = None
 blank_id = None
 load_error = None
 lm_error = None
 diarization_error = None
+lm_cache_error = None
+preloaded = False
+_worker_threads = None
+_lm_cache_lock = threading.Lock()
+# Acoustic model replicas; `model` is replicas[0].model.
+replicas = []
+_replica_lock = threading.Lock()
+
+# Startup progress per component: pending -> loading -> ready | failed.
+COMPONENTS = ("stt", "lm", "diarization")
+_components = {name: {"state": "pending"} for name in COMPONENTS}
+_components_lock = threading.Lock()
+_loading_threads = []
 
 
 _original_load = torch.load
@@ -92,14 +123,164 @@ sb_fetching.fetch = patched_sb_fetch
 sb_fetching.link_with_strategy = patched_link_with_strategy
 
 
+class Replica:
+    # One copy of the acoustic model on a device, served by its own batch
+    # scheduler. `load` counts decode windows queued or running on it.
+
+    def __init__(self, index, device, replica_model, threads):
+        self.index = index
+        self.device = device
+        self.model = replica_model
+        self.threads = threads
+        self.load = 0
+        self.batches = 0
+
+
+def _replica_devices():
+    if DEVICE == "cuda":
+        count = max(1, torch.cuda.device_count())
+        return [f"cuda:{index % count}" for index in range(STT_REPLICAS)]
+    return [DEVICE] * STT_REPLICAS
+
+
+def _replica_threads():
+    if DEVICE != "cpu":
+        return None
+    return STT_REPLICA_THREADS or max(1, (os.cpu_count() or 1) // STT_REPLICAS)
+
+
+def _build_replicas(loaded_model):
+    # CPU replicas share one set of weights (inference never writes them) and
+    # differ only in their thread budget; each GPU gets its own copy.
+    threads = _replica_threads()
+    copies = {}
+    built = []
+    for index, device in enumerate(_replica_devices()):
+        replica_model = copies.get(device)
+        if replica_model is None:
+            replica_model = loaded_model if not copies else copy.deepcopy(loaded_model).to(device)
+            copies[device] = replica_model
+        built.append(Replica(index, device, replica_model, threads))
+    return built
+
+
+def acquire_replica():
+    # Least-loaded replica, or None before the model is loaded. Every
+    # acquire is paired with release_replica() once the window is done.
+    with _replica_lock:
+        if not replicas:
+            return None
+        replica = min(replicas, key=lambda candidate: (candidate.load, candidate.index))
+        replica.load += 1
+        return replica
+
+
+def release_replica(replica, count=1):
+    if replica is None:
+        return
+    with _replica_lock:
+        replica.load = max(0, replica.load - count)
+
+
+def get_replica_status():
+    with _replica_lock:
+        return [
+            {
+                "index": replica.index,
+                "device": replica.device,
+                "threads": replica.threads,
+                "load": replica.load,
+                "batches": replica.batches,
+            }
+            for replica in replicas
+        ]
+
+
 def _reset_stt_runtime():
-    global model, lm_scorer, vocab, blank_id
+    global model, model_accepts_lengths, inference_backend, backend_parity, vocab, blank_id, replicas
     model = None
-    lm_scorer = None
+    replicas = []
+    model_accepts_lengths = False
+    inference_backend = None
+    backend_parity = None
     vocab = None
     blank_id = None
 
 
+def _reset_lm_runtime():
+    global lm_scorer, lm_cache, lm_cache_error
+    lm_scorer = None
+    lm_cache = None
+    lm_cache_error = None
+
+
+def _set_component_state(name, state, error=None):
+    now = time.time()
+    with _components_lock:
+        component = _components[name]
+        if state == "loading":
+            component.clear()
+            component["started_at"] = now
+        elif "started_at" in component:
+            component["seconds"] = round(now - component["started_at"], 2)
+        component["state"] = state
+        if error is not None:
+            component["error"] = error
+
+
+def get_component_status():
+    now = time.time()
+    with _components_lock:
+        snapshot = {name: dict(component) for name, component in _components.items()}
+    for component in snapshot.values():
+        if component["state"] == "loading":
+            component["seconds"] = round(now - component["started_at"], 2)
+        component.pop("started_at", None)
+    return snapshot
+
+
+def is_loading():
+    with _components_lock:
+        return any(component["state"] in ("pending", "loading") for component in _components.values())
+
+
+def _open_kenlm_model():
+    import kenlm
+
+    config = kenlm.Config()
+    if KENLM_LOAD_METHOD == "lazy":
+        config.load_method = kenlm.LoadMethod.LAZY
+    elif KENLM_LOAD_METHOD == "populate":
+        config.load_method = kenlm.LoadMethod.POPULATE_OR_LAZY
+    elif KENLM_LOAD_METHOD == "read":
+        config.load_method = kenlm.LoadMethod.READ
+    return kenlm.Model(KENLM_PATH, config)
+
+
+def get_lm_cache():
+    # KenLM for the staged pipeline's vectorized decoder, built on first use.
+    # Blocks while another thread builds it, so request code reads lm_cache
+    # directly instead and decodes without the LM until it is ready.
+    global lm_cache, lm_cache_error
+    if lm_cache is not None or lm_cache_error is not None:
+        return lm_cache
+
+    with _lm_cache_lock:
+        if lm_cache is None and lm_cache_error is None:
+            try:
+                lm_cache = KenLMStateCache(
+                    _open_kenlm_model(),
+                    alpha=LM_ALPHA,
+                    beta=LM_BETA,
+                    max_entries=LM_CACHE_SIZE,
+                )
+                logger.info("[OK] KenLM state cache ready")
+            except Exception as exc:
+                lm_cache_error = str(exc)
+                logger.warning("KenLM state cache disabled: %s", exc)
+    return lm_cache
+
+
 def is_stt_ready():
     return (
         model is not None
@@ -112,12 +293,20 @@ def is_stt_ready():
 def get_runtime_status():
     return {
         "stt_ready": is_stt_ready(),
-        "lm_ready": lm_scorer is not None,
+        "lm_ready": lm_scorer is not None or lm_cache is not None,
+        "lm_cache": lm_cache.get_stats() if lm_cache is not None else None,
         "diarization_ready": pipeline is not None,
+        "loading": is_loading(),
+        "components": get_component_status(),
         "load_error": load_error,
         "lm_error": lm_error,
         "diarization_error": diarization_error,
         "device": DEVICE,
+        "replicas": get_replica_status(),
+        "inference_backend": inference_backend,
+        "preloaded": preloaded,
+        "backend_parity": backend_parity,
+        "feature_parity": feature_parity,
     }
 
 
@@ -142,7 +331,7 @@ def _load_diarization_pipeline():
                 )
             else:
                 logger.info("[OK] Diarization loaded | model=%s", model_id)
-            return loaded_pipeline
+            return loaded_pipeline, model_id
         except Exception as exc:
             errors.append(f"{model_id}: {exc}")
             logger.warning("Diarization model '%s' failed to load: %s", model_id, exc)
@@ -150,59 +339,212 @@ def _load_diarization_pipeline():
     raise RuntimeError("; ".join(errors))
 
 
-def load_all():
-    global model, lm_scorer, pipeline, vocab, blank_id, load_error, lm_error, diarization_error
+def _load_stt():
+    global model, vocab, blank_id, load_error, replicas
+    global model_accepts_lengths, inference_backend, backend_parity
 
     load_error = None
-    lm_error = None
-    diarization_error = None
     _reset_stt_runtime()
-    pipeline = None
-
+    _set_component_state("stt", "loading")
     try:
         with open(VOCAB_PATH, encoding="utf-8") as vocab_file:
-            vocab = [line.rstrip("\n") for line in vocab_file]
+            loaded_vocab = [line.rstrip("\n") for line in vocab_file]
 
-        if "<pad>" not in vocab:
+        if "<pad>" not in loaded_vocab:
             raise ValueError("Vocabulary does not contain '<pad>' token.")
 
-        blank_id = vocab.index("<pad>")
-
-        model = STTModel(vocab_size=len(vocab)).to(DEVICE)
+        loaded_model = STTModel(vocab_size=len(loaded_vocab)).to(DEVICE)
         checkpoint = torch.load(CKPT_PATH, map_location=DEVICE)
 
         if "model" not in checkpoint:
             raise KeyError("Checkpoint missing key 'model'.")
 
-        model.load_state_dict(checkpoint["model"])
-        model.eval()
+        loaded_model.load_state_dict(checkpoint["model"])
+        loaded_model.eval()
+        model_accepts_lengths = accepts_lengths(loaded_model)
+        if not model_accepts_lengths and INFER_MAX_BATCH_SIZE > 1:
+            logger.info("STT model takes no lengths; only equal-length windows are batched together.")
+        loaded_model, inference_backend, backend_parity = prepare_backend(loaded_model)
+
+        # The STFT window and mel filterbank are shared by every request.
+        from services.features import prepare_features
+
+        prepare_features()
+        loaded_replicas = _build_replicas(loaded_model)
+
+        # Publish the model last: is_stt_ready() keys off these globals and
+        # requests start flowing the moment they are all set.
+        vocab = loaded_vocab
+        blank_id = loaded_vocab.index("<pad>")
+        replicas = loaded_replicas
+        model = loaded_model
 
         logger.info(
-            "[OK] STT loaded | epoch=%s | WER=%s | CER=%s",
+            "[OK] STT loaded | epoch=%s | WER=%s | CER=%s | replicas=%s | threads=%s",
             checkpoint.get("epoch"),
             checkpoint.get("wer"),
             checkpoint.get("cer"),
+            len(loaded_replicas),
+            loaded_replicas[0].threads,
         )
     except Exception as exc:
         _reset_stt_runtime()
         load_error = str(exc)
+        _set_component_state("stt", "failed", load_error)
         logger.exception("Failed to load STT runtime: %s", exc)
         return
 
+    _set_component_state("stt", "ready")
+
+
+def _check_staged_features():
+    # STT_PIPELINE=staged assumes services.features reproduces the features
+    # the checkpoint was trained on; see core.backends.check_feature_parity.
+    global feature_parity
+
+    feature_parity = None
+    if STT_PIPELINE != "staged" or not is_stt_ready():
+        return
     try:
-        lm_scorer = LMScorer(KENLM_PATH, alpha=LM_ALPHA, beta=LM_BETA)
-        logger.info("[OK] KenLM loaded")
+        feature_parity = check_feature_parity(model, model_accepts_lengths)
+    except Exception as exc:
+        feature_parity = {"error": str(exc)}
+        logger.warning("Feature parity check failed to run: %s", exc)
+        return
+    if feature_parity is None:
+        return
+    if feature_parity["passed"]:
+        logger.info("[OK] Staged feature parity | word_agreement=%s", feature_parity["word_agreement"])
+    else:
+        logger.warning(
+            "Staged features disagree with the legacy pipeline (word_agreement=%s); "
+            "check N_FFT / HOP_LENGTH / N_MELS against the model's training recipe.",
+            feature_parity["word_agreement"],
+        )
+
+
+def _load_stt_component():
+    _load_stt()
+    _check_staged_features()
+
+
+def _load_lm():
+    global lm_scorer, lm_error
+
+    lm_error = None
+    _reset_lm_runtime()
+    _set_component_state("lm", "loading")
+    # One KenLM model per process: the staged decoder only scores through the
+    # state cache, the legacy pipeline only through LMScorer.
+    try:
+        if STT_PIPELINE == "staged":
+            if get_lm_cache() is None:
+                raise RuntimeError(lm_cache_error)
+        else:
+            lm_scorer = LMScorer(KENLM_PATH, alpha=LM_ALPHA, beta=LM_BETA)
+            logger.info("[OK] KenLM loaded")
     except Exception as exc:
         lm_scorer = None
         lm_error = str(exc)
+        _set_component_state("lm", "failed", lm_error)
         logger.warning("KenLM disabled: %s", exc)
+        return
+
+    _set_component_state("lm", "ready")
+
 
+def _load_diarization():
+    global pipeline, diarization_model, diarization_error
+
+    diarization_error = None
+    pipeline = None
+    diarization_model = None
+    _set_component_state("diarization", "loading")
     try:
         if not HF_TOKEN:
             raise RuntimeError("HF_TOKEN is not set.")
 
-        pipeline = _load_diarization_pipeline()
+        loaded_pipeline, model_id = _load_diarization_pipeline()
+        diarization_model = model_id
+        pipeline = loaded_pipeline
     except Exception as exc:
         pipeline = None
+        diarization_model = None
         diarization_error = str(exc)
+        _set_component_state("diarization", "failed", diarization_error)
         logger.warning("Diarization disabled: %s", exc)
+        return
+
+    _set_component_state("diarization", "ready")
+
+
+_COMPONENT_LOADERS = {
+    "stt": _load_stt_component,
+    "lm": _load_lm,
+    "diarization": _load_diarization,
+}
+
+
+def start_loading():
+    # Load the components concurrently on background threads and return
+    # immediately. Transcription without diarization is served as soon as
+    # the "stt" component is ready.
+    with _components_lock:
+        if any(thread.is_alive() for thread in _loading_threads):
+            return list(_loading_threads)
+
+        _loading_threads.clear()
+        for name in COMPONENTS:
+            _components[name] = {"state": "pending"}
+            _loading_threads.append(
+                threading.Thread(
+                    target=_COMPONENT_LOADERS[name],
+                    name=f"stt-load-{name}",
+                    daemon=True,
+                )
+            )
+        threads = list(_loading_threads)
+
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def load_all():
+    # Blocking variant used by preload() and process-pool workers.
+    for thread in start_loading():
+        thread.join()
+
+
+def load_asr():
+    # ASR model and KenLM only, for inference worker processes; speakers are
+    # assigned by the parent process, which owns the diarization pipeline.
+    _load_stt()
+    _load_lm()
+
+
+def preload():
+    # Load everything once in a parent process before forking workers. Tensor
+    # storage is moved to shared memory so workers map the same pages instead
+    # of copying them on first touch. Loading runs on one intra-op thread: a
+    # backend parity or tracing forward pass would otherwise start the
+    # OpenMP/MKL thread pools, which a forked child cannot use.
+    global preloaded, _worker_threads
+    _worker_threads = torch.get_num_threads()
+    torch.set_num_threads(1)
+    load_all()
+
+    if model is not None:
+        try:
+            model.share_memory()
+        except Exception as exc:
+            logger.warning("Could not move model weights to shared memory: %s", exc)
+
+    preloaded = True
+
+
+def start_worker():
+    # Called in every serving process after preload() and the fork, before
+    # the first request; thread pools are created here, in the worker.
+    if _worker_threads:
+        torch.set_num_threads(_worker_threads)
@@ -0,0 +1,75 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implied.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_lock = threading.Lock()
+_stages = {}
+
+
+def record(stage, seconds):
+    with _lock:
+        stats = _stages.get(stage)
+        if stats is None:
+            stats = _stages[stage] = {
+                "count": 0,
+                "total_sec": 0.0,
+                "last_sec": 0.0,
+                "max_sec": 0.0,
+                "buckets": [0] * len(BUCKETS),
+            }
+        stats["count"] += 1
+        stats["total_sec"] += seconds
+        stats["last_sec"] = seconds
+        stats["max_sec"] = max(stats["max_sec"], seconds)
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                stats["buckets"][index] += 1
+                break
+
+
+@contextmanager
+def timed(stage, timings=None):
+    # Records the wall time of the block under `stage`, and adds it to the
+    # caller's per-request `timings` dict when one is given (stages that
+    # run once per window, like features, accumulate).
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        record(stage, elapsed)
+        if timings is not None:
+            with _lock:
+                timings[stage] = round(timings.get(stage, 0.0) + elapsed, 4)
+
+
+def get_stage_status():
+    with _lock:
+        return {
+            stage: {
+                "count": stats["count"],
+                "avg_sec": round(stats["total_sec"] / stats["count"], 4),
+                "last_sec": round(stats["last_sec"], 4),
+                "max_sec": round(stats["max_sec"], 4),
+            }
+            for stage, stats in sorted(_stages.items())
+        }
+
+
+def get_stage_histograms():
+    # stage -> {"buckets": [(upper_bound, cumulative_count), ...], "count", "sum"}
+    with _lock:
+        snapshot = {stage: dict(stats, buckets=list(stats["buckets"])) for stage, stats in _stages.items()}
+
+    histograms = {}
+    for stage, stats in sorted(snapshot.items()):
+        cumulative = 0
+        buckets = []
+        for bound, count in zip(BUCKETS, stats["buckets"]):
+            cumulative += count
+            buckets.append((bound, cumulative))
+        histograms[stage] = {"buckets": buckets, "count": stats["count"], "sum": stats["total_sec"]}
+    return histograms
@@ -0,0 +1,131 @@
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+
+import uvicorn
+
+from core.config import DEVICE, STT_HOST, STT_PORT, STT_SERVER_WORKERS
+
+logger = logging.getLogger("serve")
+
+_RESPAWN_DELAY_SEC = 1.0
+
+
+def _bind_socket(host, port):
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _serve(app, sock):
+    config = uvicorn.Config(app, lifespan="on")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _spawn_worker(app, sock):
+    pid = os.fork()
+    if pid:
+        return pid
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    exit_code = 0
+    try:
+        import core.loader as loader
+
+        loader.start_worker()
+        _serve(app, sock)
+    except BaseException:
+        logger.exception("Worker %s crashed", os.getpid())
+        exit_code = 1
+    finally:
+        os._exit(exit_code)
+
+
+def _supervise(app, sock, workers):
+    stopping = False
+    children = set()
+
+    def _stop(signum, _frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                children.discard(pid)
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    for _ in range(workers):
+        children.add(_spawn_worker(app, sock))
+    logger.info("Started %s workers: %s", workers, sorted(children))
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+
+        children.discard(pid)
+        if stopping:
+            continue
+
+        logger.warning("Worker %s exited with status %s; restarting.", pid, status)
+        time.sleep(_RESPAWN_DELAY_SEC)
+        children.add(_spawn_worker(app, sock))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the STT backend with models preloaded once and shared by forked workers.",
+    )
+    parser.add_argument("--host", default=STT_HOST)
+    parser.add_argument("--port", type=int, default=STT_PORT)
+    parser.add_argument("--workers", type=int, default=STT_SERVER_WORKERS)
+    args = parser.parse_args()
+
+    workers = args.workers
+    if workers > 1 and DEVICE.startswith("cuda"):
+        # A CUDA context does not survive os.fork(); the workers could not
+        # use the weights the parent loaded onto the GPU.
+        logger.warning("DEVICE=%s cannot be shared by forked workers; running a single worker.", DEVICE)
+        workers = 1
+
+    from app import app
+    import core.loader as loader
+
+    started = time.perf_counter()
+    loader.preload()
+    logger.info("Models preloaded in %.1fs", time.perf_counter() - started)
+
+    sock = _bind_socket(args.host, args.port)
+    logger.info("Listening on %s:%s", args.host, args.port)
+
+    if workers <= 1 or not hasattr(os, "fork"):
+        if workers > 1:
+            logger.warning("os.fork is not available on this platform; running a single worker.")
+        loader.start_worker()
+        _serve(app, sock)
+        return
+
+    # Move everything allocated so far out of the GC's reach so collections in
+    # the workers do not touch (and therefore copy) the shared pages.
+    gc.collect()
+    gc.freeze()
+    _supervise(app, sock, workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+import io
+import logging
+import math
+import os
+import tempfile
+import threading
+
+import numpy as np
+import soundfile
+import torch
+import torchaudio
+
+from core.config import (
+    AUDIO_DECODE_CHUNK_SEC,
+    AUDIO_MEMMAP_MIN_SEC,
+    SAMPLE_RATE,
+    TEMP_DIR,
+)
+
+logger = logging.getLogger(__name__)
+
+# Extra source audio decoded on each side of a chunk so the resampling
+# filter sees the same neighbourhood as it would on the whole signal.
+_RESAMPLE_CONTEXT_SEC = 0.05
+_STREAM_BLOCK_SEC = 1.0
+
+
+class StreamingDecodeError(RuntimeError):
+    pass
+
+
+def _to_mono(waveform, sample_rate):
+    # (channels, samples) at any rate -> (samples,) float32 at SAMPLE_RATE.
+    if waveform.size(0) > 1:
+        waveform = waveform.mean(dim=0, keepdim=True)
+    if sample_rate != SAMPLE_RATE:
+        waveform = torchaudio.functional.resample(waveform, sample_rate, SAMPLE_RATE)
+    return waveform.squeeze(0).float()
+
+
+def _memmap_path():
+    target_dir = TEMP_DIR or None
+    if target_dir:
+        os.makedirs(target_dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=".f32", dir=target_dir)
+    os.close(fd)
+    return path
+
+
+class DecodedAudio:
+    # Mono float32 samples at SAMPLE_RATE, decoded once per request and
+    # shared by feature extraction, long-form splitting and diarization.
+    # Long recordings are decoded chunk by chunk into a memory-mapped file so
+    # resident memory stays bounded.
+
+    def __init__(self, samples, backing_path=None):
+        self.samples = samples
+        self.sample_rate = SAMPLE_RATE
+        self._backing_path = backing_path
+
+    @classmethod
+    def from_path(cls, path):
+        info = torchaudio.info(path)
+        if info.sample_rate > 0 and info.num_frames > 0:
+            duration = info.num_frames / float(info.sample_rate)
+            if AUDIO_MEMMAP_MIN_SEC and duration >= AUDIO_MEMMAP_MIN_SEC:
+                return cls._decode_to_memmap(path, info.num_frames, info.sample_rate)
+
+        waveform, sample_rate = torchaudio.load(path)
+        return cls(_to_mono(waveform, sample_rate).numpy())
+
+    @classmethod
+    def from_waveform(cls, waveform):
+        return cls(np.ascontiguousarray(waveform.detach().cpu().numpy(), dtype=np.float32))
+
+    @classmethod
+    def _decode_to_memmap(cls, path, num_frames, source_rate):
+        # Chunks start on multiples of the reduced rate ratio so every chunk
+        # maps to a whole number of output samples and the pieces line up.
+        divisor = math.gcd(source_rate, SAMPLE_RATE)
+        step_in = source_rate // divisor
+        step_out = SAMPLE_RATE // divisor
+        resampling = source_rate != SAMPLE_RATE
+
+        chunk = max(step_in, int(AUDIO_DECODE_CHUNK_SEC * source_rate) // step_in * step_in)
+        context = 0
+        if resampling:
+            context = math.ceil(_RESAMPLE_CONTEXT_SEC * source_rate / step_in) * step_in
+        total = -(-num_frames * SAMPLE_RATE // source_rate)
+
+        backing_path = _memmap_path()
+        try:
+            buffer = np.memmap(backing_path, dtype=np.float32, mode="w+", shape=(total,))
+            written = 0
+            for start in range(0, num_frames, chunk):
+                lower = max(0, start - context)
+                upper = min(num_frames, start + chunk + context)
+                waveform, sample_rate = torchaudio.load(
+                    path,
+                    frame_offset=lower,
+                    num_frames=upper - lower,
+                )
+                if waveform.numel() == 0:
+                    break
+
+                samples = _to_mono(waveform, sample_rate)
+                skip = (start - lower) * step_out // step_in
+                want = -(-min(chunk, num_frames - start) * SAMPLE_RATE // source_rate)
+                piece = samples[skip:skip + min(want, total - written)].numpy()
+                buffer[written:written + piece.size] = piece
+                written += piece.size
+            buffer.flush()
+        except Exception:
+            _remove(backing_path)
+            raise
+
+        audio = cls(buffer[:written], backing_path)
+        if os.name != "nt":
+            # The mapping keeps the data alive; unlinking now means nothing
+            # is left behind even if close() is never reached.
+            _remove(backing_path)
+            audio._backing_path = None
+        logger.info(
+            "Decoded %.1fs of audio into a memory map | chunks=%s",
+            written / float(SAMPLE_RATE),
+            -(-num_frames // chunk),
+        )
+        return audio
+
+    @property
+    def duration(self):
+        return len(self.samples) / float(self.sample_rate)
+
+    @property
+    def waveform(self):
+        # (samples,) tensor sharing memory with the buffer.
+        return torch.from_numpy(self.samples)
+
+    def slice(self, start_sec, end_sec):
+        start = max(0, int(start_sec * self.sample_rate))
+        end = min(len(self.samples), int(end_sec * self.sample_rate))
+        return torch.from_numpy(self.samples[start:max(start, end)])
+
+    def gather(self, regions):
+        # New DecodedAudio holding only the (start, end) sample ranges in
+        # regions, back to back. Memory-mapped under the same rule as decoding.
+        total = sum(end - start for start, end in regions)
+        backing_path = None
+        if AUDIO_MEMMAP_MIN_SEC and total >= AUDIO_MEMMAP_MIN_SEC * self.sample_rate:
+            backing_path = _memmap_path()
+            buffer = np.memmap(backing_path, dtype=np.float32, mode="w+", shape=(total,))
+            if os.name != "nt":
+                _remove(backing_path)
+                backing_path = None
+        else:
+            buffer = np.empty(total, dtype=np.float32)
+
+        written = 0
+        for start, end in regions:
+            buffer[written:written + end - start] = self.samples[start:end]
+            written += end - start
+        return DecodedAudio(buffer, backing_path)
+
+    def close(self):
+        self.samples = None
+        if self._backing_path:
+            _remove(self._backing_path)
+            self._backing_path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        logger.warning("Could not remove audio buffer file: %s", path)
+
+
+class GrowingFile(io.RawIOBase):
+    # Read side of a file a download is still writing. Reads block until the
+    # requested bytes arrive; once the download ends (or fails) reads past
+    # the written data return EOF. The writer reports via progress()/finish().
+
+    def __init__(self, path):
+        super().__init__()
+        self._path = path
+        self._handle = None
+        self._position = 0
+        self._condition = threading.Condition()
+        self._written = 0
+        self._total = None
+        self._finished = False
+        self.error = None
+        self.restarted = False
+
+    def progress(self, written, total, restarted=False):
+        with self._condition:
+            if restarted:
+                # Bytes already handed to the decoder are no longer valid.
+                self.restarted = True
+            self._written = written
+            self._total = total
+            self._condition.notify_all()
+
+    def finish(self, error=None):
+        with self._condition:
+            if not self._finished:
+                self._finished = True
+                self.error = error
+            self._condition.notify_all()
+
+    def wait_complete(self):
+        with self._condition:
+            self._condition.wait_for(lambda: self._finished)
+        if self.error is not None:
+            raise self.error
+
+    def _wait_until(self, predicate):
+        with self._condition:
+            self._condition.wait_for(lambda: self._finished or self.restarted or predicate())
+            return self._written
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def _size(self):
+        self._wait_until(lambda: self._total is not None)
+        return self._total if self._total is not None else self._written
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._size()
+        self._position = max(0, offset)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+    def readinto(self, buffer):
+        wanted = len(buffer)
+        available = self._wait_until(lambda: self._written >= self._position + wanted)
+        if self.restarted:
+            return 0
+
+        count = min(wanted, max(0, available - self._position))
+        if count == 0:
+            return 0
+        if self._handle is None:
+            self._handle = open(self._path, "rb")
+        self._handle.seek(self._position)
+        data = self._handle.read(count)
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        super().close()
+
+
+class _StreamResampler:
+    # Incremental mono resampler. Emits the same samples as resampling the
+    # whole signal at once, using the chunk alignment of _decode_to_memmap.
+
+    def __init__(self, source_rate):
+        divisor = math.gcd(source_rate, SAMPLE_RATE)
+        self.source_rate = source_rate
+        self.step_in = source_rate // divisor
+        self.step_out = SAMPLE_RATE // divisor
+        self.resampling = source_rate != SAMPLE_RATE
+        self.chunk = max(self.step_in, int(_STREAM_BLOCK_SEC * source_rate) // self.step_in * self.step_in)
+        self.context = 0
+        if self.resampling:
+            self.context = math.ceil(_RESAMPLE_CONTEXT_SEC * source_rate / self.step_in) * self.step_in
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._offset = 0
+        self._position = 0
+
+    def _available(self):
+        return self._offset + len(self._buffer)
+
+    def _emit(self, end):
+        lower = max(0, self._position - self.context)
+        upper = min(self._available(), end + self.context)
+        piece = torch.from_numpy(self._buffer[lower - self._offset:upper - self._offset].copy())
+        if self.resampling:
+            piece = torchaudio.functional.resample(piece, self.source_rate, SAMPLE_RATE)
+        skip = (self._position - lower) * self.step_out // self.step_in
+        want = -(-(end - self._position) * SAMPLE_RATE // self.source_rate)
+        out = piece[skip:skip + want]
+
+        self._position = end
+        drop = max(0, self._position - self.context) - self._offset
+        if drop > 0:
+            self._buffer = self._buffer[drop:]
+            self._offset += drop
+        return out
+
+    def push(self, samples):
+        self._buffer = np.concatenate([self._buffer, samples.astype(np.float32, copy=False)])
+        while self._available() - self._position >= self.chunk + self.context:
+            yield self._emit(self._position + self.chunk)
+
+    def flush(self):
+        while self._position < self._available():
+            yield self._emit(min(self._position + self.chunk, self._available()))
+
+
+def decode_stream(source):
+    # Yields (samples,) float32 tensors at SAMPLE_RATE while `source` (a
+    # file-like object, typically a GrowingFile) is still being written.
+    # Raises StreamingDecodeError when libsndfile cannot read the format so
+    # callers can fall back to decoding the finished file.
+    try:
+        sound = soundfile.SoundFile(source)
+    except (soundfile.LibsndfileError, RuntimeError, TypeError) as exc:
+        raise StreamingDecodeError(str(exc)) from exc
+
+    with sound:
+        resampler = _StreamResampler(sound.samplerate)
+        block = max(1, int(_STREAM_BLOCK_SEC * sound.samplerate))
+        try:
+            for frames in sound.blocks(blocksize=block, dtype="float32", always_2d=True):
+                yield from resampler.push(frames.mean(axis=1))
+        except (soundfile.LibsndfileError, RuntimeError) as exc:
+            raise StreamingDecodeError(str(exc)) from exc
+        yield from resampler.flush()
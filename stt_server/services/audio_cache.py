@@ -0,0 +1,257 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import soundfile
+
+from core.config import (
+    AUDIO_CACHE_DIR,
+    AUDIO_CACHE_ENABLED,
+    AUDIO_CACHE_MAX_AGE_SEC,
+    AUDIO_CACHE_MAX_BYTES,
+    SAMPLE_RATE,
+)
+from services.audio import DecodedAudio
+import services.transcript_cache as transcript_cache
+
+logger = logging.getLogger(__name__)
+
+# Each audio_url maps to <key>.wav (decoded 16 kHz mono float32) and
+# <key>.json (url, validator, original audio hash). The validator is the
+# ETag or Last-Modified the audio was downloaded with.
+
+_lock = threading.Lock()
+_total_bytes = None
+# Audio paths handed out by lookup()/store() and not yet released; eviction
+# skips them so a transcription never loses its input.
+_pinned = {}
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "revalidated": 0,
+    "writes": 0,
+    "evictions": 0,
+}
+
+
+def _url_key(url):
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def _audio_path(key):
+    return os.path.join(AUDIO_CACHE_DIR, f"{key}.wav")
+
+
+def _meta_path(key):
+    return os.path.join(AUDIO_CACHE_DIR, f"{key}.json")
+
+
+def _read_meta(key):
+    try:
+        with open(_meta_path(key), encoding="utf-8") as meta_file:
+            return json.load(meta_file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, payload):
+    fd, temp_path = tempfile.mkstemp(dir=AUDIO_CACHE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as temp_file:
+        json.dump(payload, temp_file)
+    os.replace(temp_path, path)
+
+
+def _pin(path):
+    _pinned[path] = _pinned.get(path, 0) + 1
+
+
+def _scan_entries():
+    entries = []
+    try:
+        names = os.listdir(AUDIO_CACHE_DIR)
+    except OSError:
+        return entries
+
+    for name in names:
+        if not name.endswith(".wav"):
+            continue
+        path = os.path.join(AUDIO_CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    return entries
+
+
+def _evict_if_needed():
+    # Sizes are read back from the directory on every write, as other server
+    # processes share the cache (see transcript_cache._evict_if_needed).
+    # Entries pinned by another process are not known here.
+    global _total_bytes
+    entries = _scan_entries()
+    _total_bytes = sum(size for _, size, _ in entries)
+    if _total_bytes <= AUDIO_CACHE_MAX_BYTES:
+        return
+
+    # Least recently used first: hits refresh the audio file mtime.
+    for _, size, path in sorted(entries):
+        if _total_bytes <= AUDIO_CACHE_MAX_BYTES:
+            break
+        if path in _pinned:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        try:
+            os.remove(path[:-len(".wav")] + ".json")
+        except OSError:
+            pass
+        _total_bytes -= size
+        _stats["evictions"] += 1
+
+
+def contains(url):
+    if not AUDIO_CACHE_ENABLED:
+        return False
+    key = _url_key(url)
+    return os.path.exists(_meta_path(key)) and os.path.exists(_audio_path(key))
+
+
+def lookup(url):
+    # Returns the entry for url, pinned until release(), or None. When
+    # entry["fresh"] is false it must be revalidated before use.
+    if not AUDIO_CACHE_ENABLED:
+        return None
+
+    key = _url_key(url)
+    path = _audio_path(key)
+    with _lock:
+        meta = _read_meta(key)
+        try:
+            # Also refreshes the LRU position.
+            os.utime(path, None)
+        except OSError:
+            meta = None
+        if meta is None or meta.get("url") != url:
+            _stats["misses"] += 1
+            return None
+        _pin(path)
+
+        age = time.time() - meta.get("validated_at", 0)
+        meta["fresh"] = not AUDIO_CACHE_MAX_AGE_SEC or age < AUDIO_CACHE_MAX_AGE_SEC
+        if meta["fresh"]:
+            _stats["hits"] += 1
+    meta["path"] = path
+    return meta
+
+
+def mark_validated(entry):
+    # The server answered 304 for a stale entry.
+    key = _url_key(entry["url"])
+    with _lock:
+        meta = _read_meta(key)
+        if meta is not None:
+            meta["validated_at"] = time.time()
+            try:
+                _write_json(_meta_path(key), meta)
+            except OSError as exc:
+                logger.warning("Could not update audio cache entry: %s", exc)
+        _stats["hits"] += 1
+        _stats["revalidated"] += 1
+    entry["fresh"] = True
+
+
+def release(entry):
+    if not entry:
+        return
+    path = entry["path"]
+    with _lock:
+        count = _pinned.get(path, 0) - 1
+        if count > 0:
+            _pinned[path] = count
+        else:
+            _pinned.pop(path, None)
+
+
+def store(url, source_path, validator, audio_hash=None, audio=None):
+    # Decodes a downloaded file into the cache and returns the pinned entry,
+    # or None when caching is off or the audio cannot be decoded.
+    # audio: the caller's DecodedAudio of source_path, written instead of
+    # decoding the file again; it is left open.
+    if not AUDIO_CACHE_ENABLED:
+        return None
+
+    if audio_hash is None:
+        audio_hash = transcript_cache.hash_audio_file(source_path)
+    owned = audio is None
+    if owned:
+        try:
+            audio = DecodedAudio.from_path(source_path)
+        except Exception as exc:
+            logger.info("Not caching undecodable audio from %s: %s", url, exc)
+            return None
+
+    key = _url_key(url)
+    path = _audio_path(key)
+    now = time.time()
+    meta = {
+        "url": url,
+        "validator": validator,
+        "audio_hash": audio_hash,
+        "duration": round(audio.duration, 3),
+        "fetched_at": now,
+        "validated_at": now,
+    }
+    try:
+        if len(audio.samples) * 4 > AUDIO_CACHE_MAX_BYTES:
+            return None
+        try:
+            os.makedirs(AUDIO_CACHE_DIR, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=AUDIO_CACHE_DIR, suffix=".tmp")
+            os.close(fd)
+            soundfile.write(temp_path, audio.samples, SAMPLE_RATE, subtype="FLOAT", format="WAV")
+        except (OSError, RuntimeError) as exc:
+            logger.warning("Could not write audio cache entry: %s", exc)
+            return None
+    finally:
+        if owned:
+            audio.close()
+
+    with _lock:
+        try:
+            os.replace(temp_path, path)
+            _write_json(_meta_path(key), meta)
+        except OSError as exc:
+            logger.warning("Could not write audio cache entry: %s", exc)
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return None
+
+        _pin(path)
+        _stats["writes"] += 1
+        _evict_if_needed()
+
+    meta["path"] = path
+    meta["fresh"] = True
+    return meta
+
+
+def get_cache_status():
+    with _lock:
+        stats = dict(_stats)
+        stats["size_bytes"] = _total_bytes
+        stats["in_use"] = len(_pinned)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else None
+    stats["enabled"] = AUDIO_CACHE_ENABLED
+    stats["max_bytes"] = AUDIO_CACHE_MAX_BYTES
+    stats["max_age_sec"] = AUDIO_CACHE_MAX_AGE_SEC
+    return stats
@@ -0,0 +1,138 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import core.loader as loader
+from core.config import (
+    DIARIZATION_CACHE_ENABLED,
+    DIARIZATION_CACHE_MAX_ENTRIES,
+    DIARIZE_AUTO_MIN_SEC,
+    DIARIZE_MODES,
+    SAMPLE_RATE,
+)
+from core.timings import timed
+
+logger = logging.getLogger(__name__)
+
+
+class DiarizationFailedError(RuntimeError):
+    # Diarization failed after the transcript was decoded. segments is the
+    # transcript without speaker labels, usable but not worth caching.
+
+    def __init__(self, detail, segments):
+        super().__init__(detail, segments)
+        self.segments = segments
+
+    def __str__(self):
+        return str(self.args[0])
+
+# One pyannote pipeline object is shared by the process and is not safe to
+# call from several threads at once, so diarization jobs run one at a time
+# next to the (batched) acoustic decoding.
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stt-diarize")
+_lock = threading.Lock()
+_entries = OrderedDict()
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "evictions": 0,
+}
+
+
+def is_available():
+    return loader.pipeline is not None
+
+
+def should_diarize(mode, duration=None):
+    if mode not in DIARIZE_MODES:
+        raise ValueError(f"diarize must be one of: {', '.join(DIARIZE_MODES)}.")
+    if mode == "off" or not is_available():
+        return False
+    if mode == "on":
+        return True
+    return duration is not None and duration >= DIARIZE_AUTO_MIN_SEC
+
+
+def hash_waveform(waveform):
+    # Hashes the samples in place; callers that know the content hash of the
+    # source file pass it as audio_hash instead.
+    array = np.ascontiguousarray(waveform.detach().cpu().numpy(), dtype=np.float32)
+    return hashlib.sha256(memoryview(array).cast("B")).hexdigest()
+
+
+def _run_pipeline(waveform):
+    audio = {"waveform": waveform.detach().cpu().float().unsqueeze(0), "sample_rate": SAMPLE_RATE}
+    embeddings = None
+    try:
+        annotation, embeddings = loader.pipeline(audio, return_embeddings=True)
+    except TypeError:
+        # Older pipelines do not expose speaker embeddings.
+        annotation = loader.pipeline(audio)
+
+    turns = [
+        {"start": round(turn.start, 2), "end": round(turn.end, 2), "speaker": label}
+        for turn, _, label in annotation.itertracks(yield_label=True)
+    ]
+    speakers = {}
+    if embeddings is not None:
+        for label, embedding in zip(annotation.labels(), embeddings):
+            speakers[label] = np.asarray(embedding, dtype=np.float32)
+    return {"turns": turns, "embeddings": speakers}
+
+
+def diarize_waveform(waveform, audio_hash=None):
+    # Returns {"turns": [{start, end, speaker}], "embeddings": {speaker: vector}}.
+    if not DIARIZATION_CACHE_ENABLED:
+        with timed("diarization"):
+            return _run_pipeline(waveform)
+
+    # Keyed on the model actually loaded, which may be the fallback.
+    key = f"{loader.diarization_model}|{audio_hash or hash_waveform(waveform)}"
+    with _lock:
+        result = _entries.get(key)
+        if result is not None:
+            _entries.move_to_end(key)
+            _stats["hits"] += 1
+            return result
+        _stats["misses"] += 1
+
+    with timed("diarization"):
+        result = _run_pipeline(waveform)
+
+    with _lock:
+        _entries[key] = result
+        _entries.move_to_end(key)
+        while len(_entries) > DIARIZATION_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+            _stats["evictions"] += 1
+    return result
+
+
+def submit(waveform, audio_hash=None):
+    return _executor.submit(diarize_waveform, waveform, audio_hash)
+
+
+def assign_speakers(segments, turns):
+    # Label each segment with the speaker whose turns overlap it the most.
+    for segment in segments:
+        overlaps = {}
+        for turn in turns:
+            overlap = min(segment["end"], turn["end"]) - max(segment["start"], turn["start"])
+            if overlap > 0:
+                overlaps[turn["speaker"]] = overlaps.get(turn["speaker"], 0.0) + overlap
+        if overlaps:
+            segment["speaker"] = max(overlaps, key=overlaps.get)
+    return segments
+
+
+def get_cache_status():
+    with _lock:
+        status = dict(_stats)
+        status["entries"] = len(_entries)
+    status["enabled"] = DIARIZATION_CACHE_ENABLED
+    status["max_entries"] = DIARIZATION_CACHE_MAX_ENTRIES
+    return status
@@ -0,0 +1,176 @@
+import os
+import threading
+
+import numpy as np
+import torch
+import torchaudio
+
+from core.config import AUDIO_MEMMAP_MIN_SEC, HOP_LENGTH, N_FFT, N_MELS, SAMPLE_RATE
+from services.audio import _memmap_path, _remove
+
+# Log-mel features matching torchaudio.transforms.MelSpectrogram (centered,
+# reflect-padded, power 2, HTK mel scale) followed by log(clamp(1e-10)).
+# Recordings are transformed in fixed-size blocks of frames; each block
+# reads exactly the samples its frames cover, so blocks are independent and
+# same-sized blocks go through one batched STFT.
+
+_PAD = N_FFT // 2
+_LOG_FLOOR = 1e-10
+_BLOCK_FRAMES = 1024  # ~10 s at the default hop
+_BATCH_BLOCKS = 8
+
+_window = None
+_filterbank = None
+_prepare_lock = threading.Lock()
+
+
+def prepare_features():
+    # Builds the analysis window and mel filterbank once; called while the
+    # model loads so the first request does not pay for it.
+    global _window, _filterbank
+    if _filterbank is not None:
+        return
+    with _prepare_lock:
+        if _filterbank is None:
+            _window = torch.hann_window(N_FFT)
+            _filterbank = torchaudio.functional.melscale_fbanks(
+                N_FFT // 2 + 1,
+                f_min=0.0,
+                f_max=float(SAMPLE_RATE // 2),
+                n_mels=N_MELS,
+                sample_rate=SAMPLE_RATE,
+            )
+
+
+def frame_count(num_samples):
+    # Frames of a centered STFT over num_samples samples.
+    return num_samples // HOP_LENGTH + 1
+
+
+def _frame_span(samples, first_frame, end_frame, ended):
+    # Samples under frames [first_frame, end_frame) with the reflect padding
+    # a centered STFT would add at the edges of the recording.
+    lower = first_frame * HOP_LENGTH - _PAD
+    upper = (end_frame - 1) * HOP_LENGTH + _PAD
+    total = samples.numel()
+
+    pieces = []
+    if lower < 0:
+        pieces.append(samples[1:1 - lower].flip(0))
+    pieces.append(samples[max(0, lower):min(total, upper)])
+    if upper > total and ended:
+        pieces.append(samples[max(0, 2 * total - upper - 1):total - 1].flip(0))
+    return torch.cat(pieces) if len(pieces) > 1 else pieces[0]
+
+
+def _log_mel(batch):
+    # (blocks, samples) -> (blocks, frames, n_mels)
+    spectrum = torch.stft(
+        batch,
+        N_FFT,
+        hop_length=HOP_LENGTH,
+        win_length=N_FFT,
+        window=_window,
+        center=False,
+        return_complex=True,
+    )
+    power = spectrum.abs().pow(2.0)
+    mel = torch.matmul(power.transpose(-1, -2), _filterbank)
+    return torch.log(mel.clamp(min=_LOG_FLOOR))
+
+
+def compute_frames(samples, first_frame, end_frame, ended=True, out=None):
+    # Frames [first_frame, end_frame) of the log-mel features of `samples`.
+    # ended=False means more samples may follow, so the right edge is not
+    # reflect-padded (callers only ask for frames whose samples exist).
+    prepare_features()
+    if out is None:
+        out = torch.empty(end_frame - first_frame, N_MELS)
+
+    full = []
+    with torch.inference_mode():
+        for start in range(first_frame, end_frame, _BLOCK_FRAMES):
+            end = min(start + _BLOCK_FRAMES, end_frame)
+            if end - start < _BLOCK_FRAMES:
+                out[start - first_frame:end - first_frame] = _log_mel(
+                    _frame_span(samples, start, end, ended).unsqueeze(0)
+                )[0]
+                continue
+            full.append(start)
+            if len(full) == _BATCH_BLOCKS:
+                _fill_blocks(samples, full, first_frame, ended, out)
+                full = []
+        if full:
+            _fill_blocks(samples, full, first_frame, ended, out)
+    return out
+
+
+def _fill_blocks(samples, starts, first_frame, ended, out):
+    batch = torch.stack([_frame_span(samples, start, start + _BLOCK_FRAMES, ended) for start in starts])
+    for start, frames in zip(starts, _log_mel(batch)):
+        out[start - first_frame:start - first_frame + _BLOCK_FRAMES] = frames
+
+
+def log_mel(waveform):
+    # (samples,) -> (frames, n_mels) for a whole recording.
+    return compute_frames(waveform, 0, frame_count(waveform.numel()))
+
+
+class FrameCache:
+    # Log-mel frames of one recording, each computed once and shared by all
+    # decode windows that read it (long-form windows overlap). Blocks are
+    # filled on first use; recordings of at least AUDIO_MEMMAP_MIN_SEC keep
+    # their frames in a memory-mapped file instead of RAM.
+
+    def __init__(self, audio):
+        self._samples = audio.waveform
+        self.total_frames = frame_count(self._samples.numel())
+        self._filled = np.zeros(-(-self.total_frames // _BLOCK_FRAMES), dtype=bool)
+        self._lock = threading.Lock()
+        self._backing_path = None
+
+        shape = (self.total_frames, N_MELS)
+        if AUDIO_MEMMAP_MIN_SEC and audio.duration >= AUDIO_MEMMAP_MIN_SEC:
+            self._backing_path = _memmap_path()
+            self._frames = np.memmap(self._backing_path, dtype=np.float32, mode="w+", shape=shape)
+            if os.name != "nt":
+                _remove(self._backing_path)
+                self._backing_path = None
+        else:
+            self._frames = np.empty(shape, dtype=np.float32)
+
+    def _fill(self, first_block, end_block):
+        start = first_block * _BLOCK_FRAMES
+        end = min(end_block * _BLOCK_FRAMES, self.total_frames)
+        compute_frames(self._samples, start, end, out=torch.from_numpy(self._frames[start:end]))
+        self._filled[first_block:end_block] = True
+
+    def frames(self, start_frame, end_frame):
+        # Returns a (frames, n_mels) tensor the caller owns.
+        start_frame = max(0, start_frame)
+        end_frame = min(self.total_frames, end_frame)
+        with self._lock:
+            run_start = None
+            for block in range(start_frame // _BLOCK_FRAMES, -(-end_frame // _BLOCK_FRAMES)):
+                if not self._filled[block]:
+                    if run_start is None:
+                        run_start = block
+                    continue
+                if run_start is not None:
+                    self._fill(run_start, block)
+                    run_start = None
+            if run_start is not None:
+                self._fill(run_start, -(-end_frame // _BLOCK_FRAMES))
+        return torch.from_numpy(np.array(self._frames[start_frame:end_frame]))
+
+    def close(self):
+        self._frames = None
+        if self._backing_path is not None:
+            _remove(self._backing_path)
+            self._backing_path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,182 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from core.config import JOB_STORE_PATH
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    stage TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    request TEXT NOT NULL,
+    audio_path TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    owner TEXT,
+    heartbeat_at REAL
+)
+"""
+# Columns added after the first release, created on older stores at connect.
+_ADDED_COLUMNS = (("owner", "TEXT"), ("heartbeat_at", "REAL"))
+_JSON_COLUMNS = ("request", "result")
+_UPDATABLE_COLUMNS = {
+    "status",
+    "stage",
+    "progress",
+    "audio_path",
+    "result",
+    "error",
+    "started_at",
+    "finished_at",
+}
+
+_lock = threading.Lock()
+_connection = None
+
+
+def _connect():
+    global _connection
+    if _connection is None:
+        os.makedirs(os.path.dirname(JOB_STORE_PATH) or ".", exist_ok=True)
+        # Forked server workers share the file; writers wait for each other.
+        connection = sqlite3.connect(JOB_STORE_PATH, check_same_thread=False, timeout=30.0)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(_SCHEMA)
+        existing = {row["name"] for row in connection.execute("PRAGMA table_info(jobs)")}
+        for column, column_type in _ADDED_COLUMNS:
+            if column not in existing:
+                connection.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+        connection.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+        connection.commit()
+        _connection = connection
+    return _connection
+
+
+def _to_dict(row):
+    if row is None:
+        return None
+    job = dict(row)
+    for column in _JSON_COLUMNS:
+        if job.get(column) is not None:
+            job[column] = json.loads(job[column])
+    return job
+
+
+def create(job_id, request, priority=0, audio_path=None):
+    with _lock:
+        connection = _connect()
+        connection.execute(
+            "INSERT INTO jobs (id, status, priority, stage, request, audio_path, created_at) "
+            "VALUES (?, 'queued', ?, 'queued', ?, ?, ?)",
+            (job_id, priority, json.dumps(request), audio_path, time.time()),
+        )
+        connection.commit()
+
+
+def update(job_id, **fields):
+    unknown = set(fields) - _UPDATABLE_COLUMNS
+    if unknown:
+        raise ValueError(f"Unknown job fields: {', '.join(sorted(unknown))}")
+
+    values = []
+    for column, value in fields.items():
+        values.append(json.dumps(value) if column in _JSON_COLUMNS and value is not None else value)
+    assignments = ", ".join(f"{column} = ?" for column in fields)
+    with _lock:
+        connection = _connect()
+        connection.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*values, job_id))
+        connection.commit()
+
+
+def get(job_id):
+    with _lock:
+        row = _connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _to_dict(row)
+
+
+def claim(job_id, owner):
+    # Atomically moves a queued job to running for owner. Several processes
+    # may hold the same id in their queues; exactly one claim succeeds.
+    now = time.time()
+    with _lock:
+        connection = _connect()
+        cursor = connection.execute(
+            "UPDATE jobs SET status = 'running', stage = 'starting', owner = ?, started_at = ?, heartbeat_at = ? "
+            "WHERE id = ? AND status = 'queued'",
+            (owner, now, now, job_id),
+        )
+        connection.commit()
+    return cursor.rowcount == 1
+
+
+def heartbeat(owner):
+    # Renews the lease on every job owner is running.
+    with _lock:
+        connection = _connect()
+        connection.execute(
+            "UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status = 'running'",
+            (time.time(), owner),
+        )
+        connection.commit()
+
+
+def requeue_stale(stale_before):
+    # Queues again running jobs whose owner stopped renewing its lease (the
+    # process died). Jobs of live owners are never touched.
+    with _lock:
+        connection = _connect()
+        cursor = connection.execute(
+            "UPDATE jobs SET status = 'queued', stage = 'queued', progress = 0, owner = NULL "
+            "WHERE status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+            (stale_before,),
+        )
+        connection.commit()
+    return cursor.rowcount
+
+
+def list_queued():
+    # (id, priority) of queued jobs, oldest first.
+    with _lock:
+        rows = _connect().execute(
+            "SELECT id, priority FROM jobs WHERE status = 'queued' ORDER BY created_at"
+        ).fetchall()
+    return [(row["id"], row["priority"]) for row in rows]
+
+
+def purge_finished(older_than):
+    # Removes finished jobs older than the cutoff; returns their audio paths.
+    with _lock:
+        connection = _connect()
+        rows = connection.execute(
+            "SELECT audio_path FROM jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?",
+            (older_than,),
+        ).fetchall()
+        connection.execute(
+            "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?",
+            (older_than,),
+        )
+        connection.commit()
+    return [row["audio_path"] for row in rows if row["audio_path"]]
+
+
+def count_by_status():
+    with _lock:
+        rows = _connect().execute("SELECT status, COUNT(*) AS total FROM jobs GROUP BY status").fetchall()
+    return {row["status"]: row["total"] for row in rows}
+
+
+def close():
+    global _connection
+    with _lock:
+        if _connection is not None:
+            _connection.close()
+            _connection = None
@@ -0,0 +1,198 @@
+import itertools
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+
+import core.loader as loader
+from core.config import JOB_LEASE_SEC, JOB_MAX_QUEUED, JOB_RETENTION_SEC, JOB_WORKERS
+import services.job_store as job_store
+
+logger = logging.getLogger(__name__)
+
+_READY_POLL_SEC = 1.0
+
+
+class JobQueueFullError(RuntimeError):
+    pass
+
+
+class JobError(RuntimeError):
+    # Raised by handlers for failures whose message is safe to show clients.
+    pass
+
+
+# Every server process (serve.py forks several) runs its own workers on the
+# shared store. A job is run by whichever process claims it first; running
+# jobs carry their owner's lease, renewed every JOB_LEASE_SEC / 3, and only
+# jobs whose lease ran out (the owner died) are queued again.
+
+_pending = queue.PriorityQueue()
+_pending_ids = set()
+_pending_lock = threading.Lock()
+_sequence = itertools.count()
+_stop = threading.Event()
+_workers = []
+_workers_lock = threading.Lock()
+_handler = None
+_owner = None
+
+
+def _enqueue(job_id, priority):
+    # Higher priority first, then submission order. Ids already waiting in
+    # this process are not queued twice.
+    with _pending_lock:
+        if job_id in _pending_ids:
+            return
+        _pending_ids.add(job_id)
+    _pending.put((-priority, next(_sequence), job_id))
+
+
+def _recover():
+    # Requeues jobs of dead owners and picks up queued jobs no live process
+    # holds, e.g. those submitted to a worker that exited before running them.
+    requeued = job_store.requeue_stale(time.time() - JOB_LEASE_SEC)
+    if requeued:
+        logger.warning("Requeued %s job(s) whose worker stopped", requeued)
+    for job_id, priority in job_store.list_queued():
+        _enqueue(job_id, priority)
+
+
+def _remove_file(path):
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError:
+            logger.warning("Could not remove job audio: %s", path)
+
+
+def start(handler):
+    # handler(job, report) -> result dict; report(stage, progress) updates
+    # the stored progress. Queued jobs, and running jobs whose owner's lease
+    # has expired, are picked up again.
+    global _handler, _owner
+    with _workers_lock:
+        if _workers:
+            return
+        _handler = handler
+        # Set here, not at import, so forked workers get distinct owners.
+        _owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        _stop.clear()
+
+        if JOB_RETENTION_SEC:
+            for path in job_store.purge_finished(time.time() - JOB_RETENTION_SEC):
+                _remove_file(path)
+        _recover()
+
+        for index in range(JOB_WORKERS):
+            worker = threading.Thread(
+                target=_worker_loop,
+                name=f"stt-job-{index}",
+                daemon=True,
+            )
+            worker.start()
+            _workers.append(worker)
+        threading.Thread(target=_lease_loop, name="stt-job-lease", daemon=True).start()
+    logger.info("[OK] Job workers started | workers=%s | queued=%s", JOB_WORKERS, _pending.qsize())
+
+
+def shutdown():
+    with _workers_lock:
+        _stop.set()
+        for _ in _workers:
+            _pending.put((float("inf"), next(_sequence), None))
+        _workers.clear()
+
+
+def submit(request, priority=0, audio_path=None):
+    if job_store.count_by_status().get("queued", 0) >= JOB_MAX_QUEUED:
+        raise JobQueueFullError("Job queue is full.")
+
+    job_id = uuid.uuid4().hex
+    job_store.create(job_id, request, priority=priority, audio_path=audio_path)
+    _enqueue(job_id, priority)
+    return job_id
+
+
+def get(job_id):
+    return job_store.get(job_id)
+
+
+def get_jobs_status():
+    by_status = job_store.count_by_status()
+    return {
+        "workers": JOB_WORKERS,
+        "queue_depth": by_status.get("queued", 0),
+        "queue_capacity": JOB_MAX_QUEUED,
+        "by_status": by_status,
+    }
+
+
+def _wait_until_ready():
+    while not loader.is_stt_ready():
+        if not loader.is_loading():
+            raise JobError(loader.load_error or "STT backend is not ready.")
+        if _stop.wait(_READY_POLL_SEC):
+            return False
+    return True
+
+
+def _run(job):
+    job_id = job["id"]
+
+    def report(stage, progress):
+        job_store.update(job_id, stage=stage, progress=round(progress, 3))
+
+    try:
+        result = _handler(job, report)
+    except JobError as exc:
+        job_store.update(job_id, status="failed", error=str(exc), finished_at=time.time())
+    except Exception as exc:
+        logger.exception("Job %s failed: %s", job_id, exc)
+        job_store.update(job_id, status="failed", error="Transcription failed.", finished_at=time.time())
+    else:
+        job_store.update(
+            job_id,
+            status="succeeded",
+            stage="done",
+            progress=1.0,
+            result=result,
+            finished_at=time.time(),
+        )
+    finally:
+        job = job_store.get(job_id)
+        _remove_file(job and job.get("audio_path"))
+
+
+def _lease_loop():
+    while not _stop.wait(JOB_LEASE_SEC / 3.0):
+        try:
+            job_store.heartbeat(_owner)
+            _recover()
+        except Exception as exc:
+            logger.warning("Job lease renewal failed: %s", exc)
+
+
+def _worker_loop():
+    while not _stop.is_set():
+        _, _, job_id = _pending.get()
+        if job_id is None:
+            return
+        with _pending_lock:
+            _pending_ids.discard(job_id)
+
+        try:
+            if not _wait_until_ready():
+                return
+        except JobError as exc:
+            if job_store.claim(job_id, _owner):
+                job_store.update(job_id, status="failed", error=str(exc), finished_at=time.time())
+            continue
+
+        # Finished, unknown, or claimed by another worker or process.
+        if not job_store.claim(job_id, _owner):
+            continue
+        _run(job_store.get(job_id))
@@ -0,0 +1,281 @@
+import logging
+import os
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+import torchaudio
+
+from core.config import (
+    LONGFORM_OVERLAP_SEC,
+    LONGFORM_SPLIT_SEARCH_SEC,
+    LONGFORM_WINDOW_SEC,
+    LONGFORM_WORKERS,
+    SAMPLE_RATE,
+    TEMP_DIR,
+)
+
+logger = logging.getLogger(__name__)
+
+_ENERGY_FRAME_SEC = 0.03
+_MAX_BOUNDARY_WORDS = 12
+# keep_to of the last window, which keeps everything after its keep_from.
+_NO_LIMIT = float("inf")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=LONGFORM_WORKERS,
+                    thread_name_prefix="stt-longform",
+                )
+    return _executor
+
+
+def probe_duration(path):
+    info = torchaudio.info(path)
+    if info.sample_rate <= 0:
+        return 0.0
+    return info.num_frames / float(info.sample_rate)
+
+
+def _find_split(audio, nominal, lower, upper):
+    # Quietest short frame around the nominal boundary, as a cheap VAD.
+    start = max(lower, nominal - LONGFORM_SPLIT_SEARCH_SEC)
+    end = min(upper, nominal + LONGFORM_SPLIT_SEARCH_SEC)
+    if end - start < _ENERGY_FRAME_SEC * 2:
+        return nominal
+
+    samples = audio.slice(start, end)
+    frame = max(1, int(_ENERGY_FRAME_SEC * SAMPLE_RATE))
+    usable = (samples.numel() // frame) * frame
+    if usable == 0:
+        return nominal
+
+    energy = samples[:usable].reshape(-1, frame).pow(2).mean(dim=1)
+    quietest = int(torch.argmin(energy))
+    return start + (quietest + 0.5) * frame / float(SAMPLE_RATE)
+
+
+def plan_windows(audio):
+    duration = audio.duration
+    splits = [0.0]
+    while duration - splits[-1] > LONGFORM_WINDOW_SEC:
+        previous = splits[-1]
+        nominal = previous + LONGFORM_WINDOW_SEC
+        splits.append(
+            _find_split(
+                audio,
+                nominal,
+                lower=previous + LONGFORM_WINDOW_SEC / 2,
+                upper=min(duration, previous + LONGFORM_WINDOW_SEC * 1.5),
+            )
+        )
+    splits.append(duration)
+
+    windows = []
+    for keep_from, keep_to in zip(splits, splits[1:]):
+        windows.append(
+            {
+                "start": max(0.0, keep_from - LONGFORM_OVERLAP_SEC),
+                "end": min(duration, keep_to + LONGFORM_OVERLAP_SEC),
+                "keep_from": keep_from,
+                "keep_to": keep_to,
+            }
+        )
+    return windows
+
+
+def _window_temp_path():
+    target_dir = TEMP_DIR or None
+    if target_dir:
+        os.makedirs(target_dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=".wav", dir=target_dir)
+    os.close(fd)
+    return path
+
+
+def waveform_transcriber(transcribe_waveform):
+    # Adapts a (samples,) waveform -> segments function to long-form windows.
+    def transcribe_window(audio, window):
+        return transcribe_waveform(audio.slice(window["start"], window["end"]))
+
+    return transcribe_window
+
+
+def file_transcriber(transcribe_file):
+    # Adapts a path-based pipeline to long-form windows by writing each
+    # window to a temporary wav file.
+    def transcribe_window(audio, window):
+        waveform = audio.slice(window["start"], window["end"])
+        window_path = _window_temp_path()
+        try:
+            torchaudio.save(window_path, waveform.unsqueeze(0), SAMPLE_RATE)
+            return transcribe_file(window_path)
+        finally:
+            try:
+                os.remove(window_path)
+            except OSError:
+                logger.warning("Could not remove window temp file: %s", window_path)
+
+    return transcribe_window
+
+
+def _shift_times(item, offset):
+    item = dict(item)
+    for key in ("start", "end"):
+        if isinstance(item.get(key), (int, float)):
+            item[key] = round(item[key] + offset, 2)
+    return item
+
+
+def shift_segments(segments, offset):
+    shifted = []
+    for seg in segments:
+        if not isinstance(seg, dict):
+            continue
+        seg = _shift_times(seg, offset)
+        if isinstance(seg.get("words"), list):
+            seg["words"] = [_shift_times(word, offset) for word in seg["words"]]
+        shifted.append(seg)
+    return shifted
+
+
+def _decode_window(audio, window, transcribe_window):
+    return shift_segments(transcribe_window(audio, window), window["start"])
+
+
+def _midpoint(seg):
+    start = seg.get("start")
+    end = seg.get("end")
+    if not isinstance(start, (int, float)):
+        return None
+    if not isinstance(end, (int, float)):
+        return start
+    return (start + end) / 2.0
+
+
+def clip_segments(segments, keep_from, keep_to=_NO_LIMIT):
+    # Keeps the words whose midpoint lies in [keep_from, keep_to), so a word
+    # straddling a window boundary is kept by exactly one of the two windows
+    # that decoded it. Segments without word times are kept or dropped whole
+    # by their midpoint.
+    clipped = []
+    for seg in segments:
+        words = seg.get("words")
+        if not words:
+            midpoint = _midpoint(seg)
+            if midpoint is None or keep_from <= midpoint < keep_to:
+                clipped.append(seg)
+            continue
+
+        kept = [word for word in words if keep_from <= (word["start"] + word["end"]) / 2.0 < keep_to]
+        if len(kept) == len(words):
+            clipped.append(seg)
+        elif kept:
+            seg = dict(seg)
+            seg["words"] = kept
+            seg["start"] = kept[0]["start"]
+            seg["end"] = kept[-1]["end"]
+            seg["text"] = " ".join(word["word"] for word in kept)
+            clipped.append(seg)
+    return clipped
+
+
+def _drop_repeated_word(previous, current):
+    # Timestamp jitter between windows can leave the boundary word in both;
+    # the copy is the same word over the same stretch of audio.
+    prev_words = previous.get("words")
+    cur_words = current.get("words")
+    if not prev_words or not cur_words:
+        return current
+    last, first = prev_words[-1], cur_words[0]
+    if last["word"] != first["word"] or first["start"] >= last["end"]:
+        return current
+
+    rest = cur_words[1:]
+    current = dict(current)
+    current["words"] = rest
+    current["text"] = " ".join(word["word"] for word in rest)
+    if rest:
+        current["start"] = rest[0]["start"]
+    return current
+
+
+def _dedupe_boundary(previous, current):
+    # Drop words that both windows recognized inside the shared overlap, for
+    # segments without word times.
+    prev_end = previous.get("end")
+    cur_start = current.get("start")
+    if isinstance(prev_end, (int, float)) and isinstance(cur_start, (int, float)):
+        if cur_start > prev_end:
+            return current
+
+    prev_words = str(previous.get("text", "")).split()
+    cur_words = str(current.get("text", "")).split()
+    limit = min(len(prev_words), len(cur_words), _MAX_BOUNDARY_WORDS)
+    for size in range(limit, 0, -1):
+        if prev_words[-size:] == cur_words[:size]:
+            current = dict(current)
+            current["text"] = " ".join(cur_words[size:])
+            break
+    return current
+
+
+def _merge_windows(windows, window_segments):
+    merged = []
+    last_index = len(windows) - 1
+    for index, (window, segments) in enumerate(zip(windows, window_segments)):
+        keep_to = _NO_LIMIT if index == last_index else window["keep_to"]
+        first_in_window = True
+        for seg in clip_segments(segments, window["keep_from"], keep_to):
+            if first_in_window and merged:
+                if seg.get("words"):
+                    seg = _drop_repeated_word(merged[-1], seg)
+                else:
+                    seg = _dedupe_boundary(merged[-1], seg)
+            first_in_window = False
+            if str(seg.get("text", "")).strip():
+                merged.append(seg)
+    return merged
+
+
+def transcribe_long_audio(audio, transcribe_window):
+    # transcribe_window: (audio, window) -> segments relative to
+    # window["start"]; see waveform_transcriber and file_transcriber.
+    windows = plan_windows(audio)
+    logger.info(
+        "Long-form decode | duration=%.1fs | windows=%s | workers=%s",
+        audio.duration,
+        len(windows),
+        LONGFORM_WORKERS,
+    )
+
+    executor = _get_executor()
+    results = [None] * len(windows)
+    in_flight = deque()
+    try:
+        for index, window in enumerate(windows):
+            # Keep at most LONGFORM_WORKERS windows in flight at once.
+            if len(in_flight) >= LONGFORM_WORKERS:
+                done_index, future = in_flight.popleft()
+                results[done_index] = future.result()
+            in_flight.append((index, executor.submit(_decode_window, audio, window, transcribe_window)))
+
+        while in_flight:
+            done_index, future = in_flight.popleft()
+            results[done_index] = future.result()
+    except Exception:
+        for _, future in in_flight:
+            future.cancel()
+        raise
+
+    return _merge_windows(windows, results)
@@ -0,0 +1,457 @@
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import torch
+
+import core.loader as loader
+from core.batching import submit
+from core.timings import timed
+from core.config import (
+    AUDIO_MEMMAP_MIN_SEC,
+    BEAM_ENTROPY_HIGH,
+    BEAM_MIN_WIDTH,
+    BEAM_SCORE_MARGIN,
+    BLANK_SKIP_THRESHOLD,
+    BEAM_TOKEN_MIN_LOGP,
+    BEAM_TOKEN_TOPK,
+    BEAM_WIDTH,
+    HOP_LENGTH,
+    LONGFORM_ENABLED,
+    LONGFORM_MIN_SEC,
+    MAX_DECODE_WINDOW_SEC,
+    MAX_FRAMES,
+    N_FFT,
+    SAMPLE_RATE,
+    VAD_ENABLED,
+)
+from services.audio import DecodedAudio, _memmap_path, _remove
+import services.diarization as diarization
+import services.features as features
+from services.longform import clip_segments, shift_segments, transcribe_long_audio
+import services.vad as vad
+from util.decoder_vectorized import SPECIAL_TOKENS, WORD_DELIMITERS, prefix_beam_search
+
+logger = logging.getLogger(__name__)
+
+
+def load_waveform(path):
+    # A copy, so the decoded buffer (possibly a memory map over a temp file)
+    # is closed here instead of living as long as the tensor.
+    with DecodedAudio.from_path(path) as audio:
+        return audio.waveform.clone()
+
+
+def compute_features(waveform):
+    # (samples,) -> (frames, n_mels) log-mel features.
+    return features.log_mel(waveform)
+
+
+def compute_window_features(samples, first_frame, end_frame, ended):
+    # Frames [first_frame, end_frame) of compute_features(samples) computed
+    # from just the samples they cover, so windows can be featurized while
+    # audio is still arriving.
+    return features.compute_frames(samples, first_frame, end_frame, ended=ended)
+
+
+def window_frames():
+    frames = int(MAX_DECODE_WINDOW_SEC * SAMPLE_RATE / HOP_LENGTH)
+    return max(1, min(MAX_FRAMES, frames))
+
+
+def greedy_result(log_probs):
+    # Best-path CTC decode shaped like prefix_beam_search's result: words
+    # carry the log_probs frames of their first and last token.
+    vocab = loader.vocab or []
+    words = []
+    current = ""
+    start = end = None
+    previous = None
+    for frame, token_id in enumerate(log_probs.argmax(dim=-1).tolist()):
+        repeated = token_id == previous
+        previous = token_id
+        if repeated or token_id == loader.blank_id or not 0 <= token_id < len(vocab):
+            continue
+        token = vocab[token_id]
+        if token in WORD_DELIMITERS:
+            if current:
+                words.append({"word": current, "start": start, "end": end})
+            current = ""
+            continue
+        if token in SPECIAL_TOKENS:
+            continue
+        if not current:
+            start = frame
+        current += token
+        end = frame
+    if current:
+        words.append({"word": current, "start": start, "end": end})
+    return {"text": " ".join(word["word"] for word in words), "words": words}
+
+
+def greedy_decode(log_probs):
+    return greedy_result(log_probs)["text"]
+
+
+def decode_log_probs(log_probs, time_budget=None):
+    # time_budget: seconds this window may spend in beam search; the beam
+    # narrows while the search is behind schedule.
+    if BEAM_WIDTH <= 1:
+        return greedy_result(log_probs)
+
+    return prefix_beam_search(
+        log_probs.numpy(),
+        loader.vocab,
+        loader.blank_id,
+        BEAM_WIDTH,
+        # None until KenLM has loaded; requests do not wait for it.
+        lm=loader.lm_cache,
+        token_topk=BEAM_TOKEN_TOPK,
+        token_min_logp=BEAM_TOKEN_MIN_LOGP,
+        score_margin=BEAM_SCORE_MARGIN,
+        blank_skip_threshold=BLANK_SKIP_THRESHOLD,
+        min_beam_width=BEAM_MIN_WIDTH or None,
+        entropy_high=BEAM_ENTROPY_HIGH,
+        time_budget=time_budget,
+    )
+
+
+class _BeamBudget:
+    # What is left of a request's latency budget, split between decode
+    # windows in proportion to their frames as each starts beam search.
+
+    def __init__(self, deadline, frames):
+        self._deadline = deadline
+        self._frames_left = max(1, int(frames))
+        self._lock = threading.Lock()
+
+    def take(self, frames):
+        with self._lock:
+            share = frames / float(max(frames, self._frames_left))
+            self._frames_left = max(0, self._frames_left - frames)
+        return max(0.0, self._deadline - time.time()) * share
+
+
+def _beam_budget(deadline, duration_sec):
+    if deadline is None:
+        return None
+    return _BeamBudget(deadline, duration_sec * SAMPLE_RATE / HOP_LENGTH)
+
+
+def _cancel_windows(windows):
+    for _, _, future in windows:
+        future.cancel()
+
+
+def _window_segment(start, end, log_probs, result):
+    if not result["text"]:
+        return None
+
+    # Word times are kept so long-form windows can be trimmed word by word.
+    frame_sec = HOP_LENGTH / float(SAMPLE_RATE)
+    window_start = start * frame_sec
+    out_frame_sec = (end - start) * frame_sec / log_probs.size(0)
+    words = [
+        {
+            "word": word["word"],
+            "start": round(window_start + word["start"] * out_frame_sec, 2),
+            "end": round(window_start + (word["end"] + 1) * out_frame_sec, 2),
+        }
+        for word in result["words"]
+    ]
+    if words:
+        seg_start = words[0]["start"]
+        seg_end = words[-1]["end"]
+    else:
+        seg_start = round(window_start, 2)
+        seg_end = round(end * frame_sec, 2)
+
+    return {
+        "start": seg_start,
+        "end": seg_end,
+        "text": result["text"],
+        "words": words,
+    }
+
+
+def _collect_segments(windows, timings=None, draft=None, budget=None):
+    # draft: optional callable that receives greedy segments for all windows
+    # as soon as the model has run on them, before beam search starts.
+    # budget: optional _BeamBudget giving each window its beam search time.
+    if draft is not None:
+        ready = [(start, end, future.result()) for start, end, future in windows]
+        greedy = [
+            _window_segment(start, end, log_probs, greedy_result(log_probs))
+            for start, end, log_probs in ready
+        ]
+        draft([seg for seg in greedy if seg is not None])
+    else:
+        # Beam search on early windows overlaps the model on later ones.
+        ready = ((start, end, future.result()) for start, end, future in windows)
+
+    segments = []
+    for start, end, log_probs in ready:
+        time_budget = budget.take(end - start) if budget is not None else None
+        with timed("beam_search", timings):
+            result = decode_log_probs(log_probs, time_budget)
+        seg = _window_segment(start, end, log_probs, result)
+        if seg is not None:
+            segments.append(seg)
+    return segments
+
+
+def _transcribe_features(feature_frames, timings=None, frame_offset=0, draft=None, budget=None):
+    # frame_offset: index of feature_frames[0] in the recording, so segment
+    # times come out relative to the recording.
+    total_frames = feature_frames.size(0)
+    if total_frames == 0:
+        return []
+
+    step = window_frames()
+
+    # Submit every window up front so they can share batches with each other
+    # and with windows from concurrent requests.
+    windows = []
+    try:
+        for start in range(0, total_frames, step):
+            end = min(start + step, total_frames)
+            windows.append((frame_offset + start, frame_offset + end, submit(feature_frames[start:end])))
+    except Exception:
+        _cancel_windows(windows)
+        raise
+
+    return _collect_segments(windows, timings, draft, budget)
+
+
+def transcribe_waveform(waveform, timings=None, draft=None, deadline=None):
+    # deadline: optional time.time() by which beam search should finish.
+    budget = _beam_budget(deadline, waveform.numel() / float(SAMPLE_RATE))
+    with timed("features", timings):
+        feature_frames = compute_features(waveform)
+    return _transcribe_features(feature_frames, timings, draft=draft, budget=budget)
+
+
+def _cached_window_transcriber(frame_cache, timings=None, draft=None, budget=None):
+    # Long-form window transcriber reading frames from one FrameCache, so
+    # frames under the overlap of neighbouring windows are computed once.
+    # Drafts are sent per window, limited to the words the merge keeps.
+    def transcribe_window(audio, window):
+        window_draft = None
+        if draft is not None:
+            def window_draft(segments):
+                draft(clip_segments(segments, window["keep_from"], window["keep_to"]))
+
+        first_frame = int(round(window["start"] * SAMPLE_RATE / HOP_LENGTH))
+        end_frame = int(round(window["end"] * SAMPLE_RATE / HOP_LENGTH)) + 1
+        with timed("features", timings):
+            feature_frames = frame_cache.frames(first_frame, end_frame)
+        segments = _transcribe_features(
+            feature_frames, timings, frame_offset=first_frame, draft=window_draft, budget=budget
+        )
+        return shift_segments(segments, -window["start"])
+
+    return transcribe_window
+
+
+class _SampleBuffer:
+    # Append-only float32 buffer with amortized growth. Past
+    # AUDIO_MEMMAP_MIN_SEC the samples move to a memory-mapped temp file,
+    # which then grows in place, so a long stream does not sit in RAM.
+
+    def __init__(self):
+        self._data = np.zeros(SAMPLE_RATE * 60, dtype=np.float32)
+        self._file = None
+        self.backing_path = None
+        self.size = 0
+
+    def _spill(self, capacity):
+        self.backing_path = _memmap_path()
+        self._file = open(self.backing_path, "r+b")
+        if os.name != "nt":
+            # The open file keeps the data; nothing is left behind on a crash.
+            _remove(self.backing_path)
+            self.backing_path = None
+        self._file.truncate(capacity * 4)
+        data = np.memmap(self._file, dtype=np.float32, mode="r+", shape=(capacity,))
+        data[:self.size] = self._data[:self.size]
+        self._data = data
+
+    def _grow(self, needed):
+        capacity = max(needed, self._data.size * 2)
+        if self._file is not None:
+            # Earlier views keep mapping the part of the file they cover.
+            self._file.truncate(capacity * 4)
+            self._data = np.memmap(self._file, dtype=np.float32, mode="r+", shape=(capacity,))
+        elif AUDIO_MEMMAP_MIN_SEC and capacity >= AUDIO_MEMMAP_MIN_SEC * SAMPLE_RATE:
+            self._spill(capacity)
+        else:
+            grown = np.zeros(capacity, dtype=np.float32)
+            grown[:self.size] = self._data[:self.size]
+            self._data = grown
+
+    def append(self, samples):
+        samples = samples.numpy()
+        needed = self.size + samples.size
+        if needed > self._data.size:
+            self._grow(needed)
+        self._data[self.size:needed] = samples
+        self.size = needed
+
+    def view(self):
+        return torch.from_numpy(self._data[:self.size])
+
+    def to_audio(self):
+        # DecodedAudio over the samples; it takes over the backing file,
+        # which is removed when the audio is closed.
+        audio = DecodedAudio(self._data[:self.size], self.backing_path)
+        self.backing_path = None
+        self.close()
+        return audio
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.backing_path is not None:
+            _remove(self.backing_path)
+            self.backing_path = None
+
+
+def transcribe_stream(chunks, diarize="off", timings=None, draft=None, deadline=None):
+    # chunks: iterable of (samples,) tensors at SAMPLE_RATE, e.g. from
+    # services.audio.decode_stream. Each decode window is featurized and
+    # submitted as soon as its samples have arrived, so recognition overlaps
+    # the download. Diarization ("auto" is resolved on the final duration)
+    # starts once the stream ends and runs next to the remaining windows.
+    buffer = _SampleBuffer()
+    step = window_frames()
+    pad = N_FFT // 2
+    windows = []
+    next_frame = 0
+    audio = None
+    try:
+        with timed("stream_decode", timings):
+            for chunk in chunks:
+                buffer.append(chunk)
+                ready_frames = (buffer.size - pad) // HOP_LENGTH + 1 if buffer.size > pad else 0
+                while ready_frames - next_frame >= step:
+                    with timed("features", timings):
+                        features = compute_window_features(buffer.view(), next_frame, next_frame + step, ended=False)
+                    windows.append((next_frame, next_frame + step, submit(features)))
+                    next_frame += step
+
+        audio = buffer.to_audio()
+        use_diarization = diarization.should_diarize(diarize, audio.duration)
+        if next_frame == 0:
+            # Shorter than one window: nothing was submitted yet.
+            with audio:
+                return transcribe_audio(
+                    audio, diarize=use_diarization, timings=timings, draft=draft, deadline=deadline
+                )
+
+        samples = audio.waveform
+        total_frames = samples.numel() // HOP_LENGTH + 1
+        while next_frame < total_frames:
+            end = min(next_frame + step, total_frames)
+            with timed("features", timings):
+                features = compute_window_features(samples, next_frame, end, ended=True)
+            windows.append((next_frame, end, submit(features)))
+            next_frame = end
+    except Exception:
+        _cancel_windows(windows)
+        if audio is not None:
+            audio.close()
+        raise
+    finally:
+        buffer.close()
+
+    with audio:
+        diarization_future = diarization.submit(samples) if use_diarization else None
+        with timed("asr", timings):
+            segments = _collect_segments(windows, timings, draft, _beam_budget(deadline, audio.duration))
+        return finish_diarization(segments, diarization_future, timings)
+
+
+def finish_diarization(segments, diarization_future, timings=None):
+    # Waits for a diarization job started next to decoding and labels the
+    # segments. A failed diarization raises DiarizationFailedError carrying
+    # the unlabelled segments, so callers still return the transcript but
+    # know it lacks the speakers that were asked for.
+    if diarization_future is None:
+        return segments
+    try:
+        with timed("diarization_wait", timings):
+            result = diarization_future.result()
+    except Exception as exc:
+        logger.warning("Diarization failed; returning transcript without speakers: %s", exc)
+        raise diarization.DiarizationFailedError(f"Diarization failed: {exc}", segments) from exc
+    return diarization.assign_speakers(segments, result["turns"])
+
+
+def _decode_audio(audio, timings=None, draft=None, deadline=None):
+    if LONGFORM_ENABLED and audio.duration >= LONGFORM_MIN_SEC:
+        # Overlaps are decoded twice; the budget is split as if they were not.
+        budget = _beam_budget(deadline, audio.duration)
+        with features.FrameCache(audio) as frame_cache:
+            return transcribe_long_audio(audio, _cached_window_transcriber(frame_cache, timings, draft, budget))
+    return transcribe_waveform(audio.waveform, timings, draft, deadline)
+
+
+def _decode_speech(audio, timings=None, draft=None, deadline=None):
+    # Decodes only the speech regions found by the VAD, back to back, and
+    # maps segment times onto the original recording.
+    with timed("vad", timings):
+        regions = vad.speech_regions(audio.samples)
+    gather = vad.should_gather(audio.duration, regions)
+    skipped = vad.record(audio.duration, regions, bypassed=not gather)
+    if timings is not None:
+        # Not a stage time; the routes report it apart from the timings.
+        timings["vad_stats"] = {"skipped_ratio": round(skipped, 4)}
+
+    if not gather:
+        return _decode_audio(audio, timings, draft, deadline)
+    if not regions:
+        return []
+
+    speech_map = vad.SpeechMap(regions)
+    speech_draft = None
+    if draft is not None:
+        def speech_draft(segments):
+            draft(speech_map.remap(segments))
+
+    with audio.gather(regions) as speech:
+        segments = _decode_audio(speech, timings, speech_draft, deadline)
+    return speech_map.remap(segments)
+
+
+def transcribe_audio(audio, diarize=False, timings=None, draft=None, deadline=None, audio_hash=None):
+    # The decoded audio is shared by the acoustic model, long-form splitting
+    # and, when requested, the diarization pipeline running concurrently.
+    # Diarization always sees the full recording.
+    # draft: optional callable receiving greedy (no LM) segments before beam
+    # search; long-form recordings call it once per window, each call adding
+    # segments for new audio. Draft segments have no speaker labels.
+    # deadline: optional time.time() by which decoding should finish; beam
+    # search narrows its beam when behind schedule to meet it.
+    # audio_hash: content hash of the source file, keys the diarization cache.
+    diarization_future = diarization.submit(audio.waveform, audio_hash) if diarize else None
+    try:
+        with timed("asr", timings):
+            if VAD_ENABLED:
+                segments = _decode_speech(audio, timings, draft, deadline)
+            else:
+                segments = _decode_audio(audio, timings, draft, deadline)
+    except Exception:
+        if diarization_future is not None:
+            diarization_future.cancel()
+        raise
+    return finish_diarization(segments, diarization_future, timings)
+
+
+def transcribe_path(path, diarize=False, timings=None, draft=None, deadline=None):
+    with timed("load_audio", timings):
+        audio = DecodedAudio.from_path(path)
+    with audio:
+        return transcribe_audio(audio, diarize=diarize, timings=timings, draft=draft, deadline=deadline)
@@ -0,0 +1,154 @@
+import numpy as np
+import torch
+
+import core.loader as loader
+from core.batching import infer
+from core.config import (
+    HOP_LENGTH,
+    N_FFT,
+    N_MELS,
+    SAMPLE_RATE,
+    STREAM_CHUNK_SEC,
+    STREAM_CONTEXT_SEC,
+    STREAM_ENDPOINT_SEC,
+    STREAM_MAX_SEGMENT_SEC,
+)
+from services.features import frame_count
+from services.recognizer import compute_window_features, decode_log_probs, greedy_decode
+
+_PAD = N_FFT // 2
+_EMPTY = np.zeros(0, dtype=np.float32)
+
+
+class StreamingSession:
+    # Incremental recognizer for one live audio stream.
+    #
+    # Audio arrives as 16-bit little-endian mono PCM at SAMPLE_RATE. Log-mel
+    # frames are computed once, as soon as all of their samples have arrived,
+    # and kept for the open segment plus up to STREAM_CONTEXT_SEC of already
+    # finalized audio used as acoustic look-back. Every STREAM_CHUNK_SEC the
+    # acoustic model runs over those frames (it needs the whole segment) and
+    # output frames belonging to the look-back are dropped. Partials are
+    # greedy; finals go through the beam search and LM like file requests.
+
+    def __init__(self):
+        self._chunk_samples = int(STREAM_CHUNK_SEC * SAMPLE_RATE)
+        self._context_frames = int(STREAM_CONTEXT_SEC * SAMPLE_RATE) // HOP_LENGTH
+        self._max_segment_samples = int(STREAM_MAX_SEGMENT_SEC * SAMPLE_RATE)
+        # Samples from _sample_base (a multiple of HOP_LENGTH) on, enough to
+        # compute every frame not computed yet.
+        self._samples = _EMPTY
+        self._sample_base = 0
+        self._received = 0
+        # Computed frames [_frame_base, _frame_base + len(_frames)).
+        self._frames = torch.empty(0, N_MELS)
+        self._frame_base = 0
+        self._segment_frame = 0
+        self._segment_start = 0
+        self._pending = 0
+        self._last_text = ""
+
+    def add_pcm(self, payload):
+        usable = len(payload) - (len(payload) % 2)
+        if usable <= 0:
+            return []
+
+        samples = np.frombuffer(payload[:usable], dtype="<i2").astype(np.float32) / 32768.0
+        self._samples = np.concatenate([self._samples, samples])
+        self._received += samples.size
+        self._pending += samples.size
+
+        if self._pending < self._chunk_samples:
+            return []
+        return self._decode(final=False)
+
+    def flush(self):
+        return self._decode(final=True)
+
+    def _next_frame(self):
+        return self._frame_base + self._frames.size(0)
+
+    def _featurize(self, ended):
+        # Computes the frames whose samples have all arrived (or, once the
+        # stream has ended, every remaining frame) and drops samples no
+        # frame still needs.
+        if ended:
+            ready = frame_count(self._received)
+        else:
+            ready = (self._received - _PAD) // HOP_LENGTH + 1 if self._received > _PAD else 0
+        next_frame = self._next_frame()
+        if ready > next_frame:
+            base_frame = self._sample_base // HOP_LENGTH
+            new_frames = compute_window_features(
+                torch.from_numpy(self._samples),
+                next_frame - base_frame,
+                ready - base_frame,
+                ended,
+            )
+            self._frames = torch.cat([self._frames, new_frames])
+            next_frame = ready
+
+        keep_from = max(0, next_frame * HOP_LENGTH - _PAD) // HOP_LENGTH * HOP_LENGTH
+        if keep_from > self._sample_base:
+            self._samples = self._samples[keep_from - self._sample_base:].copy()
+            self._sample_base = keep_from
+
+    def _decode(self, final):
+        self._pending = 0
+        self._featurize(ended=final)
+        if self._received <= self._segment_start:
+            return []
+
+        first = max(self._frame_base, self._segment_frame - self._context_frames)
+        features = self._frames[first - self._frame_base:]
+        context = self._segment_frame - first
+        if features.size(0) <= context:
+            return []
+
+        log_probs = infer(features)
+        skip = int(round(log_probs.size(0) * context / float(features.size(0))))
+        log_probs = log_probs[skip:]
+        if log_probs.size(0) == 0:
+            return []
+
+        text = greedy_decode(log_probs)
+        segment_sec = (self._received - self._segment_start) / float(SAMPLE_RATE)
+        frame_sec = segment_sec / log_probs.size(0)
+
+        trailing_blank = 0
+        for token_id in reversed(log_probs.argmax(dim=-1).tolist()):
+            if token_id != loader.blank_id:
+                break
+            trailing_blank += 1
+
+        endpoint = bool(text) and trailing_blank * frame_sec >= STREAM_ENDPOINT_SEC
+        too_long = self._received - self._segment_start >= self._max_segment_samples
+        if final or endpoint or too_long:
+            if text:
+                text = decode_log_probs(log_probs)["text"]
+            # The next segment starts at the first frame not decoded yet.
+            end = self._received if final else self._next_frame() * HOP_LENGTH
+            event = self._event("final", text, end)
+            self._advance(end)
+            return [event] if text else []
+
+        if text == self._last_text:
+            return []
+        self._last_text = text
+        return [self._event("partial", text, self._received)]
+
+    def _event(self, kind, text, end):
+        return {
+            "type": kind,
+            "start": round(self._segment_start / float(SAMPLE_RATE), 2),
+            "end": round(end / float(SAMPLE_RATE), 2),
+            "text": text,
+        }
+
+    def _advance(self, end):
+        self._segment_start = end
+        self._segment_frame = self._next_frame()
+        first = max(self._frame_base, self._segment_frame - self._context_frames)
+        self._frames = self._frames[first - self._frame_base:]
+        self._frame_base = first
+        self._last_text = ""
@@ -0,0 +1,106 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from core.config import (
+    SUMMARY_CACHE_ENABLED,
+    SUMMARY_CACHE_MAX_ENTRIES,
+    SUMMARY_CACHE_TTL_SEC,
+    get_summary_model,
+)
+from services.summary import summarize_text
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+_in_flight = {}
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "coalesced": 0,
+    "evictions": 0,
+}
+
+
+def _normalize_text(text):
+    return " ".join((text or "").split())
+
+
+def _cache_key(text):
+    # The model is resolved per call: local tokens can switch it at runtime.
+    payload = f"{get_summary_model(refresh_local_tokens=True)}|{_normalize_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _lookup(key):
+    entry = _entries.get(key)
+    if entry is None:
+        return None
+
+    summary, stored_at = entry
+    if SUMMARY_CACHE_TTL_SEC and time.monotonic() - stored_at > SUMMARY_CACHE_TTL_SEC:
+        del _entries[key]
+        return None
+
+    _entries.move_to_end(key)
+    return summary
+
+
+def _store(key, summary):
+    _entries[key] = (summary, time.monotonic())
+    _entries.move_to_end(key)
+    while len(_entries) > SUMMARY_CACHE_MAX_ENTRIES:
+        _entries.popitem(last=False)
+        _stats["evictions"] += 1
+
+
+def summarize_text_cached(text):
+    if not SUMMARY_CACHE_ENABLED:
+        return summarize_text(text)
+
+    key = _cache_key(text)
+    with _lock:
+        summary = _lookup(key)
+        if summary is not None:
+            _stats["hits"] += 1
+            return summary
+
+        future = _in_flight.get(key)
+        if future is not None:
+            _stats["coalesced"] += 1
+            leader = False
+        else:
+            _stats["misses"] += 1
+            future = Future()
+            _in_flight[key] = future
+            leader = True
+
+    # Followers share the leader's provider call, including its failure.
+    if not leader:
+        return future.result()
+
+    try:
+        summary = summarize_text(text)
+    except BaseException as exc:
+        with _lock:
+            _in_flight.pop(key, None)
+        future.set_exception(exc)
+        raise
+
+    with _lock:
+        _store(key, summary)
+        _in_flight.pop(key, None)
+    future.set_result(summary)
+    return summary
+
+
+def get_cache_status():
+    with _lock:
+        stats = dict(_stats)
+        stats["entries"] = len(_entries)
+        stats["in_flight"] = len(_in_flight)
+    lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+    stats["hit_rate"] = round((stats["hits"] + stats["coalesced"]) / lookups, 4) if lookups else None
+    stats["enabled"] = SUMMARY_CACHE_ENABLED
+    return stats
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+
+import core.loader as loader
+from core.config import (
+    BEAM_ENTROPY_HIGH,
+    BEAM_MIN_WIDTH,
+    BEAM_SCORE_MARGIN,
+    BEAM_TOKEN_MIN_LOGP,
+    BEAM_TOKEN_TOPK,
+    BEAM_WIDTH,
+    BLANK_SKIP_THRESHOLD,
+    CKPT_PATH,
+    LM_ALPHA,
+    LM_BETA,
+    LONGFORM_ENABLED,
+    LONGFORM_MIN_SEC,
+    LONGFORM_OVERLAP_SEC,
+    LONGFORM_SPLIT_SEARCH_SEC,
+    LONGFORM_WINDOW_SEC,
+    STT_PIPELINE,
+    TRANSCRIPT_CACHE_DIR,
+    TRANSCRIPT_CACHE_ENABLED,
+    TRANSCRIPT_CACHE_MAX_BYTES,
+    VAD_ENABLED,
+    VAD_FRAME_SEC,
+    VAD_MIN_SILENCE_SEC,
+    VAD_MIN_SKIP_RATIO,
+    VAD_MIN_SPEECH_SEC,
+    VAD_PAD_SEC,
+    VAD_SILENCE_DBFS,
+    VAD_THRESHOLD_DB,
+)
+
+logger = logging.getLogger(__name__)
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+_lock = threading.Lock()
+_total_bytes = None
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "writes": 0,
+    "evictions": 0,
+}
+
+
+def hash_audio_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as audio_file:
+        for chunk in iter(lambda: audio_file.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _checkpoint_identity():
+    try:
+        stat = os.stat(CKPT_PATH)
+    except OSError:
+        return CKPT_PATH
+    return f"{CKPT_PATH}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _lm_enabled():
+    # The staged decoder scores with the KenLM state cache, the legacy
+    # pipeline with its own scorer.
+    if STT_PIPELINE == "staged":
+        return loader.lm_cache is not None
+    return loader.lm_scorer is not None
+
+
+def decode_settings():
+    # Everything that can change the transcript for the same audio. Take it
+    # before decoding: the LM may finish loading while a request runs.
+    return {
+        "pipeline": STT_PIPELINE,
+        "checkpoint": _checkpoint_identity(),
+        "inference_backend": loader.inference_backend,
+        "beam_width": BEAM_WIDTH,
+        "beam_pruning": [BEAM_TOKEN_TOPK, BEAM_TOKEN_MIN_LOGP, BEAM_SCORE_MARGIN, BLANK_SKIP_THRESHOLD],
+        "adaptive_beam": [BEAM_MIN_WIDTH, BEAM_ENTROPY_HIGH] if BEAM_MIN_WIDTH else None,
+        "lm_alpha": LM_ALPHA,
+        "lm_beta": LM_BETA,
+        "lm": _lm_enabled(),
+        "diarization": loader.diarization_model,
+        "longform": [LONGFORM_MIN_SEC, LONGFORM_WINDOW_SEC, LONGFORM_OVERLAP_SEC, LONGFORM_SPLIT_SEARCH_SEC]
+        if LONGFORM_ENABLED
+        else None,
+        "vad": [
+            VAD_FRAME_SEC,
+            VAD_THRESHOLD_DB,
+            VAD_SILENCE_DBFS,
+            VAD_PAD_SEC,
+            VAD_MIN_SPEECH_SEC,
+            VAD_MIN_SILENCE_SEC,
+            VAD_MIN_SKIP_RATIO,
+        ]
+        if VAD_ENABLED
+        else None,
+    }
+
+
+def build_cache_key(audio_hash, settings=None, **options):
+    # settings: a decode_settings() snapshot, by default the current one.
+    settings = dict(settings or decode_settings())
+    settings.update(options)
+    payload = json.dumps(settings, sort_keys=True)
+    return hashlib.sha256(f"{audio_hash}|{payload}".encode("utf-8")).hexdigest()
+
+
+def _entry_path(key):
+    return os.path.join(TRANSCRIPT_CACHE_DIR, f"{key}.json")
+
+
+def _scan_entries():
+    entries = []
+    try:
+        names = os.listdir(TRANSCRIPT_CACHE_DIR)
+    except OSError:
+        return entries
+
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(TRANSCRIPT_CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    return entries
+
+
+def _evict_if_needed():
+    # Sizes are read back from the directory on every write: other server
+    # processes (forked or spawned workers) write to the same cache, so a
+    # running total kept here would miss their entries.
+    global _total_bytes
+    entries = _scan_entries()
+    _total_bytes = sum(size for _, size, _ in entries)
+    if _total_bytes <= TRANSCRIPT_CACHE_MAX_BYTES:
+        return
+
+    # Least recently used first: hits refresh the entry mtime.
+    for _, size, path in sorted(entries):
+        if _total_bytes <= TRANSCRIPT_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        _total_bytes -= size
+        _stats["evictions"] += 1
+
+
+def get(key):
+    if not TRANSCRIPT_CACHE_ENABLED:
+        return None
+
+    path = _entry_path(key)
+    with _lock:
+        try:
+            with open(path, encoding="utf-8") as cache_file:
+                segments = json.load(cache_file)
+            os.utime(path, None)
+        except (OSError, ValueError):
+            _stats["misses"] += 1
+            return None
+        _stats["hits"] += 1
+    return segments
+
+
+def put(key, segments):
+    if not TRANSCRIPT_CACHE_ENABLED:
+        return
+
+    data = json.dumps(segments, ensure_ascii=False).encode("utf-8")
+    if len(data) > TRANSCRIPT_CACHE_MAX_BYTES:
+        return
+
+    path = _entry_path(key)
+    with _lock:
+        try:
+            os.makedirs(TRANSCRIPT_CACHE_DIR, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=TRANSCRIPT_CACHE_DIR, suffix=".tmp")
+            with os.fdopen(fd, "wb") as temp_file:
+                temp_file.write(data)
+            os.replace(temp_path, path)
+        except OSError as exc:
+            logger.warning("Could not write transcript cache entry: %s", exc)
+            return
+
+        _stats["writes"] += 1
+        _evict_if_needed()
+
+
+def get_cache_status():
+    with _lock:
+        stats = dict(_stats)
+        stats["size_bytes"] = _total_bytes
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else None
+    stats["enabled"] = TRANSCRIPT_CACHE_ENABLED
+    stats["max_bytes"] = TRANSCRIPT_CACHE_MAX_BYTES
+    return stats
@@ -0,0 +1,141 @@
+import bisect
+import threading
+
+import numpy as np
+
+from core.config import (
+    SAMPLE_RATE,
+    VAD_ENABLED,
+    VAD_FRAME_SEC,
+    VAD_MIN_SILENCE_SEC,
+    VAD_MIN_SKIP_RATIO,
+    VAD_MIN_SPEECH_SEC,
+    VAD_PAD_SEC,
+    VAD_SILENCE_DBFS,
+    VAD_THRESHOLD_DB,
+)
+
+# Energy gate: a frame is speech when its level clears both the noise floor
+# (10th percentile of frame levels) and VAD_SILENCE_DBFS by VAD_THRESHOLD_DB,
+# but the bar never rises above typical speech (90th percentile) minus the
+# same margin, so recordings with little silence keep their quiet speech.
+
+_ENERGY_BLOCK_FRAMES = 4096
+
+_lock = threading.Lock()
+_stats = {
+    "recordings": 0,
+    "bypassed": 0,
+    "audio_sec": 0.0,
+    "speech_sec": 0.0,
+}
+
+
+def _frame_levels(samples, frame):
+    # Mean-square level of each whole frame in dBFS, computed block by block
+    # so memory-mapped recordings are not copied at once.
+    count = len(samples) // frame
+    levels = np.empty(count, dtype=np.float64)
+    for first in range(0, count, _ENERGY_BLOCK_FRAMES):
+        last = min(count, first + _ENERGY_BLOCK_FRAMES)
+        block = np.asarray(samples[first * frame:last * frame], dtype=np.float32).reshape(-1, frame)
+        levels[first:last] = np.square(block).mean(axis=1)
+    return 10.0 * np.log10(np.maximum(levels, 1e-12))
+
+
+def speech_regions(samples):
+    # [(start, end), ...] sample ranges holding speech, padded by VAD_PAD_SEC
+    # and merged across pauses shorter than VAD_MIN_SILENCE_SEC.
+    total = len(samples)
+    frame = max(1, int(VAD_FRAME_SEC * SAMPLE_RATE))
+    levels = _frame_levels(samples, frame)
+    if levels.size == 0:
+        return [(0, total)] if total else []
+
+    noise, speech = np.percentile(levels, [10, 90])
+    threshold = max(VAD_SILENCE_DBFS, min(noise + VAD_THRESHOLD_DB, speech - VAD_THRESHOLD_DB))
+    voiced = np.concatenate(([0], (levels > threshold).astype(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(voiced))
+
+    pad = int(VAD_PAD_SEC * SAMPLE_RATE)
+    min_speech = int(VAD_MIN_SPEECH_SEC * SAMPLE_RATE)
+    min_silence = int(VAD_MIN_SILENCE_SEC * SAMPLE_RATE)
+    regions = []
+    for first, last in zip(edges[::2], edges[1::2]):
+        if (last - first) * frame < min_speech:
+            continue
+        start = max(0, int(first) * frame - pad)
+        # The partial frame at the end belongs to a voiced last frame.
+        end = total if last == levels.size else min(total, int(last) * frame + pad)
+        if regions and start - regions[-1][1] < min_silence:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+    return [(start, end) for start, end in regions]
+
+
+def should_gather(duration_sec, regions):
+    # Decoding only the regions pays off once enough audio is skipped.
+    speech_sec = sum(end - start for start, end in regions) / float(SAMPLE_RATE)
+    return not regions or 1.0 - speech_sec / max(duration_sec, 1e-9) >= VAD_MIN_SKIP_RATIO
+
+
+def record(duration_sec, regions, bypassed):
+    # Returns the fraction of the recording that was not decoded.
+    speech_sec = sum(end - start for start, end in regions) / float(SAMPLE_RATE)
+    skipped = 0.0 if bypassed else max(0.0, 1.0 - speech_sec / max(duration_sec, 1e-9))
+    with _lock:
+        _stats["recordings"] += 1
+        _stats["audio_sec"] += duration_sec
+        if bypassed:
+            _stats["bypassed"] += 1
+            _stats["speech_sec"] += duration_sec
+        else:
+            _stats["speech_sec"] += speech_sec
+    return skipped
+
+
+class SpeechMap:
+    # Maps times in the gathered speech-only audio back to the recording.
+
+    def __init__(self, regions):
+        self._sources = [start for start, _ in regions]
+        self._offsets = []
+        offset = 0
+        for start, end in regions:
+            self._offsets.append(offset)
+            offset += end - start
+
+    def to_original(self, seconds, is_end=False):
+        # An end time exactly on a join belongs to the region before it.
+        position = seconds * SAMPLE_RATE
+        search = bisect.bisect_left if is_end else bisect.bisect_right
+        index = max(0, search(self._offsets, position) - 1)
+        return (self._sources[index] + position - self._offsets[index]) / float(SAMPLE_RATE)
+
+    def _remap_times(self, item):
+        item = dict(item)
+        for key in ("start", "end"):
+            if isinstance(item.get(key), (int, float)):
+                item[key] = round(self.to_original(item[key], is_end=key == "end"), 2)
+        return item
+
+    def remap(self, segments):
+        remapped = []
+        for seg in segments:
+            seg = self._remap_times(seg)
+            if isinstance(seg.get("words"), list):
+                seg["words"] = [self._remap_times(word) for word in seg["words"]]
+            remapped.append(seg)
+        return remapped
+
+
+def get_vad_status():
+    with _lock:
+        stats = dict(_stats)
+    stats["skipped_sec"] = round(stats["audio_sec"] - stats["speech_sec"], 3)
+    stats["skipped_ratio"] = round(stats["skipped_sec"] / stats["audio_sec"], 4) if stats["audio_sec"] else None
+    stats["audio_sec"] = round(stats["audio_sec"], 3)
+    stats["speech_sec"] = round(stats["speech_sec"], 3)
+    stats["enabled"] = VAD_ENABLED
+    return stats
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+import soundfile
+
+pytest.importorskip("core.loader")
+audio_cache = pytest.importorskip("services.audio_cache")
+
+from core.config import SAMPLE_RATE  # noqa: E402
+from services.audio import DecodedAudio  # noqa: E402
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_cache, "AUDIO_CACHE_DIR", str(tmp_path / "audio"))
+    monkeypatch.setattr(audio_cache, "AUDIO_CACHE_ENABLED", True)
+    monkeypatch.setattr(audio_cache, "AUDIO_CACHE_MAX_AGE_SEC", 0)
+    monkeypatch.setattr(audio_cache, "_total_bytes", None)
+    monkeypatch.setattr(audio_cache, "_pinned", {})
+    return audio_cache
+
+
+def _audio(seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    return DecodedAudio((rng.standard_normal(int(seconds * SAMPLE_RATE)) * 0.1).astype(np.float32))
+
+
+def test_store_writes_the_callers_decoded_audio(cache, tmp_path):
+    audio = _audio(1.5)
+    entry = cache.store("http://host/a.wav", str(tmp_path / "download"), '"v1"', "hash-a", audio)
+
+    assert entry["audio_hash"] == "hash-a"
+    assert entry["duration"] == 1.5
+    stored, sample_rate = soundfile.read(entry["path"], dtype="float32")
+    assert sample_rate == SAMPLE_RATE
+    np.testing.assert_array_equal(stored, audio.samples)
+    # The caller's audio is still open for transcription.
+    assert audio.samples.size == stored.size
+    cache.release(entry)
+
+    hit = cache.lookup("http://host/a.wav")
+    assert hit["fresh"] and hit["path"] == entry["path"]
+    cache.release(hit)
+    assert cache.lookup("http://host/b.wav") is None
+
+
+def test_eviction_skips_entries_in_use(cache, tmp_path, monkeypatch):
+    # Room for one entry of 1 s float32 audio (plus the wav header).
+    monkeypatch.setattr(cache, "AUDIO_CACHE_MAX_BYTES", SAMPLE_RATE * 4 + 1024)
+    source = str(tmp_path / "download")
+
+    first = cache.store("http://host/1.wav", source, None, "h1", _audio(1.0, seed=1))
+    cache.release(cache.store("http://host/2.wav", source, None, "h2", _audio(1.0, seed=2)))
+    assert cache.contains("http://host/1.wav")
+
+    cache.release(first)
+    cache.release(cache.store("http://host/3.wav", source, None, "h3", _audio(1.0, seed=3)))
+    assert not cache.contains("http://host/1.wav")
+    assert cache.contains("http://host/3.wav")
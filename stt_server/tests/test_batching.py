@@ -0,0 +1,105 @@
+import pytest
+import torch
+
+loader = pytest.importorskip("core.loader")
+batching = pytest.importorskip("core.batching")
+
+from core.config import N_MELS  # noqa: E402
+
+_VOCAB = 6
+
+
+@pytest.fixture
+def replicas(monkeypatch):
+    # A frame-wise model, so padding inside a batch cannot change a window.
+    torch.manual_seed(0)
+    model = torch.nn.Linear(N_MELS, _VOCAB).eval()
+    built = [loader.Replica(index, "cpu", model, None) for index in range(2)]
+    monkeypatch.setattr(loader, "model", model)
+    monkeypatch.setattr(loader, "model_accepts_lengths", False)
+    monkeypatch.setattr(loader, "replicas", built)
+    return built
+
+
+def test_batched_windows_match_single_window_inference(replicas):
+    windows = [torch.randn(frames, N_MELS) for frames in (40, 7, 113, 64, 1, 90)]
+
+    futures = [batching.submit(features) for features in windows]
+    results = [future.result(timeout=10) for future in futures]
+
+    model = replicas[0].model
+    for features, log_probs in zip(windows, results):
+        with torch.inference_mode():
+            expected = torch.log_softmax(model(features.unsqueeze(0)).float(), dim=-1)[0]
+        assert log_probs.shape == expected.shape
+        torch.testing.assert_close(log_probs, expected)
+
+
+def test_windows_spread_over_replicas_and_release_them(replicas):
+    futures = [batching.submit(torch.randn(50, N_MELS)) for _ in range(16)]
+    for future in futures:
+        future.result(timeout=10)
+
+    assert all(replica.batches > 0 for replica in replicas)
+    assert [replica.load for replica in replicas] == [0, 0]
+
+
+def test_acquire_prefers_the_least_loaded_replica(replicas):
+    first = loader.acquire_replica()
+    second = loader.acquire_replica()
+    assert {first.index, second.index} == {0, 1}
+
+    loader.release_replica(first)
+    assert loader.acquire_replica() is first
+    loader.release_replica(first)
+    loader.release_replica(second)
+
+
+def test_rejects_empty_windows():
+    with pytest.raises(ValueError):
+        batching.submit(torch.empty(0, N_MELS))
+
+
+class _WithLengths(torch.nn.Module):
+    def forward(self, features, input_lengths):
+        return features
+
+
+class _WithMask(torch.nn.Module):
+    def forward(self, features, mask=None):
+        return features
+
+
+class _WithVarargs(torch.nn.Module):
+    def forward(self, features, *args):
+        return features
+
+
+def test_lengths_are_passed_only_to_a_named_lengths_parameter(monkeypatch):
+    backends = pytest.importorskip("core.backends")
+    monkeypatch.setattr(backends, "MODEL_ACCEPTS_LENGTHS", "auto")
+    assert backends.accepts_lengths(_WithLengths())
+    assert not backends.accepts_lengths(_WithMask())
+    assert not backends.accepts_lengths(_WithVarargs())
+
+    monkeypatch.setattr(backends, "MODEL_ACCEPTS_LENGTHS", "true")
+    assert backends.accepts_lengths(_WithMask())
+
+
+class _TimeNormalized(torch.nn.Module):
+    # Output depends on every frame of the window, as in a recurrent model.
+    def forward(self, features):
+        return features - features.mean(dim=1, keepdim=True)
+
+
+def test_windows_of_other_lengths_do_not_change_a_model_without_lengths(replicas, monkeypatch):
+    model = _TimeNormalized().eval()
+    for replica in replicas:
+        monkeypatch.setattr(replica, "model", model)
+    windows = [torch.randn(frames, N_MELS) for frames in (40, 7, 40, 113)]
+
+    results = batching._run_batch(windows, replicas[0])
+
+    for features, log_probs in zip(windows, results):
+        expected = torch.log_softmax(model(features.unsqueeze(0)), dim=-1)[0]
+        torch.testing.assert_close(log_probs, expected)
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from benchmarks.bench_decoder import reference_prefix_beam_search, synthesize
+from util.decoder_vectorized import prefix_beam_search, prune_blank_frames
+
+BEAM = 16
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    return synthesize(12, seed=0, noise=1.0, peak=5.0, silence_frames=12)
+
+
+def _decode(vocab, blank_id, log_probs, **options):
+    return prefix_beam_search(log_probs, vocab, blank_id, BEAM, **options)
+
+
+def test_matches_the_reference_beam_search(corpus):
+    vocab, blank_id, items = corpus
+    for item in items:
+        expected = reference_prefix_beam_search(item["log_probs"], vocab, blank_id, BEAM)
+        assert _decode(vocab, blank_id, item["log_probs"])["text"] == expected
+
+
+@pytest.mark.parametrize("noise", [1.5, 2.0])
+def test_matches_the_reference_on_noisy_posteriors(noise):
+    # Near-tied hypotheses reach the same prefix along several paths, so
+    # their mass has to be merged before the beam is cut.
+    vocab, blank_id, items = synthesize(8, seed=1, noise=noise, peak=5.0, silence_frames=12)
+    for item in items:
+        expected = reference_prefix_beam_search(item["log_probs"], vocab, blank_id, 30)
+        assert prefix_beam_search(item["log_probs"], vocab, blank_id, 30)["text"] == expected
+
+
+def test_matches_the_original_decoder(corpus):
+    decoder_beam = pytest.importorskip("util.decoder_beam")
+    if not hasattr(decoder_beam, "prefix_beam_search"):
+        pytest.skip("util.decoder_beam has no prefix_beam_search")
+    vocab, blank_id, items = corpus
+    for item in items:
+        expected = decoder_beam.prefix_beam_search(item["log_probs"], vocab, blank_id, BEAM)
+        if isinstance(expected, dict):
+            expected = expected["text"]
+        assert _decode(vocab, blank_id, item["log_probs"])["text"] == expected
+
+
+def test_blank_pruning_keeps_the_text_and_original_frame_indices(corpus):
+    vocab, blank_id, items = corpus
+    for item in items:
+        log_probs = item["log_probs"]
+        full = _decode(vocab, blank_id, log_probs)
+        pruned = _decode(vocab, blank_id, log_probs, blank_skip_threshold=0.9)
+
+        assert pruned["text"] == full["text"]
+        assert pruned["frames"] == log_probs.shape[0]
+        assert pruned["decoded_frames"] <= log_probs.shape[0]
+        starts = [word["start"] for word in pruned["words"]]
+        assert starts == sorted(starts)
+        assert all(0 <= word["start"] <= word["end"] < log_probs.shape[0] for word in pruned["words"])
+
+
+def test_prune_blank_frames_keeps_one_frame_per_blank_run():
+    log_probs = np.log(
+        np.array(
+            [
+                [0.98, 0.01, 0.01],
+                [0.98, 0.01, 0.01],
+                [0.10, 0.80, 0.10],
+                [0.98, 0.01, 0.01],
+                [0.98, 0.01, 0.01],
+                [0.98, 0.01, 0.01],
+                [0.10, 0.80, 0.10],
+            ]
+        )
+    )
+    kept, frame_index = prune_blank_frames(log_probs, 0, 0.9)
+
+    assert frame_index.tolist() == [0, 2, 3, 6]
+    np.testing.assert_array_equal(kept, log_probs[frame_index])
+
+
+def test_adaptive_beam_never_exceeds_the_fixed_beam(corpus):
+    vocab, blank_id, items = corpus
+    for item in items:
+        fixed = _decode(vocab, blank_id, item["log_probs"])
+        same = _decode(vocab, blank_id, item["log_probs"], min_beam_width=BEAM)
+        adaptive = _decode(vocab, blank_id, item["log_probs"], min_beam_width=2)
+
+        assert same["text"] == fixed["text"]
+        assert same["mean_beam_width"] == BEAM
+        assert 2 <= adaptive["mean_beam_width"] <= BEAM
+
+
+def test_exhausted_time_budget_narrows_to_the_floor(corpus):
+    vocab, blank_id, items = corpus
+    log_probs = np.concatenate([item["log_probs"] for item in items])
+
+    result = _decode(vocab, blank_id, log_probs, min_beam_width=3, time_budget=0.0)
+
+    assert result["text"]
+    assert 3 <= result["mean_beam_width"] < BEAM
+
+
+def test_empty_input_decodes_to_nothing():
+    result = prefix_beam_search(np.zeros((0, 4)), ["<pad>", "a", "b", "|"], 0, BEAM)
+    assert result["text"] == ""
+    assert result["words"] == []
@@ -0,0 +1,51 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+import torch
+
+loader = pytest.importorskip("core.loader")
+diarization = pytest.importorskip("services.diarization")
+
+
+class _Annotation:
+    def itertracks(self, yield_label=False):
+        return iter([])
+
+    def labels(self):
+        return []
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    def fake_pipeline(audio, **kwargs):
+        calls.append(audio)
+        return _Annotation()
+
+    monkeypatch.setattr(loader, "pipeline", fake_pipeline)
+    monkeypatch.setattr(diarization, "DIARIZATION_CACHE_ENABLED", True)
+    monkeypatch.setattr(diarization, "_entries", OrderedDict())
+    return calls
+
+
+def test_cache_is_keyed_on_the_loaded_model_and_content_hash(calls, monkeypatch):
+    waveform = torch.zeros(1600)
+    monkeypatch.setattr(loader, "diarization_model", "fallback/model")
+    diarization.diarize_waveform(waveform, "hash-a")
+
+    assert list(diarization._entries) == ["fallback/model|hash-a"]
+    diarization.diarize_waveform(torch.ones(1600), "hash-a")
+    assert len(calls) == 1
+
+    monkeypatch.setattr(loader, "diarization_model", "primary/model")
+    diarization.diarize_waveform(waveform, "hash-a")
+    assert len(calls) == 2
+
+
+def test_waveform_hash_matches_the_sample_bytes():
+    samples = np.random.default_rng(0).standard_normal(4000).astype(np.float32)
+    expected = hashlib.sha256(samples.tobytes()).hexdigest()
+    assert diarization.hash_waveform(torch.from_numpy(samples)) == expected
@@ -0,0 +1,72 @@
+import pytest
+import torch
+import torchaudio
+
+from core.config import HOP_LENGTH, N_FFT, N_MELS, SAMPLE_RATE
+from services import features
+from services.audio import DecodedAudio
+
+
+def _samples(seconds, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    # Not a multiple of HOP_LENGTH, so the last frame reads reflected samples.
+    return torch.randn(int(seconds * SAMPLE_RATE) + 37, generator=generator) * 0.1
+
+
+def _reference(samples):
+    transform = torchaudio.transforms.MelSpectrogram(
+        sample_rate=SAMPLE_RATE,
+        n_fft=N_FFT,
+        hop_length=HOP_LENGTH,
+        n_mels=N_MELS,
+    )
+    return torch.log(transform(samples).clamp(min=1e-10)).transpose(0, 1)
+
+
+def test_log_mel_matches_mel_spectrogram():
+    samples = _samples(23.0)
+    frames = features.log_mel(samples)
+
+    expected = _reference(samples)
+    assert frames.shape == expected.shape == (features.frame_count(samples.numel()), N_MELS)
+    torch.testing.assert_close(frames, expected, rtol=1e-4, atol=1e-3)
+
+
+@pytest.mark.parametrize("first, end", [(0, 1), (0, 700), (3, 1500), (1023, 1025), (1500, 2301)])
+def test_unaligned_windows_match_the_whole_recording(first, end):
+    samples = _samples(23.0, seed=1)
+    full = features.log_mel(samples)
+    end = min(end, full.size(0))
+
+    window = features.compute_frames(samples, first, end)
+
+    torch.testing.assert_close(window, full[first:end], rtol=1e-4, atol=1e-3)
+
+
+def test_frames_of_a_growing_recording_match_the_finished_one():
+    samples = _samples(12.0, seed=2)
+    full = features.log_mel(samples)
+    pad = N_FFT // 2
+
+    computed = []
+    done = 0
+    for arrived in range(4000, samples.numel(), 7919):
+        # Only frames whose samples have all arrived.
+        ready = (arrived - pad) // HOP_LENGTH + 1
+        if ready > done:
+            computed.append(features.compute_frames(samples[:arrived], done, ready, ended=False))
+            done = ready
+    computed.append(features.compute_frames(samples, done, full.size(0)))
+
+    torch.testing.assert_close(torch.cat(computed), full, rtol=1e-4, atol=1e-3)
+
+
+def test_frame_cache_serves_overlapping_windows(monkeypatch):
+    monkeypatch.setattr(features, "AUDIO_MEMMAP_MIN_SEC", 0)
+    samples = _samples(25.0, seed=3)
+    full = features.log_mel(samples)
+
+    with DecodedAudio.from_waveform(samples) as audio, features.FrameCache(audio) as cache:
+        assert cache.total_frames == full.size(0)
+        for start, end in [(900, 2100), (0, 1200), (2000, full.size(0) + 50)]:
+            torch.testing.assert_close(cache.frames(start, end), full[start:end], rtol=1e-4, atol=1e-3)
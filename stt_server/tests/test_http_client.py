@@ -0,0 +1,114 @@
+import asyncio
+import http.server
+import os
+import threading
+
+import pytest
+
+import core.http_client as http_client
+
+_PAYLOAD = os.urandom(300_000)
+_ETAG = '"v1"'
+
+
+class _FlakyHandler(http.server.BaseHTTPRequestHandler):
+    # The first response drops the connection halfway through the body.
+    # Range requests are answered with 206 unless the server ignores ranges.
+    protocol_version = "HTTP/1.1"
+    ignore_ranges = False
+    send_etag = True
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        range_header = self.headers.get("Range")
+        self.requests.append(range_header)
+        if range_header and not self.ignore_ranges and self.headers.get("If-Range") == _ETAG:
+            offset = int(range_header.split("=")[1].rstrip("-"))
+            body = _PAYLOAD[offset:]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {offset}-{len(_PAYLOAD) - 1}/{len(_PAYLOAD)}")
+        else:
+            body = _PAYLOAD
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        if self.send_etag:
+            self.send_header("ETag", _ETAG)
+        self.end_headers()
+
+        if len(self.requests) == 1:
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(http_client, "_RETRY_BACKOFF_SEC", 0.0)
+    handler = type("Handler", (_FlakyHandler,), {"requests": []})
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield handler, f"http://127.0.0.1:{httpd.server_port}/audio.wav"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _download(url, path):
+    progress = []
+
+    async def run():
+        try:
+            with open(path, "wb") as output_file:
+                return await http_client.download(
+                    url,
+                    output_file,
+                    len(_PAYLOAD) * 2,
+                    on_progress=lambda written, total, restarted: progress.append(restarted),
+                )
+        finally:
+            await http_client.close()
+
+    return asyncio.run(run()), progress
+
+
+def test_interrupted_download_resumes_with_a_range_request(server, tmp_path):
+    handler, url = server
+    path = tmp_path / "audio.wav"
+
+    result, progress = _download(url, path)
+
+    assert path.read_bytes() == _PAYLOAD
+    assert result == {"bytes": len(_PAYLOAD), "validator": _ETAG, "not_modified": False}
+    assert handler.requests == [None, f"bytes={len(_PAYLOAD) // 2}-"]
+    assert not any(progress)
+
+
+def test_server_ignoring_ranges_restarts_from_zero(server, tmp_path):
+    handler, url = server
+    handler.ignore_ranges = True
+    path = tmp_path / "audio.wav"
+
+    result, progress = _download(url, path)
+
+    assert path.read_bytes() == _PAYLOAD
+    assert result["bytes"] == len(_PAYLOAD)
+    assert len(handler.requests) == 2
+    assert True in progress
+
+
+def test_download_without_validator_restarts_instead_of_resuming(server, tmp_path):
+    handler, url = server
+    handler.send_etag = False
+    path = tmp_path / "audio.wav"
+
+    result, progress = _download(url, path)
+
+    assert path.read_bytes() == _PAYLOAD
+    assert result["validator"] is None
+    assert handler.requests == [None, None]
+    assert True in progress
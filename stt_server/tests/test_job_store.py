@@ -0,0 +1,59 @@
+import multiprocessing
+import time
+
+import pytest
+
+import services.job_store as job_store
+
+_JOBS = 40
+_WORKERS = 4
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    job_store.close()
+    monkeypatch.setattr(job_store, "JOB_STORE_PATH", str(tmp_path / "jobs.sqlite3"))
+    yield job_store
+    job_store.close()
+
+
+def _claim_all(path, owner, job_ids):
+    # Runs in a spawned process with its own connection, like a server worker.
+    job_store.JOB_STORE_PATH = path
+    return [job_id for job_id in job_ids if job_store.claim(job_id, owner)]
+
+
+def test_each_job_is_claimed_by_exactly_one_process(store):
+    job_ids = [f"job-{index}" for index in range(_JOBS)]
+    for job_id in job_ids:
+        store.create(job_id, {"audio_url": job_id})
+
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(_WORKERS) as pool:
+        claimed = pool.starmap(
+            _claim_all,
+            [(store.JOB_STORE_PATH, f"worker-{index}", job_ids) for index in range(_WORKERS)],
+        )
+
+    assert sorted(job_id for ids in claimed for job_id in ids) == sorted(job_ids)
+    owners = {store.get(job_id)["owner"] for job_id in job_ids}
+    assert owners <= {f"worker-{index}" for index in range(_WORKERS)}
+    assert store.count_by_status() == {"running": _JOBS}
+
+
+def test_only_jobs_of_silent_owners_are_requeued(store):
+    store.create("live", {})
+    store.create("dead", {})
+    assert store.claim("live", "worker-live")
+    assert store.claim("dead", "worker-dead")
+    assert not store.claim("live", "worker-dead")
+
+    time.sleep(0.05)
+    cutoff = time.time()
+    store.heartbeat("worker-live")
+
+    assert store.requeue_stale(cutoff) == 1
+    assert store.get("live")["status"] == "running"
+    assert store.get("dead")["status"] == "queued"
+    assert store.get("dead")["owner"] is None
+    assert [job_id for job_id, _ in store.list_queued()] == ["dead"]
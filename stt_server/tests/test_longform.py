@@ -0,0 +1,96 @@
+import torch
+
+import services.longform as longform
+from services.audio import DecodedAudio
+from services.longform import clip_segments, shift_segments
+
+
+def _segment(words):
+    return {
+        "start": words[0]["start"],
+        "end": words[-1]["end"],
+        "text": " ".join(word["word"] for word in words),
+        "words": words,
+    }
+
+
+def _word(text, start, end):
+    return {"word": text, "start": start, "end": end}
+
+
+def test_word_straddling_the_boundary_is_kept_once():
+    windows = [
+        {"start": 0.0, "end": 31.5, "keep_from": 0.0, "keep_to": 30.0},
+        {"start": 28.5, "end": 50.0, "keep_from": 30.0, "keep_to": 50.0},
+    ]
+    # Both windows hear "boundary" (29.8-30.4 s); its midpoint is past 30 s.
+    first = _segment([_word("before", 29.0, 29.6), _word("boundary", 29.8, 30.4), _word("tail", 30.6, 31.2)])
+    second = _segment([_word("before", 29.05, 29.6), _word("boundary", 29.85, 30.4), _word("after", 30.6, 31.2)])
+
+    merged = longform._merge_windows(windows, [[first], [second]])
+
+    assert [seg["text"] for seg in merged] == ["before", "boundary after"]
+    assert merged[1]["start"] == 29.85
+    assert [word["word"] for seg in merged for word in seg["words"]] == ["before", "boundary", "after"]
+
+
+def test_boundary_word_kept_by_both_windows_is_deduplicated():
+    windows = [
+        {"start": 0.0, "end": 31.5, "keep_from": 0.0, "keep_to": 30.0},
+        {"start": 28.5, "end": 50.0, "keep_from": 30.0, "keep_to": 50.0},
+    ]
+    # Timing jitter puts the midpoint before 30 s in one window, after it in the other.
+    first = _segment([_word("word", 29.6, 30.3)])
+    second = _segment([_word("word", 29.75, 30.35), _word("next", 30.5, 31.0)])
+
+    merged = longform._merge_windows(windows, [[first], [second]])
+
+    assert " ".join(seg["text"] for seg in merged) == "word next"
+
+
+def test_segments_without_words_fall_back_to_text_overlap():
+    windows = [
+        {"start": 0.0, "end": 31.5, "keep_from": 0.0, "keep_to": 30.0},
+        {"start": 28.5, "end": 60.0, "keep_from": 30.0, "keep_to": 60.0},
+    ]
+    first = {"start": 0.0, "end": 30.5, "text": "one two three"}
+    second = {"start": 29.0, "end": 60.0, "text": "two three four"}
+
+    merged = longform._merge_windows(windows, [[first], [second]])
+
+    assert [seg["text"] for seg in merged] == ["one two three", "four"]
+
+
+def test_clip_and_shift_move_word_times():
+    seg = _segment([_word("a", 1.0, 1.4), _word("b", 2.0, 2.4), _word("c", 3.0, 3.4)])
+
+    clipped = clip_segments([seg], 1.5, 3.0)
+    assert clipped[0]["text"] == "b"
+    assert (clipped[0]["start"], clipped[0]["end"]) == (2.0, 2.4)
+
+    shifted = shift_segments(clipped, 10.0)
+    assert shifted[0]["words"] == [_word("b", 12.0, 12.4)]
+    assert clip_segments([seg], 5.0) == []
+
+
+def test_long_audio_transcribes_every_word_exactly_once(monkeypatch):
+    monkeypatch.setattr(longform, "LONGFORM_WINDOW_SEC", 10.0)
+    monkeypatch.setattr(longform, "LONGFORM_OVERLAP_SEC", 1.5)
+    monkeypatch.setattr(longform, "LONGFORM_SPLIT_SEARCH_SEC", 2.0)
+    audio = DecodedAudio.from_waveform(torch.full((16000 * 35,), 0.1))
+    # A 0.4 s word every 0.5 s, each window reporting the words it covers.
+    truth = [_word(f"w{index}", index * 0.5, index * 0.5 + 0.4) for index in range(70)]
+
+    def transcribe_window(_audio, window):
+        words = [
+            _word(word["word"], round(word["start"] - window["start"], 2), round(word["end"] - window["start"], 2))
+            for word in truth
+            if word["start"] >= window["start"] and word["end"] <= window["end"]
+        ]
+        return [_segment(words)] if words else []
+
+    with audio:
+        assert len(longform.plan_windows(audio)) > 2
+        merged = longform.transcribe_long_audio(audio, transcribe_window)
+
+    assert [word["word"] for seg in merged for word in seg["words"]] == [word["word"] for word in truth]
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+stt_routes = pytest.importorskip("api.stt_routes")
+
+
+@pytest.fixture
+def process_mode(monkeypatch):
+    calls = []
+
+    def fake_diarize_path(path, diarize, audio_hash=None):
+        calls.append(diarize)
+        return {"turns": [{"start": 0.0, "end": 5.0, "speaker": "SPEAKER_00"}]}
+
+    monkeypatch.setattr(stt_routes, "STT_EXECUTOR", "process")
+    monkeypatch.setattr(stt_routes.diarization, "is_available", lambda: True)
+    monkeypatch.setattr(stt_routes, "_diarize_path", fake_diarize_path)
+    return calls
+
+
+def _transcribe(diarize):
+    # The worker's transcript has no speakers: it has no diarization pipeline.
+    async def run():
+        speakers = stt_routes._start_parent_diarization("audio.wav", diarize, "hash")
+        segments = [{"start": 1.0, "end": 2.0, "text": "xin chao"}]
+        return await stt_routes._finish_parent_diarization(speakers, segments)
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("diarize", ["off", "auto", "on"])
+def test_legacy_pipeline_in_process_mode_diarizes_in_the_parent(process_mode, monkeypatch, diarize):
+    monkeypatch.setattr(stt_routes, "STT_PIPELINE", "legacy")
+
+    segments = _transcribe(diarize)
+
+    # run_pipeline always diarizes, so the parent does whatever was asked.
+    assert process_mode == ["on"]
+    assert segments[0]["speaker"] == "SPEAKER_00"
+
+
+def test_staged_pipeline_in_process_mode_honours_diarize_off(process_mode, monkeypatch):
+    monkeypatch.setattr(stt_routes, "STT_PIPELINE", "staged")
+
+    segments = _transcribe("off")
+
+    assert process_mode == []
+    assert "speaker" not in segments[0]
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+import torch
+
+loader = pytest.importorskip("core.loader")
+streaming = pytest.importorskip("services.streaming")
+
+from core.config import SAMPLE_RATE  # noqa: E402
+from services.features import log_mel  # noqa: E402
+
+
+@pytest.fixture
+def pcm():
+    rng = np.random.default_rng(0)
+    return (rng.standard_normal(SAMPLE_RATE * 20) * 3000).astype("<i2")
+
+
+def _stream(session, pcm, seed=1):
+    # Sends pcm in uneven chunks, as a client would, then ends the stream.
+    rng = np.random.default_rng(seed)
+    events = []
+    position = 0
+    while position < pcm.size:
+        size = int(rng.integers(100, 9000))
+        events += session.add_pcm(pcm[position:position + size].tobytes())
+        position += size
+    return events + session.flush()
+
+
+def test_features_are_computed_once_and_match_the_whole_stream(monkeypatch, pcm):
+    full = log_mel(torch.from_numpy(pcm.astype(np.float32) / 32768.0))
+    session = streaming.StreamingSession()
+    checked = []
+
+    def fake_infer(features):
+        # Every frame kept by the session equals the offline feature frame.
+        kept = session._frames
+        torch.testing.assert_close(kept, full[session._frame_base:session._frame_base + kept.size(0)])
+        checked.append(features.size(0))
+        return torch.log_softmax(torch.zeros(features.size(0) // 4 + 1, 3), dim=-1)
+
+    monkeypatch.setattr(streaming, "infer", fake_infer)
+    monkeypatch.setattr(loader, "blank_id", 0)
+    _stream(session, pcm)
+
+    assert checked
+    assert session._next_frame() == full.size(0)
+    # Only the samples needed for frames not computed yet are kept.
+    assert session._samples.size < streaming.N_FFT
+
+
+def test_finals_use_the_beam_decoder_and_tile_the_stream(monkeypatch, pcm):
+    monkeypatch.setattr(streaming, "STREAM_MAX_SEGMENT_SEC", 4.0)
+    session = streaming.StreamingSession()
+    monkeypatch.setattr(loader, "blank_id", 0)
+
+    def never_blank(features):
+        # Segments then end only at the length limit and the flush.
+        logits = torch.zeros(features.size(0) // 4 + 1, 3)
+        logits[:, 1] = 1.0
+        return torch.log_softmax(logits, dim=-1)
+
+    monkeypatch.setattr(streaming, "infer", never_blank)
+    monkeypatch.setattr(streaming, "greedy_decode", lambda log_probs: "greedy")
+    monkeypatch.setattr(streaming, "decode_log_probs", lambda log_probs: {"text": "beam", "words": []})
+
+    events = _stream(session, pcm)
+
+    finals = [event for event in events if event["type"] == "final"]
+    assert len(finals) >= 4
+    assert all(event["text"] == "beam" for event in finals)
+    assert all(event["text"] == "greedy" for event in events if event["type"] == "partial")
+    assert finals[0]["start"] == 0.0
+    assert finals[-1]["end"] == pcm.size / SAMPLE_RATE
+    for previous, current in zip(finals, finals[1:]):
+        assert current["start"] == previous["end"]
+
+
+def test_sample_buffer_moves_long_streams_to_a_memory_map(monkeypatch):
+    recognizer = pytest.importorskip("services.recognizer")
+    monkeypatch.setattr(recognizer, "AUDIO_MEMMAP_MIN_SEC", 90)
+    rng = np.random.default_rng(2)
+    chunks = [rng.standard_normal(SAMPLE_RATE * 25).astype(np.float32) for _ in range(12)]
+
+    buffer = recognizer._SampleBuffer()
+    for chunk in chunks:
+        buffer.append(torch.from_numpy(chunk))
+    assert isinstance(buffer._data, np.memmap)
+
+    with buffer.to_audio() as audio:
+        np.testing.assert_array_equal(audio.samples, np.concatenate(chunks))
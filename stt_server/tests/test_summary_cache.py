@@ -0,0 +1,52 @@
+import threading
+import time
+from collections import OrderedDict
+
+import pytest
+
+summary_cache = pytest.importorskip("services.summary_cache")
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    def fake_summarize(text):
+        calls.append(text)
+        time.sleep(0.2)
+        return f"summary of {text}"
+
+    monkeypatch.setattr(summary_cache, "summarize_text", fake_summarize)
+    monkeypatch.setattr(summary_cache, "get_summary_model", lambda refresh_local_tokens=False: "model-a")
+    monkeypatch.setattr(summary_cache, "SUMMARY_CACHE_ENABLED", True)
+    monkeypatch.setattr(summary_cache, "_entries", OrderedDict())
+    monkeypatch.setattr(summary_cache, "_in_flight", {})
+    return calls
+
+
+def test_concurrent_identical_requests_share_one_summarizer_call(calls):
+    start = threading.Barrier(8)
+    results = []
+
+    def request():
+        start.wait()
+        results.append(summary_cache.summarize_text_cached("xin  chao\nthe gioi"))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ["summary of xin  chao\nthe gioi"] * 8
+
+
+def test_changing_the_summary_model_misses_the_cache(calls, monkeypatch):
+    summary_cache.summarize_text_cached("xin chao")
+    summary_cache.summarize_text_cached("xin chao")
+    assert len(calls) == 1
+
+    monkeypatch.setattr(summary_cache, "get_summary_model", lambda refresh_local_tokens=False: "model-b")
+    summary_cache.summarize_text_cached("xin chao")
+    assert len(calls) == 2
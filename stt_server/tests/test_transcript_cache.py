@@ -0,0 +1,95 @@
+import pytest
+
+transcript_cache = pytest.importorskip("services.transcript_cache")
+loader = pytest.importorskip("core.loader")
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    monkeypatch.setattr(transcript_cache, "STT_PIPELINE", "staged")
+    monkeypatch.setattr(transcript_cache, "LONGFORM_ENABLED", True)
+    monkeypatch.setattr(transcript_cache, "VAD_ENABLED", True)
+    monkeypatch.setattr(transcript_cache, "BEAM_MIN_WIDTH", 8)
+    monkeypatch.setattr(loader, "inference_backend", "eager")
+    monkeypatch.setattr(loader, "lm_cache", None)
+    monkeypatch.setattr(loader, "diarization_model", None)
+    return monkeypatch
+
+
+@pytest.mark.parametrize(
+    "name, value",
+    [
+        ("BEAM_WIDTH", 7),
+        ("BEAM_TOKEN_TOPK", 3),
+        ("BEAM_TOKEN_MIN_LOGP", -3.0),
+        ("BEAM_SCORE_MARGIN", 3.0),
+        ("BLANK_SKIP_THRESHOLD", 0.5),
+        ("BEAM_MIN_WIDTH", 3),
+        ("BEAM_ENTROPY_HIGH", 0.3),
+        ("LM_ALPHA", 0.3),
+        ("LM_BETA", 0.3),
+        ("LONGFORM_MIN_SEC", 3.0),
+        ("LONGFORM_WINDOW_SEC", 3.0),
+        ("LONGFORM_OVERLAP_SEC", 0.3),
+        ("LONGFORM_SPLIT_SEARCH_SEC", 0.3),
+        ("VAD_FRAME_SEC", 0.3),
+        ("VAD_THRESHOLD_DB", 3.0),
+        ("VAD_SILENCE_DBFS", -3.0),
+        ("VAD_PAD_SEC", 0.03),
+        ("VAD_MIN_SPEECH_SEC", 0.03),
+        ("VAD_MIN_SILENCE_SEC", 0.03),
+        ("VAD_MIN_SKIP_RATIO", 0.03),
+        ("STT_PIPELINE", "legacy"),
+    ],
+)
+def test_output_changing_settings_change_the_key(settings, name, value):
+    baseline = transcript_cache.build_cache_key("abc", diarize="off")
+    settings.setattr(transcript_cache, name, value)
+    assert transcript_cache.build_cache_key("abc", diarize="off") != baseline
+
+
+@pytest.mark.parametrize(
+    "name, value",
+    [
+        ("inference_backend", "int8_torchscript"),
+        ("lm_cache", object()),
+        ("diarization_model", "pyannote/speaker-diarization"),
+    ],
+)
+def test_runtime_state_changes_the_key(settings, name, value):
+    baseline = transcript_cache.build_cache_key("abc", diarize="off")
+    settings.setattr(loader, name, value)
+    assert transcript_cache.build_cache_key("abc", diarize="off") != baseline
+
+
+def test_key_is_stable_and_depends_on_audio_and_options(settings):
+    key = transcript_cache.build_cache_key("abc", diarize="off")
+    assert transcript_cache.build_cache_key("abc", diarize="off") == key
+    assert transcript_cache.build_cache_key("abd", diarize="off") != key
+    assert transcript_cache.build_cache_key("abc", diarize="on") != key
+
+
+def test_eviction_counts_entries_written_by_other_processes(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "transcripts"
+    monkeypatch.setattr(transcript_cache, "TRANSCRIPT_CACHE_DIR", str(cache_dir))
+    monkeypatch.setattr(transcript_cache, "TRANSCRIPT_CACHE_ENABLED", True)
+    monkeypatch.setattr(transcript_cache, "TRANSCRIPT_CACHE_MAX_BYTES", 1000)
+    transcript_cache.put("first", [{"text": "x" * 300}])
+
+    # Another worker fills the directory behind this process's back.
+    for index in range(3):
+        (cache_dir / f"other{index}.json").write_text("y" * 300)
+    transcript_cache.put("second", [{"text": "z" * 300}])
+
+    assert sum(path.stat().st_size for path in cache_dir.glob("*.json")) <= 1000
+    assert transcript_cache.get("second") is not None
+
+
+def test_key_follows_the_settings_snapshot_taken_before_decoding(settings):
+    # The LM finishing its load mid-request must not relabel that transcript.
+    before = transcript_cache.decode_settings()
+    settings.setattr(loader, "lm_cache", object())
+    assert transcript_cache.decode_settings() != before
+    assert transcript_cache.build_cache_key("abc", before, diarize="off") != transcript_cache.build_cache_key(
+        "abc", diarize="off"
+    )
@@ -0,0 +1,52 @@
+import numpy as np
+
+import services.vad as vad
+from core.config import SAMPLE_RATE
+
+
+def test_speech_map_maps_gathered_times_back():
+    # Speech at 1-2 s and 5-7 s, gathered back to back into 3 s.
+    speech_map = vad.SpeechMap([(1 * SAMPLE_RATE, 2 * SAMPLE_RATE), (5 * SAMPLE_RATE, 7 * SAMPLE_RATE)])
+
+    assert speech_map.to_original(0.0) == 1.0
+    assert speech_map.to_original(0.5) == 1.5
+    assert speech_map.to_original(1.5) == 5.5
+    # A time on the join starts the second region, but ends the first.
+    assert speech_map.to_original(1.0) == 5.0
+    assert speech_map.to_original(1.0, is_end=True) == 2.0
+
+
+def test_remap_moves_segments_and_words():
+    speech_map = vad.SpeechMap([(1 * SAMPLE_RATE, 2 * SAMPLE_RATE), (5 * SAMPLE_RATE, 7 * SAMPLE_RATE)])
+    segments = [
+        {
+            "start": 0.2,
+            "end": 1.0,
+            "text": "one two",
+            "words": [{"word": "one", "start": 0.2, "end": 0.5}, {"word": "two", "start": 0.6, "end": 1.0}],
+        },
+        {"start": 1.25, "end": 2.5, "text": "three"},
+    ]
+
+    remapped = speech_map.remap(segments)
+
+    assert (remapped[0]["start"], remapped[0]["end"]) == (1.2, 2.0)
+    assert [(word["start"], word["end"]) for word in remapped[0]["words"]] == [(1.2, 1.5), (1.6, 2.0)]
+    assert (remapped[1]["start"], remapped[1]["end"]) == (5.25, 6.5)
+    assert segments[0]["start"] == 0.2
+
+
+def test_speech_regions_find_the_loud_part(monkeypatch):
+    monkeypatch.setattr(vad, "VAD_PAD_SEC", 0.0)
+    rng = np.random.default_rng(0)
+    samples = (rng.standard_normal(8 * SAMPLE_RATE) * 0.0005).astype(np.float32)
+    samples[3 * SAMPLE_RATE:5 * SAMPLE_RATE] = rng.standard_normal(2 * SAMPLE_RATE) * 0.3
+
+    regions = vad.speech_regions(samples)
+
+    assert len(regions) == 1
+    start, end = regions[0]
+    assert abs(start - 3 * SAMPLE_RATE) <= SAMPLE_RATE * vad.VAD_FRAME_SEC
+    assert abs(end - 5 * SAMPLE_RATE) <= SAMPLE_RATE * vad.VAD_FRAME_SEC
+    assert vad.should_gather(8.0, regions)
+    assert not vad.should_gather(8.0, [(0, 8 * SAMPLE_RATE)])
@@ -0,0 +1,381 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+_LN10 = math.log(10.0)
+_NEG_INF = float("-inf")
+# Frames between checks of a time budget against the decode schedule.
+_BUDGET_CHECK_FRAMES = 8
+
+BOS = "<s>"
+WORD_DELIMITERS = {"|", " ", "▁"}
+SPECIAL_TOKENS = {"<pad>", "<unk>", "<s>", "</s>"}
+
+
+class KenLMStateCache:
+    # KenLM scorer that memoizes the LM state reached after each word context
+    # and the weighted score of every (context, word) extension, both in a
+    # bounded LRU. Contexts hold at most order - 1 words, which is all the
+    # history a KenLM state depends on.
+
+    def __init__(self, model, alpha, beta, max_entries=200000):
+        import kenlm
+
+        self._kenlm = kenlm
+        self._model = model
+        self.order = max(1, int(model.order))
+        self.alpha = alpha
+        self.beta = beta
+        self._max_entries = max(1, max_entries)
+        self._states = OrderedDict()
+        self._scores = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def initial_context(self):
+        return (BOS,) if self.order > 1 else ()
+
+    def next_context(self, context, word):
+        if self.order <= 1:
+            return ()
+        return (context + (word,))[-(self.order - 1):]
+
+    def _remember(self, store, key, value):
+        store[key] = value
+        store.move_to_end(key)
+        while len(store) > self._max_entries:
+            store.popitem(last=False)
+
+    def _context_state(self, context):
+        state = self._states.get(context)
+        if state is not None:
+            self._states.move_to_end(context)
+            return state
+
+        state = self._kenlm.State()
+        words = context
+        if words and words[0] == BOS:
+            self._model.BeginSentenceWrite(state)
+            words = words[1:]
+        else:
+            self._model.NullContextWrite(state)
+
+        for word in words:
+            out_state = self._kenlm.State()
+            self._model.BaseScore(state, word, out_state)
+            state = out_state
+
+        self._remember(self._states, context, state)
+        return state
+
+    def _score(self, context, word, bonus):
+        key = (context, word)
+        with self._lock:
+            score = self._scores.get(key)
+            if score is not None:
+                self.hits += 1
+                self._scores.move_to_end(key)
+                return score
+
+            self.misses += 1
+            state = self._context_state(context)
+            out_state = self._kenlm.State()
+            log10_prob = self._model.BaseScore(state, word, out_state)
+            score = self.alpha * log10_prob * _LN10 + bonus
+            self._remember(self._scores, key, score)
+            if word != "</s>":
+                self._remember(self._states, self.next_context(context, word), out_state)
+        return score
+
+    def score_word(self, context, word):
+        return self._score(context, word, self.beta)
+
+    def score_end(self, context):
+        return self._score(context, "</s>", 0.0)
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "states": len(self._states),
+                "scores": len(self._scores),
+            }
+
+
+class _Prefix:
+    # key identifies the token sequence: nodes rebuilt for the same prefix
+    # (after an earlier copy was pruned) share it, so their mass is merged.
+    __slots__ = ("parent", "token", "key", "frame", "context", "partial", "lm_score")
+
+    def __init__(self, parent, token, key, frame, context, partial, lm_score):
+        self.parent = parent
+        self.token = token
+        self.key = key
+        self.frame = frame
+        self.context = context
+        self.partial = partial
+        self.lm_score = lm_score
+
+
+def _extend(node, token, key, frame, vocab, delimiter_mask, lm):
+    if not delimiter_mask[token]:
+        return _Prefix(node, token, key, frame, node.context, node.partial + vocab[token], node.lm_score)
+
+    if not node.partial:
+        return _Prefix(node, token, key, frame, node.context, "", node.lm_score)
+
+    if lm is None:
+        return _Prefix(node, token, key, frame, node.context, "", node.lm_score)
+
+    return _Prefix(
+        node,
+        token,
+        key,
+        frame,
+        lm.next_context(node.context, node.partial),
+        "",
+        node.lm_score + lm.score_word(node.context, node.partial),
+    )
+
+
+def _final_lm_bonus(node, lm):
+    if lm is None:
+        return 0.0
+    context = node.context
+    bonus = 0.0
+    if node.partial:
+        bonus += lm.score_word(context, node.partial)
+        context = lm.next_context(context, node.partial)
+    return bonus + lm.score_end(context)
+
+
+def _backtrack(node, vocab, delimiter_mask):
+    tokens = []
+    while node is not None and node.token >= 0:
+        tokens.append((node.token, node.frame))
+        node = node.parent
+    tokens.reverse()
+
+    words = []
+    current = ""
+    start = end = None
+    for token, frame in tokens:
+        if delimiter_mask[token]:
+            if current:
+                words.append({"word": current, "start": start, "end": end})
+            current = ""
+            start = end = None
+            continue
+        if not current:
+            start = frame
+        current += vocab[token]
+        end = frame
+    if current:
+        words.append({"word": current, "start": start, "end": end})
+
+    return {
+        "text": " ".join(word["word"] for word in words),
+        "words": words,
+    }
+
+
+def prune_blank_frames(log_probs, blank_id, threshold):
+    # Collapse every run of frames whose blank probability exceeds threshold
+    # to its first frame. One blank frame keeps repeated tokens separable, so
+    # CTC paths through the run are preserved. Returns the kept frames and
+    # their indices in the original sequence.
+    blank_dominated = log_probs[:, blank_id] > math.log(threshold)
+    keep = ~blank_dominated
+    keep[0] = True
+    keep[1:] |= blank_dominated[1:] & ~blank_dominated[:-1]
+    frame_index = np.flatnonzero(keep)
+    return log_probs[frame_index], frame_index
+
+
+def _candidate_tokens(frame_log_probs, allowed, token_topk, token_min_logp):
+    candidates = np.flatnonzero(allowed & (frame_log_probs >= token_min_logp))
+    if candidates.size > token_topk:
+        top = np.argpartition(frame_log_probs[candidates], -token_topk)[-token_topk:]
+        candidates = candidates[top]
+    return candidates
+
+
+def frame_entropy(log_probs):
+    # Entropy in nats of each frame's posterior; blank-dominated or confident
+    # frames are near 0, ambiguous frames approach log(vocab).
+    probs = np.exp(log_probs)
+    return -np.where(probs > 0.0, probs * log_probs, 0.0).sum(axis=1)
+
+
+def beam_widths(log_probs, min_width, max_width, entropy_high):
+    # Per-frame beam width, interpolated linearly in the frame entropy from
+    # min_width (certain frames) up to max_width at entropy_high nats.
+    if min_width >= max_width:
+        return np.full(log_probs.shape[0], max_width, dtype=np.int64)
+    level = np.clip(frame_entropy(log_probs) / max(entropy_high, 1e-6), 0.0, 1.0)
+    return np.rint(min_width + (max_width - min_width) * level).astype(np.int64)
+
+
+def prefix_beam_search(
+    log_probs,
+    vocab,
+    blank_id,
+    beam_width,
+    lm=None,
+    token_topk=40,
+    token_min_logp=-10.0,
+    score_margin=20.0,
+    blank_skip_threshold=None,
+    min_beam_width=None,
+    entropy_high=1.5,
+    time_budget=None,
+):
+    # log_probs: (frames, vocab) CTC log posteriors. Returns the best
+    # hypothesis with word boundaries expressed in input frame indices.
+    # With min_beam_width the beam narrows on low-entropy frames; with
+    # time_budget (seconds) it is also scaled down while the search runs
+    # behind an even per-frame schedule, never below min_beam_width (or 1).
+    started = time.perf_counter()
+    log_probs = np.asarray(log_probs, dtype=np.float64)
+    if log_probs.ndim != 2 or log_probs.shape[0] == 0:
+        return {"text": "", "words": [], "frames": 0, "decoded_frames": 0, "mean_beam_width": 0.0}
+
+    total_frames = log_probs.shape[0]
+    frame_index = None
+    if blank_skip_threshold is not None and 0.0 < blank_skip_threshold < 1.0:
+        log_probs, frame_index = prune_blank_frames(log_probs, blank_id, blank_skip_threshold)
+
+    vocab_size = log_probs.shape[1]
+    tokens = list(vocab[:vocab_size]) + [""] * max(0, vocab_size - len(vocab))
+    delimiter_mask = np.array([token in WORD_DELIMITERS for token in tokens], dtype=bool)
+    allowed = np.array([token not in SPECIAL_TOKENS and token != "" for token in tokens], dtype=bool)
+    allowed[blank_id] = False
+    beam_width = max(1, int(beam_width))
+    floor_width = 1
+    if min_beam_width is not None:
+        floor_width = min(beam_width, max(1, int(min_beam_width)))
+        widths = beam_widths(log_probs, floor_width, beam_width, entropy_high)
+    else:
+        widths = np.full(log_probs.shape[0], beam_width, dtype=np.int64)
+    budget_scale = 1.0
+    width_sum = 0
+
+    root = _Prefix(None, -1, 0, -1, lm.initial_context() if lm is not None else (), "", 0.0)
+    # (parent key, token) -> key of the extended prefix.
+    prefix_keys = {}
+    beams = [root]
+    p_blank = np.array([0.0])
+    p_non_blank = np.array([_NEG_INF])
+
+    frames = log_probs.shape[0]
+    for frame in range(frames):
+        if time_budget is not None and frame and frame % _BUDGET_CHECK_FRAMES == 0:
+            # Halve the beam while behind schedule; widen again once ahead.
+            elapsed = time.perf_counter() - started
+            if elapsed > time_budget * frame / frames:
+                budget_scale *= 0.5
+            else:
+                budget_scale = min(1.0, budget_scale * 1.5)
+        width = int(widths[frame])
+        if budget_scale < 1.0:
+            width = max(floor_width, int(width * budget_scale))
+        width_sum += width
+        frame_log_probs = log_probs[frame]
+        last = np.array([node.token for node in beams], dtype=np.int64)
+        lm_scores = np.array([node.lm_score for node in beams])
+        total = np.logaddexp(p_blank, p_non_blank)
+
+        # Staying on the same prefix: emit blank, or repeat the last token.
+        stay_blank = total + frame_log_probs[blank_id]
+        stay_non_blank = np.where(
+            last >= 0,
+            p_non_blank + frame_log_probs[np.maximum(last, 0)],
+            _NEG_INF,
+        )
+        next_beams = {}
+        for index, node in enumerate(beams):
+            next_beams[node.key] = [node, stay_blank[index], stay_non_blank[index]]
+
+        candidates = _candidate_tokens(frame_log_probs, allowed, token_topk, token_min_logp)
+        if candidates.size:
+            candidate_log_probs = frame_log_probs[candidates]
+            extend = total[:, None] + candidate_log_probs[None, :]
+            # A repeated token only starts a new symbol after a blank.
+            repeated = last[:, None] == candidates[None, :]
+            extend = np.where(repeated, p_blank[:, None] + candidate_log_probs[None, :], extend)
+
+            # An extension that reaches a prefix already in the beam adds its
+            # mass there. Any other extension is a distinct new prefix, so
+            # only the best `width` of those can survive the cut below.
+            beam_index = {node.key: index for index, node in enumerate(beams)}
+            column_index = {token: column for column, token in enumerate(candidates.tolist())}
+            merged = np.zeros(extend.shape, dtype=bool)
+            for node in beams:
+                if node.parent is None:
+                    continue
+                row = beam_index.get(node.parent.key)
+                column = column_index.get(node.token)
+                if row is None or column is None:
+                    continue
+                merged[row, column] = True
+                entry = next_beams[node.key]
+                entry[2] = np.logaddexp(entry[2], extend[row, column])
+
+            rank = np.where(merged, _NEG_INF, extend + lm_scores[:, None])
+            if lm is not None:
+                delimiter_columns = np.flatnonzero(delimiter_mask[candidates])
+                if delimiter_columns.size:
+                    word_bonus = np.array(
+                        [
+                            lm.score_word(node.context, node.partial) if node.partial else 0.0
+                            for node in beams
+                        ]
+                    )
+                    rank[:, delimiter_columns] += word_bonus[:, None]
+
+            flat_rank = rank.ravel()
+            if flat_rank.size > width:
+                selected = np.argpartition(flat_rank, -width)[-width:]
+            else:
+                selected = np.arange(flat_rank.size)
+            selected = selected[np.isfinite(flat_rank[selected])]
+
+            for flat_index in selected.tolist():
+                row, column = divmod(flat_index, candidates.size)
+                parent = beams[row]
+                token = int(candidates[column])
+                key = prefix_keys.setdefault((parent.key, token), len(prefix_keys) + 1)
+                child = _extend(parent, token, key, frame, tokens, delimiter_mask, lm)
+                next_beams[key] = [child, _NEG_INF, extend[row, column]]
+
+        entries = list(next_beams.values())
+        nodes = [entry[0] for entry in entries]
+        probs = np.array([entry[1:] for entry in entries])
+        scores = np.logaddexp(probs[:, 0], probs[:, 1]) + np.array([node.lm_score for node in nodes])
+        order = np.argsort(-scores, kind="stable")[:width]
+        order = order[scores[order] >= scores[order[0]] - score_margin]
+
+        beams = [nodes[index] for index in order.tolist()]
+        p_blank = probs[order, 0]
+        p_non_blank = probs[order, 1]
+
+    final_scores = np.logaddexp(p_blank, p_non_blank) + np.array(
+        [node.lm_score + _final_lm_bonus(node, lm) for node in beams]
+    )
+    best = beams[int(np.argmax(final_scores))]
+    result = _backtrack(best, tokens, delimiter_mask)
+    if frame_index is not None:
+        for word in result["words"]:
+            word["start"] = int(frame_index[word["start"]])
+            word["end"] = int(frame_index[word["end"]])
+    result["frames"] = total_frames
+    result["decoded_frames"] = frames
+    result["mean_beam_width"] = round(width_sum / float(frames), 2)
+    return result